@@ -10,7 +10,9 @@ import {
   getSocketJobs, 
   getSocketMessages,
   getFile,
+  getDownloadUrls,
   getBlogs,
+  getBlog,
   createBlog,
   updateBlog,
   deleteBlog,
@@ -189,6 +191,7 @@ const AdminDashboard = () => {
   const viewJobDetails = async (jobId) => {
     try {
       const job = await getJob(jobId);
+      getDownloadUrls(jobId).catch(() => {});
       setSelectedJob(job);
       setCurrentTab('jobDetails');
     } catch (error) {
@@ -252,7 +255,15 @@ const AdminDashboard = () => {
     setImagePreview(url || null);
   };
 
-  const handleEditBlog = (blog) => {
+  const handleEditBlog = async (summary) => {
+    // The listing only carries summaries, so load the full post to edit it
+    let blog;
+    try {
+      blog = await getBlog(summary.id);
+    } catch (error) {
+      toast.error(error.error || 'Failed to load blog');
+      return;
+    }
     setBlogForm({
       title: blog.title,
       content: blog.content,
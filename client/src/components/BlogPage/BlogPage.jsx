@@ -42,24 +42,6 @@ const BlogPage = () => {
     }
   };
 
-  const stripMarkdown = (text) => {
-    if (!text) return '';
-    
-    // Remove markdown symbols and clean text
-    let cleaned = text
-      .replace(/##\s+/g, '') // Remove ## headings
-      .replace(/\*\*(.*?)\*\*/g, '$1') // Remove bold
-      .replace(/\*(.*?)\*/g, '$1') // Remove italic
-      .replace(/\*\s+/g, '') // Remove list markers
-      .replace(/\[([^\]]+)\]\(([^)]+)\)/g, '$1') // Remove links, keep text
-      .replace(/\n+/g, ' ') // Replace newlines with spaces
-      .replace(/\s+/g, ' ') // Normalize whitespace
-      .trim();
-    
-    // Create a meaningful excerpt
-    return cleaned.length > 150 ? cleaned.substring(0, 147) + '...' : cleaned;
-  };
-
   const formatDate = (dateString) => {
     return new Date(dateString).toLocaleDateString('en-US', {
       year: 'numeric',
@@ -68,14 +50,6 @@ const BlogPage = () => {
     });
   };
 
-  const calculateReadTime = (content) => {
-    if (!content) return '5 min read';
-    const wordsPerMinute = 200;
-    const wordCount = content.split(/\s+/).length;
-    const readTime = Math.ceil(wordCount / wordsPerMinute);
-    return `${readTime} min read`;
-  };
-
   if (loading) {
     return (
       <>
@@ -108,8 +82,8 @@ const BlogPage = () => {
             {blogs.length > 0 ? (
               <div className="blog-grid">
                 {blogs.map((blog, index) => {
-                  const excerpt = stripMarkdown(blog.content);
-                  const readTime = calculateReadTime(blog.content);
+                  const excerpt = blog.excerpt;
+                  const readTime = `${blog.reading_time} min read`;
                   const isRecent = new Date(blog.created_at) > new Date(Date.now() - 7 * 24 * 60 * 60 * 1000);
                   
                   return (
@@ -19,6 +19,7 @@ import {
   getSocketJobs,
   getSocketMessages,
   getFile,
+  getDownloadUrls,
   getFileBlob,
   initiatePayment,
   getPaymentStatus,
@@ -349,6 +350,7 @@ const ClientDashboard = () => {
   const viewJobDetails = async (jobId) => {
     try {
       const job = await getJob(jobId);
+      getDownloadUrls(jobId).catch(() => {});
       setSelectedJob({
         ...job,
         messages: job.messages.filter((msg) => !hiddenMessageIds.includes(msg.id)),
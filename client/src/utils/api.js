@@ -286,6 +286,62 @@ export const resetPassword = async (token, password) => {
   }
 };
 
+// Files larger than this go through the resumable /api/uploads protocol and are sent by id
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const CHUNK_MAX_RETRIES = 5;
+
+export const uploadFileChunked = async (file) => {
+  const { data: upload } = await api.post('/api/uploads', {
+    filename: file.name,
+    size: file.size,
+    content_type: file.type,
+  });
+  let offset = upload.offset;
+  let failures = 0;
+  while (offset < file.size) {
+    const end = Math.min(offset + upload.chunk_size, file.size);
+    try {
+      const response = await api.put(`/api/uploads/${upload.id}`, file.slice(offset, end), {
+        headers: {
+          'Content-Type': 'application/octet-stream',
+          'Content-Range': `bytes ${offset}-${end - 1}/${file.size}`,
+        },
+      });
+      offset = response.data.offset;
+      failures = 0;
+    } catch (error) {
+      failures += 1;
+      if (failures > CHUNK_MAX_RETRIES) {
+        throw error;
+      }
+      await delay(Math.pow(2, failures) * 1000);
+      // Resume from whatever the server kept
+      const status = await api.get(`/api/uploads/${upload.id}`);
+      offset = status.data.offset;
+    }
+  }
+  await api.post(`/api/uploads/${upload.id}/complete`);
+  return upload.id;
+};
+
+const sendLargeFilesChunked = async (formData) => {
+  for (const field of ['files', 'completed_files']) {
+    const files = formData.getAll(field);
+    if (!files.some((file) => file instanceof File && file.size > CHUNKED_UPLOAD_THRESHOLD)) {
+      continue;
+    }
+    formData.delete(field);
+    for (const file of files) {
+      if (file instanceof File && file.size > CHUNKED_UPLOAD_THRESHOLD) {
+        formData.append('upload_ids', await uploadFileChunked(file));
+      } else {
+        formData.append(field, file);
+      }
+    }
+  }
+  return formData;
+};
+
 export const createJob = async (formData) => {
   try {
     const config = {
@@ -293,6 +349,7 @@ export const createJob = async (formData) => {
         'Content-Type': 'multipart/form-data',
       },
     };
+    await sendLargeFilesChunked(formData);
     const response = await api.post('/api/jobs', formData, config);
     return response.data;
   } catch (error) {
@@ -343,6 +400,7 @@ export const sendMessage = async (formData, jobId = null) => {
     if (!jobId) {
       formData.append('recipient_id', '1');
     }
+    await sendLargeFilesChunked(formData);
     const response = await api.post(url, formData, config);
     return response.data;
   } catch (error) {
@@ -386,6 +444,7 @@ export const initiatePayment = async (payload) => {
     const url = payload.job_id ? '/api/payments/initiate-completion' : '/api/payments/initiate-upfront';
     if (payload instanceof FormData) {
       config.headers['Content-Type'] = 'multipart/form-data';
+      await sendLargeFilesChunked(payload);
     } else {
       config.headers['Content-Type'] = 'application/json';
     }
@@ -400,6 +459,23 @@ export const initiatePayment = async (payload) => {
   }
 };
 
+// Resolves with the next 'payment_status' pushed on /jobs for the order, or null after ms
+const waitForPaymentPush = (orderTrackingId, ms) =>
+  new Promise((resolve) => {
+    const socket = socketJobs;
+    const onStatus = (payload) => {
+      if (payload.order_tracking_id !== orderTrackingId) return;
+      clearTimeout(timer);
+      socket.off('payment_status', onStatus);
+      resolve(payload);
+    };
+    const timer = setTimeout(() => {
+      if (socket) socket.off('payment_status', onStatus);
+      resolve(null);
+    }, ms);
+    if (socket) socket.on('payment_status', onStatus);
+  });
+
 export const getPaymentStatus = async (orderTrackingId) => {
   try {
     let attempts = 0;
@@ -414,8 +490,12 @@ export const getPaymentStatus = async (orderTrackingId) => {
         }
         attempts++;
         const backoffTime = Math.pow(2, attempts) * 1000;
-        console.warn(`Payment status PENDING, retrying after ${backoffTime}ms (attempt ${attempts}/${maxAttempts})`);
-        await delay(backoffTime);
+        console.warn(`Payment status PENDING, waiting up to ${backoffTime}ms for an update (attempt ${attempts}/${maxAttempts})`);
+        // The server pushes status changes, so polling again is only the fallback
+        const pushed = await waitForPaymentPush(orderTrackingId, backoffTime);
+        if (pushed && pushed.payment_status !== 'PENDING') {
+          return pushed;
+        }
       } catch (error) {
         attempts++;
         if (attempts === maxAttempts) {
@@ -436,9 +516,39 @@ export const getPaymentStatus = async (orderTrackingId) => {
   }
 };
 
+// Signed download links by file path, filled per job by getDownloadUrls
+const downloadUrls = new Map();
+
+export const getDownloadUrls = async (jobId) => {
+  try {
+    const response = await api.get(`/api/jobs/${jobId}/download-urls`);
+    const expiresAt = Date.parse(response.data.expires_at);
+    Object.entries(response.data.urls).forEach(([path, url]) => downloadUrls.set(path, { url, expiresAt }));
+    return response.data;
+  } catch (error) {
+    console.error('Get download links failed:', error);
+    throw {
+      error: error.error || 'Failed to get download links',
+      details: error.details || error.response?.data?.error?.message || 'Unknown error',
+    };
+  }
+};
+
 export const getFile = async (filename) => {
   try {
     const normalizedFilename = filename.replace(/\\/g, '/');
+    const signed = downloadUrls.get(normalizedFilename);
+    if (signed && signed.expiresAt - Date.now() > 10000) {
+      // The browser downloads the signed link itself, streaming to disk and able to resume
+      const a = document.createElement('a');
+      a.href = `${API_URL}${signed.url}`;
+      a.download = normalizedFilename.split('/').pop();
+      document.body.appendChild(a);
+      a.click();
+      document.body.removeChild(a);
+      return true;
+    }
+
     const config = {
       responseType: 'blob',
       headers: {
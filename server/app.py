@@ -3,27 +3,41 @@
 import eventlet
 eventlet.monkey_patch()
 
-from flask import Flask, request, jsonify, send_from_directory, g
-from flask_socketio import SocketIO, emit, disconnect
+from flask import Flask, request, jsonify, g, session
+from flask_socketio import emit, disconnect
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import jwt
 import logging
 import os
 from config import config
-from extensions import db, cors, bcrypt, mail, jwt as jwt_manager
+from extensions import db, cors, bcrypt, mail, socketio, jwt as jwt_manager
 from flask_migrate import Migrate
-from models import User, Job, Message, ResetToken, Blog
-from werkzeug.utils import secure_filename
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address  # Corrected import (only get_remote_address needed)
+from models import Job, Message, ResetToken, Blog
 from sqlalchemy import and_, or_
-import time
-from threading import Thread
 from server.routes.auth import auth_bp
 from server.routes.jobs import jobs_bp
 from server.routes.payments import payments_bp
-import re  # Added for URL and content processing
+from server.routes.search import search_bp
+from server.routes.uploads import uploads_bp
+from server.services.auth_cache import auth_failure, init_auth, resolve_token, token_cache
+from server.services.http_client import http_client
+from server.services.mail_queue import mail_queue
+from server.services.ipn import ipn_pipeline
+from server.services.reconciler import payment_reconciler
+from server.services.payments import payment_status_cache
+from server.services.socket_bus import socketio_queue_options
+from server.services.chat import list_conversation_page, list_job_messages_page, job_messages, sync_conversation, sync_job_thread, conversation_filter
+from server.services.admin_directory import admin_directory
+from server.services.blogs import blog_list_cache, blog_list_response
+from server.services.blog_render import normalize_content, render_content
+from server.services.search import init_search, stats as search_stats
+from server.services.downloads import send_upload, verify_signature
+from server.services.uploads import upload_store
+from server.services.retention import retention
+from server.services.scheduler import scheduler
+from server.services.rate_limit import rate_limiter
+from server.services.realtime import join_user_rooms, subscribe_job, unsubscribe_job, emit_to_client, emit_to_job
 import random  # Added for random selection of admin email
 
 logging.basicConfig(level=logging.INFO)
@@ -48,23 +62,38 @@ def create_app(config_name='development'):
     
     initialize_extensions(app)
     configure_logging(app)
+    scheduler.init_app(app)  # before the services that register tasks with it
+    init_auth(app)
+    http_client.init_app(app)
+    mail_queue.init_app(app)
+    ipn_pipeline.init_app(app)
+    payment_reconciler.init_app(app)
+    payment_status_cache.init_app(app)
+    admin_directory.init_app(app)
+    blog_list_cache.init_app(app)
+    init_search(app)
+    upload_store.init_app(app)
+    retention.init_app(app)
+    rate_limiter.init_app(app)  # after init_auth, so signed-in users get their own buckets
     
     migrate = Migrate(app, db)
     
-    limiter = Limiter(
-        get_remote_address,
-        app=app,
-        default_limits=["200 per day", "50 per hour"]
-    )
-    
-    app.limiter = limiter
+    app.limiter = rate_limiter
     
+    rate_limiter.limit('auth')(auth_bp)
+    rate_limiter.limit('payments')(payments_bp)
+    rate_limiter.limit('default', cost=2)(search_bp)
+    rate_limiter.limit('uploads')(uploads_bp)
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(auth_bp, url_prefix='/auth', name='auth_legacy')
     app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
     app.register_blueprint(payments_bp, url_prefix='/api/payments')
+    app.register_blueprint(search_bp, url_prefix='/api/search')
+    app.register_blueprint(uploads_bp, url_prefix='/api/uploads')
     
-    start_cleanup_tasks(app)
+    register_cleanup_tasks(app)
+    if app.config.get('START_WORKERS'):
+        start_workers(app)
     
     return app
 
@@ -97,52 +126,38 @@ def configure_logging(app):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def cleanup_old_files(app):
-    while True:
-        try:
-            with app.app_context():
-                cutoff_time = time.time() - (30 * 24 * 60 * 60)
-                upload_folder = app.config['UPLOAD_FOLDER']
-                for root, dirs, files in os.walk(upload_folder):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        if os.path.getmtime(file_path) < cutoff_time:
-                            try:
-                                os.remove(file_path)
-                                logger.info(f"Deleted old file: {file_path}")
-                            except Exception as e:
-                                logger.error(f"Failed to delete file {file_path}: {str(e)}")
-        except Exception as e:
-            logger.error(f"File cleanup failed: {str(e)}")
-        time.sleep(24 * 60 * 60)
-
-def cleanup_old_reset_tokens(app):
-    while True:
-        try:
-            with app.app_context():
-                ResetToken.query.filter(ResetToken.expires_at < datetime.now(timezone.utc)).delete()
-                db.session.commit()
-                logger.info("Cleaned up expired reset tokens")
-        except Exception as e:
-            logger.error(f"Reset token cleanup failed: {str(e)}")
-        time.sleep(24 * 60 * 60)
-
-def start_cleanup_tasks(app):
-    file_cleanup_thread = Thread(target=cleanup_old_files, args=(app,), daemon=True)
-    token_cleanup_thread = Thread(target=cleanup_old_reset_tokens, args=(app,), daemon=True)
-    file_cleanup_thread.start()
-    token_cleanup_thread.start()
-    logger.info("Started background cleanup tasks")
+def cleanup_old_reset_tokens():
+    deleted = ResetToken.query.filter(ResetToken.expires_at < datetime.now(timezone.utc)).delete()
+    db.session.commit()
+    logger.info("Cleaned up expired reset tokens")
+    return {'deleted': deleted}
+
+def register_cleanup_tasks(app):
+    # Uploads, sent mail and rate limit buckets register their own tasks with the scheduler
+    scheduler.add('reset_token_cleanup', cleanup_old_reset_tokens, '0 3 * * *')
+
+def start_workers(app):
+    """Start the background threads: the scheduler and the mail and IPN queue workers.
+
+    Only processes that serve start them: `python app.py`, gunicorn workers (gunicorn.conf.py)
+    and anything run with START_WORKERS=true, e.g. `flask run`. Importing the app for migrations,
+    seed.py or a benchmark starts nothing.
+    """
+    scheduler.start(app)
+    mail_queue.start(app)
+    ipn_pipeline.start(app)
 
 app = create_app(os.getenv('FLASK_ENV', 'development'))
 
-socketio = SocketIO(
+# Shares the instance in extensions so emits from the route modules reach connected clients
+socketio.init_app(
     app,
     async_mode='eventlet',
     cors_allowed_origins=[os.getenv('FRONTEND_URL', 'http://localhost:5173')],
     cors_credentials=True,
     logger=True,
-    engineio_logger=True
+    engineio_logger=True,
+    **socketio_queue_options(app)
 )
 
 # Function to validate image URL more flexibly
@@ -154,16 +169,6 @@ def is_valid_image_url(url):
     url_lower = url.lower()
     return any(ext in url_lower for ext in image_extensions)
 
-# Function to normalize blog content (basic markdown preprocessing)
-def normalize_content(content):
-    # Ensure consistent line breaks and trim excess whitespace
-    content = re.sub(r'\n\s*\n+', '\n\n', content.strip())
-    # Convert simple markdown-like syntax to consistent format
-    content = re.sub(r'^\s*#{2}\s+(.+)$', r'## \1', content, flags=re.MULTILINE)
-    # Add paragraph breaks for single newlines
-    content = re.sub(r'(?<!\n)\n(?!\n)(?![#*-])', '\n\n', content)
-    return content
-
 @app.after_request
 def cleanup_session(response):
     try:
@@ -178,7 +183,102 @@ def cleanup_session(response):
 def index():
     return jsonify({"message": "Welcome to the Academic Assistance API!"})
 
+@app.route('/api/admin/metrics', methods=['GET', 'OPTIONS'])
+def get_metrics():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return jsonify({'error': 'Token missing or invalid'}), 401
+    if user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    return jsonify({
+        'http_client': http_client.metrics(),
+        'auth_cache': token_cache.stats(),
+        'mail_queue': mail_queue.stats(),
+        'ipn': ipn_pipeline.stats(),
+        'payment_reconcile': payment_reconciler.stats(),
+        'payment_status_cache': payment_status_cache.stats(),
+        'admin_directory': admin_directory.stats(),
+        'blog_cache': blog_list_cache.stats(),
+        'search': search_stats(),
+        'uploads': upload_store.stats(),
+        'retention': retention.stats(),
+        'rate_limit': rate_limiter.stats(),
+        'scheduler': scheduler.stats()
+    }), 200
+
+@app.route('/api/admin/retention/sweep', methods=['POST', 'OPTIONS'])
+def sweep_uploads():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return jsonify({'error': 'Token missing or invalid'}), 401
+    if user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    # Defaults to a dry run: what the next sweep would delete
+    dry_run = (request.get_json(silent=True) or {}).get('dry_run', True) is not False
+    try:
+        report = retention.sweep(dry_run=dry_run)
+        logger.info(f"Admin {user.id} ran an upload retention {'dry run' if dry_run else 'sweep'}: {report}")
+        return jsonify(report), 200
+    except Exception as e:
+        logger.error(f"Upload retention sweep failed: {str(e)}", exc_info=True)
+        db.session.rollback()
+        return jsonify({'error': 'Retention sweep failed', 'details': str(e)}), 500
+
+@app.route('/api/admin/scheduler/runs', methods=['GET', 'OPTIONS'])
+def get_scheduler_runs():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return jsonify({'error': 'Token missing or invalid'}), 401
+    if user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify([run.to_dict() for run in scheduler.history(request.args.get('task'), limit)]), 200
+
+@app.route('/api/admin/mail/dead-letters', methods=['GET', 'OPTIONS'])
+def get_dead_letters():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return jsonify({'error': 'Token missing or invalid'}), 401
+    if user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    limit = min(request.args.get('limit', 100, type=int), 500)
+    return jsonify([email.to_dict() for email in mail_queue.dead_letters(limit)]), 200
+
+@app.route('/api/admin/mail/<int:email_id>/retry', methods=['POST', 'OPTIONS'])
+def retry_dead_letter(email_id):
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return jsonify({'error': 'Token missing or invalid'}), 401
+    if user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    email = mail_queue.retry(email_id)
+    if not email:
+        return jsonify({'error': 'Dead-lettered email not found'}), 404
+    logger.info(f"Admin {user.id} requeued email {email_id}")
+    return jsonify(email.to_dict()), 200
+
 @app.route('/api/messages', methods=['POST', 'OPTIONS'])
+@app.limiter.limit('messages')
 def send_message():
     if request.method == 'OPTIONS':
         return '', 200
@@ -187,72 +287,59 @@ def send_message():
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return auth_failure()
+    if user.role == 'admin':
+        return jsonify({"error": "Admins can only message through job details"}), 403
+
     try:
-        if not hasattr(g, 'current_user'):
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            g.current_user = db.session.get(User, data['user_id'])
-            if not g.current_user:
-                return jsonify({'error': 'User not found'}), 404
+        data = request.form
+        content = data.get('content', '')
+        files = request.files.getlist('files')
+        uploads = upload_store.completed_uploads(user, data.getlist('upload_ids'))
+        if uploads is None:
+            return jsonify({"error": "Upload not found or not complete"}), 400
 
-        user = g.current_user
-        if user.role == 'admin':
-            return jsonify({"error": "Admins can only message through job details"}), 403
+        if not content and not files and not uploads:
+            return jsonify({"error": "Message content or files required"}), 400
 
-        try:
-            data = request.form
-            content = data.get('content', '')
-            files = request.files.getlist('files')
-
-            if not content and not files:
-                return jsonify({"error": "Message content or files required"}), 400
-
-            recipient = User.query.filter_by(role='admin').first()
-            if not recipient:
-                return jsonify({"error": "Admin not found"}), 404
-
-            file_paths = []
-            if files:
-                temp_folder = os.path.join(app.config['UPLOAD_FOLDER'], 'temp')
-                os.makedirs(temp_folder, exist_ok=True)
-                for file in files:
-                    if file and file.filename:
-                        if not allowed_file(file.filename):
-                            return jsonify({"error": f"File type not allowed for {file.filename}"}), 400
-                        filename = secure_filename(file.filename)
-                        filename = f"msg-{datetime.now(timezone.utc).timestamp()}-{filename}"
-                        file_path = os.path.join(temp_folder, filename)
-                        file.save(file_path)
-                        file_paths.append(os.path.join('temp', filename))
-
-            message = Message(
-                sender_id=user.id,
-                recipient_id=recipient.id,
-                sender_role=user.role,
-                content=content if content else None,
-                files=file_paths
-            )
+        recipient = admin_directory.admin_for_client(user.id)
+        if not recipient:
+            return jsonify({"error": "Admin not found"}), 404
 
-            db.session.add(message)
-            db.session.commit()
+        files = [file for file in files if file and file.filename]
+        for file in files:
+            if not allowed_file(file.filename):
+                return jsonify({"error": f"File type not allowed for {file.filename}"}), 400
 
-            socketio.emit('new_general_message', {
-                **message.to_dict(),
-                'client_id': user.id
-            }, namespace='/messages')
-            return jsonify(message.to_dict()), 201
+        message = Message(
+            sender_id=user.id,
+            recipient_id=recipient.id,
+            sender_role=user.role,
+            content=content if content else None
+        )
 
-        except Exception as e:
-            logger.error(f"General message sending failed: {str(e)}")
-            db.session.rollback()
-            return jsonify({"error": "Failed to send message", "details": str(e)}), 500
+        db.session.add(message)
+        for file in files:
+            upload_store.store(file, 'temp', 'msg', 'message', message=message, user=user)
+        for upload in uploads:
+            upload_store.attach(upload, 'temp', 'msg', 'message', message=message, user=user)
+        db.session.commit()
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+        emit_to_client('new_general_message', {
+            **message.to_dict(),
+            'client_id': user.id
+        }, user.id, '/messages')
+        return jsonify(message.to_dict()), 201
+
+    except Exception as e:
+        logger.error(f"General message sending failed: {str(e)}")
+        db.session.rollback()
+        return jsonify({"error": "Failed to send message", "details": str(e)}), 500
 
 @app.route('/api/messages/<int:message_id>', methods=['PUT', 'OPTIONS'])
+@app.limiter.limit('messages')
 def edit_message(message_id):
     if request.method == 'OPTIONS':
         return '', 200
@@ -261,15 +348,10 @@ def edit_message(message_id):
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
     try:
-        if not hasattr(g, 'current_user'):
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            g.current_user = db.session.get(User, data['user_id'])
-            if not g.current_user:
-                return jsonify({'error': 'User not found'}), 404
-
-        user = g.current_user
+        user = getattr(g, 'current_user', None)
+        if not user:
+            return auth_failure()
         message = db.session.get(Message, message_id)
         if not message:
             return jsonify({"error": "Message not found"}), 400
@@ -287,22 +369,20 @@ def edit_message(message_id):
         message.updated_at = datetime.now(timezone.utc)
         db.session.commit()
 
-        socketio.emit('message_updated', {
+        client_id = message.recipient_id if user.role == 'admin' else message.sender_id
+        emit_to_client('message_updated', {
             **message.to_dict(),
-            'client_id': message.recipient_id if user.role == 'admin' else message.sender_id
-        }, namespace='/messages')
+            'client_id': client_id
+        }, client_id, '/messages')
         logger.info(f"Message edited by user ID: {user.id}, message ID: {message_id}")
         return jsonify(message.to_dict()), 200
     except Exception as e:
         logger.error(f"Message editing failed: {str(e)}")
         db.session.rollback()
         return jsonify({"error": "Failed to edit message", "details": str(e)}), 500
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
 
 @app.route('/api/messages/<int:message_id>', methods=['DELETE', 'OPTIONS'])
+@app.limiter.limit('messages')
 def delete_message(message_id):
     if request.method == 'OPTIONS':
         return '', 200
@@ -311,12 +391,10 @@ def delete_message(message_id):
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
     try:
-        data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        user = db.session.get(User, data['user_id'])
+        user = getattr(g, 'current_user', None)
         if not user:
-            return jsonify({'error': 'User not found'}), 404
+            return auth_failure()
 
         message = db.session.get(Message, message_id)
         if not message:
@@ -335,22 +413,20 @@ def delete_message(message_id):
             db.session.delete(message)
         db.session.commit()
 
-        socketio.emit('message_deleted', {
+        client_id = message.recipient_id if user.role == 'admin' else message.sender_id
+        emit_to_client('message_deleted', {
             'message_id': message_id,
-            'client_id': message.recipient_id if user.role == 'admin' else message.sender_id
-        }, namespace='/messages')
+            'client_id': client_id
+        }, client_id, '/messages')
         logger.info(f"Message marked as deleted by user ID: {user.id}, message ID: {message_id}")
         return jsonify({"message": "Message deleted successfully"}), 200
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jupytext({'error': 'Invalid token'}), 401
     except Exception as e:
         logger.error(f"Message deletion failed: {str(e)}")
         db.session.rollback()
         return jsonify({"error": "Failed to delete message", "details": str(e)}), 500
 
 @app.route('/api/messages', methods=['GET', 'OPTIONS'])
+@app.limiter.limit('messages')
 def get_messages():
     if request.method == 'OPTIONS':
         return '', 200
@@ -359,24 +435,19 @@ def get_messages():
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
     try:
-        if not hasattr(g, 'current_user'):
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            g.current_user = db.session.get(User, data['user_id'])
-            if not g.current_user:
-                return jsonify({'error': 'User not found'}), 404
-
-        user = g.current_user
-        admin = User.query.filter_by(role='admin').first()
-        if not admin:
+        user = getattr(g, 'current_user', None)
+        if not user:
+            return auth_failure()
+        admin_ids = admin_directory.admin_ids()
+        if not admin_ids:
             return jsonify({"error": "Admin not found"}), 404
 
+        if any(arg in request.args for arg in ('limit', 'before_id', 'after_id')):
+            return list_conversation_page(user.id, admin_ids, user.role)
+
         messages = Message.query.filter(
-            or_(
-                and_(Message.sender_id == user.id, Message.recipient_id == admin.id),
-                and_(Message.sender_id == admin.id, Message.recipient_id == user.id)
-            )
+            conversation_filter(user.id, admin_ids)
         ).filter(
             or_(
                 and_(user.role == 'admin', ~Message.admin_deleted),
@@ -386,16 +457,13 @@ def get_messages():
 
         logger.info(f"General messages retrieved for user ID: {user.id}, count: {len(messages)}")
         return jsonify([msg.to_dict() for msg in messages])
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
     except Exception as e:
         logger.error(f"Failed to retrieve messages for user ID: {user.id}: {str(e)}", exc_info=True)
         return jsonify({"error": "Failed to retrieve messages", "details": str(e)}), 500
 
-@app.route('/api/jobs/<int:job_id>/messages', methods=['POST', 'OPTIONS'])
-def send_job_message(job_id):
+@app.route('/api/messages/sync', methods=['GET', 'OPTIONS'])
+@app.limiter.limit('messages')
+def sync_messages():
     if request.method == 'OPTIONS':
         return '', 200
 
@@ -403,105 +471,110 @@ def send_job_message(job_id):
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
     try:
-        if not hasattr(g, 'current_user'):
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            g.current_user = db.session.get(User, data['user_id'])
-            if not g.current_user:
-                return jsonify({'error': 'User not found'}), 404
+        user = getattr(g, 'current_user', None)
+        if not user:
+            return auth_failure()
+        admin_ids = admin_directory.admin_ids()
+        if not admin_ids:
+            return jsonify({"error": "Admin not found"}), 404
 
-        user = g.current_user
-        job = db.session.get(Job, job_id)
-        if not job:
-            return jsonify({"error": "Job not found"}), 404
+        return sync_conversation(user.id, admin_ids, user.role)
+    except Exception as e:
+        logger.error(f"Failed to sync messages: {str(e)}", exc_info=True)
+        return jsonify({"error": "Failed to sync messages", "details": str(e)}), 500
 
-        if user.role != 'admin' and job.user_id != user.id:
-            logger.error(f"Unauthorized message attempt by user ID: {user.id} for job ID: {job_id}")
-            return jsonify({"error": "Unauthorized"}), 403
+@app.route('/api/jobs/<int:job_id>/messages', methods=['POST', 'OPTIONS'])
+@app.limiter.limit('messages')
+def send_job_message(job_id):
+    if request.method == 'OPTIONS':
+        return '', 200
 
-        try:
-            data = request.form
-            content = data.get('content', '')
-            completed_files = request.files.getlist('completed_files') if user.role == 'admin' else []
-            additional_files = request.files.getlist('files') if user.role == 'client' else []
+    token = request.headers.get('Authorization')
+    if not token or not token.startswith('Bearer '):
+        return jsonify({'error': 'Token missing or invalid'}), 401
 
-            if not content and not completed_files and not additional_files:
-                return jsonify({"error": "Message content or files required"}), 400
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return auth_failure()
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
 
-            job_folder = os.path.join(app.config['UPLOAD_FOLDER'], f"job_{job_id}")
-            os.makedirs(job_folder, exist_ok=True)
-            
-            completed_file_paths = []
-            for file in completed_files:
-                if file and file.filename:
-                    if not allowed_file(file.filename):
-                        return jsonify({"error": f"File type not allowed for {file.filename}"}), 400
-                    filename = secure_filename(file.filename)
-                    filename = f"completed-{datetime.now(timezone.utc).timestamp()}-{filename}"
-                    file_path = os.path.join(job_folder, filename)
-                    file.save(file_path)
-                    completed_file_paths.append(os.path.join(f"job_{job_id}", filename))
-            
-            additional_file_paths = []
-            for file in additional_files:
-                if file and file.filename:
-                    if not allowed_file(file.filename):
-                        return jsonify({"error": f"File type not allowed for {file.filename}"}), 400
-                    filename = secure_filename(file.filename)
-                    filename = f"additional-{datetime.now(timezone.utc).timestamp()}-{filename}"
-                    file_path = os.path.join(job_folder, filename)
-                    file.save(file_path)
-                    additional_file_paths.append(os.path.join(f"job_{job_id}", filename))
-
-            recipient_id = job.user_id if user.role == 'admin' else User.query.filter_by(role='admin').first().id
-            if not recipient_id:
-                return jsonify({"error": "Recipient not found"}), 404
-
-            message = Message(
-                job_id=job_id,
-                sender_id=user.id,
-                recipient_id=recipient_id,
-                sender_role=user.role,
-                content=content if content else None,
-                files=completed_file_paths + additional_file_paths
-            )
+    if user.role != 'admin' and job.user_id != user.id:
+        logger.error(f"Unauthorized message attempt by user ID: {user.id} for job ID: {job_id}")
+        return jsonify({"error": "Unauthorized"}), 403
 
-            db.session.add(message)
-            
-            if user.role == 'admin' and completed_file_paths:
-                if not job.completed_files:
-                    job.completed_files = []
-                job.completed_files.extend(completed_file_paths)
-                job.status = 'Completed'
-                job.completed = True
-            elif user.role == 'client' and additional_file_paths:
-                if not job.files:
-                    job.files = []
-                job.files.extend(additional_file_paths)
-            
-            db.session.commit()
-
-            socketio.emit('new_general_message', {
-                **message.to_dict(),
-                'client_id': job.user_id,
-                'sender_role': user.role
-            }, namespace='/messages')
-            socketio.emit('job_updated', job.to_dict(), namespace='/jobs')
+    try:
+        data = request.form
+        content = data.get('content', '')
+        completed_files = request.files.getlist('completed_files') if user.role == 'admin' else []
+        additional_files = request.files.getlist('files') if user.role == 'client' else []
+        # Large files sent beforehand through /api/uploads, by id
+        uploads = upload_store.completed_uploads(user, data.getlist('upload_ids'))
+        if uploads is None:
+            return jsonify({"error": "Upload not found or not complete"}), 400
+        completed_uploads = uploads if user.role == 'admin' else []
+        additional_uploads = uploads if user.role == 'client' else []
+
+        if not (content or completed_files or additional_files or completed_uploads or additional_uploads):
+            return jsonify({"error": "Message content or files required"}), 400
+
+        completed_files = [file for file in completed_files if file and file.filename]
+        additional_files = [file for file in additional_files if file and file.filename]
+        for file in completed_files + additional_files:
+            if not allowed_file(file.filename):
+                return jsonify({"error": f"File type not allowed for {file.filename}"}), 400
+
+        if user.role == 'admin':
+            recipient_id = job.user_id
+        else:
+            admin = admin_directory.admin_for_client(user.id)
+            recipient_id = admin.id if admin else None
+        if not recipient_id:
+            return jsonify({"error": "Recipient not found"}), 404
+
+        message = Message(
+            job_id=job_id,
+            sender_id=user.id,
+            recipient_id=recipient_id,
+            sender_role=user.role,
+            content=content if content else None
+        )
+
+        db.session.add(message)
+        # Stored once per distinct content and linked into the job's folder
+        for file in completed_files:
+            upload_store.store(file, f"job_{job_id}", 'completed', 'completed', job=job, message=message, user=user)
+        for file in additional_files:
+            upload_store.store(file, f"job_{job_id}", 'additional', 'job', job=job, message=message, user=user)
+        for upload in completed_uploads:
+            upload_store.attach(upload, f"job_{job_id}", 'completed', 'completed', job=job, message=message, user=user)
+        for upload in additional_uploads:
+            upload_store.attach(upload, f"job_{job_id}", 'additional', 'job', job=job, message=message, user=user)
+
+        if user.role == 'admin' and (completed_files or completed_uploads):
+            job.status = 'Completed'
+            job.completed = True
             
-            return jsonify(message.to_dict()), 201
+        db.session.commit()
 
-        except Exception as e:
-            logger.error(f"Job message sending failed: {str(e)}", exc_info=True)
-            db.session.rollback()
-            return jsonify({"error": "Failed to send message", "details": str(e)}), 500
+        emit_to_job('new_general_message', {
+            **message.to_dict(),
+            'client_id': job.user_id,
+            'sender_role': user.role
+        }, job, '/messages')
+        emit_to_job('job_updated', job.to_dict(), job, '/jobs')
+            
+        return jsonify(message.to_dict()), 201
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+    except Exception as e:
+        logger.error(f"Job message sending failed: {str(e)}", exc_info=True)
+        db.session.rollback()
+        return jsonify({"error": "Failed to send message", "details": str(e)}), 500
 
 @app.route('/api/jobs/<int:job_id>/messages', methods=['GET', 'OPTIONS'])
+@app.limiter.limit('messages')
 def get_job_messages(job_id):
     if request.method == 'OPTIONS':
         return '', 200
@@ -510,15 +583,10 @@ def get_job_messages(job_id):
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
     try:
-        if not hasattr(g, 'current_user'):
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            g.current_user = db.session.get(User, data['user_id'])
-            if not g.current_user:
-                return jsonify({'error': 'User not found'}), 404
-
-        user = g.current_user
+        user = getattr(g, 'current_user', None)
+        if not user:
+            return auth_failure()
         job = db.session.get(Job, job_id)
         if not job:
             return jsonify({"error": "Job not found"}), 404
@@ -527,59 +595,78 @@ def get_job_messages(job_id):
             logger.error(f"Unauthorized message access attempt by user ID: {user.id} for job ID: {job_id}")
             return jsonify({"error": "Unauthorized"}), 403
 
-        admin = User.query.filter_by(role='admin').first()
-        if not admin:
-            return jsonify({"error": "Admin not found"}), 404
+        if any(arg in request.args for arg in ('limit', 'before_id', 'after_id')):
+            return list_job_messages_page(job.id, user.role)
 
-        messages = Message.query.filter(
-            or_(
-                and_(Message.sender_id == job.user_id, Message.recipient_id == admin.id),
-                and_(Message.sender_id == admin.id, Message.recipient_id == job.user_id)
-            )
-        ).filter(
-            or_(
-                and_(user.role == 'admin', ~Message.admin_deleted),
-                and_(user.role == 'client', ~Message.client_deleted)
-            )
-        ).order_by(Message.created_at).all()
+        messages = job_messages(job.id, user.role)
 
         logger.info(f"Messages retrieved for job ID: {job_id}, count: {len(messages)}")
         return jsonify([msg.to_dict() for msg in messages])
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
     except Exception as e:
         logger.error(f"Failed to retrieve messages for job ID: {job_id}: {str(e)}", exc_info=True)
         return jsonify({"error": "Failed to retrieve messages", "details": str(e)}), 500
 
+@app.route('/api/jobs/<int:job_id>/messages/sync', methods=['GET', 'OPTIONS'])
+@app.limiter.limit('messages')
+def sync_job_messages(job_id):
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    token = request.headers.get('Authorization')
+    if not token or not token.startswith('Bearer '):
+        return jsonify({'error': 'Token missing or invalid'}), 401
+
+    try:
+        user = getattr(g, 'current_user', None)
+        if not user:
+            return auth_failure()
+        job = db.session.get(Job, job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+
+        if user.role != 'admin' and job.user_id != user.id:
+            logger.error(f"Unauthorized message sync attempt by user ID: {user.id} for job ID: {job_id}")
+            return jsonify({"error": "Unauthorized"}), 403
+
+        return sync_job_thread(job.id, user.role)
+    except Exception as e:
+        logger.error(f"Failed to sync messages for job ID: {job_id}: {str(e)}", exc_info=True)
+        return jsonify({"error": "Failed to sync messages", "details": str(e)}), 500
+
 @app.route('/api/files/<path:filename>', methods=['GET', 'OPTIONS'])
-@app.limiter.limit("1000 per hour")  # Use limiter.limit for Flask-Limiter 3.8.0
+@app.limiter.limit('files')
 def get_file(filename):
     if request.method == 'OPTIONS':
         return '', 200
 
     is_preview = request.args.get('preview') == 'true'
 
-    if not is_preview:
+    if 'signature' in request.args:
+        # Signed links were authorized when they were issued; checking one needs no database access
+        filename = os.path.normpath(filename).replace('\\', '/')
+        if not verify_signature(filename, request.args.get('expires'), request.args.get('signature')):
+            logger.warning(f"Rejected signed download link for: {filename}")
+            return jsonify({"error": "Download link invalid or expired"}), 403
+        try:
+            return send_upload(filename, download_name=filename.split('/')[-1])
+        except FileNotFoundError:
+            logger.error(f"File not found: {filename}")
+            return jsonify({"error": f"File not found: {filename}"}), 404
+
+    # The auth middleware has already resolved the bearer token; only failures are re-checked
+    user = getattr(g, 'current_user', None)
+    if not is_preview and not user:
         token = request.headers.get('Authorization')
         if not token or not token.startswith('Bearer '):
             return jsonify({'error': 'Token missing or invalid'}), 401
-
-        token = token.split(' ')[1]
         try:
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            user = db.session.get(User, data['user_id'])
-            if not user:
-                logger.error(f"User not found for file download: {filename}")
-                return jsonify({'error': 'User not found'}), 404
+            resolve_token(token.split(' ')[1])
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token expired'}), 401
         except jwt.InvalidTokenError:
             return jsonify({'error': 'Invalid token'}), 401
-        except Exception as e:
-            logger.error(f"File access error: {str(e)}")
-            return jsonify({"error": "Failed to access file", "details": str(e)}), 500
+        logger.error(f"User not found for file download: {filename}")
+        return jsonify({'error': 'User not found'}), 404
 
     try:
         filename = os.path.normpath(filename).replace('\\', '/')
@@ -600,43 +687,25 @@ def get_file(filename):
                 return jsonify({"error": "Invalid job ID in file path"}), 400
             job_id = int(job_id_str)
 
-        if is_preview or user.role == 'admin' or path_parts[0] in ['temp', 'blog']:
-            try:
-                as_attachment = not is_preview
-                return send_from_directory(
-                    app.config['UPLOAD_FOLDER'],
-                    filename,
-                    as_attachment=as_attachment,
-                    download_name=path_parts[-1]
-                )
-            except FileNotFoundError:
-                logger.error(f"File not found: {filename}")
-                return jsonify({"error": f"File not found: {filename}"}), 404
-
-        if not job_id:
-            logger.error(f"Invalid file path for client: {filename}")
-            return jsonify({"error": "Invalid file path"}), 400
+        if not (is_preview or user.role == 'admin' or path_parts[0] in ['temp', 'blog']):
+            if not job_id:
+                logger.error(f"Invalid file path for client: {filename}")
+                return jsonify({"error": "Invalid file path"}), 400
+
+            owner_id = db.session.query(Job.user_id).filter_by(id=job_id).scalar()
+            if owner_id is None:
+                logger.error(f"Job not found for file: {filename}, job_id: {job_id}")
+                return jsonify({"error": "Job not found"}), 404
+            if owner_id != user.id:
+                logger.error(f"Unauthorized file access attempt by user ID: {user.id} for filename: {filename}")
+                return jsonify({"error": "Unauthorized"}), 403
 
-        job = db.session.get(Job, job_id)
-        if not job:
-            logger.error(f"Job not found for file: {filename}, job_id: {job_id}")
-            return jsonify({"error": "Job not found"}), 404
-        if job.user_id != user.id:
-            logger.error(f"Unauthorized file access attempt by user ID: {user.id} for filename: {filename}")
-            return jsonify({"error": "Unauthorized"}), 403
-            
         try:
-            as_attachment = not is_preview
-            return send_from_directory(
-                app.config['UPLOAD_FOLDER'],
-                filename,
-                as_attachment=as_attachment,
-                download_name=path_parts[-1]
-            )
+            return send_upload(filename, as_attachment=not is_preview, download_name=path_parts[-1])
         except FileNotFoundError:
             logger.error(f"File not found: {filename}")
             return jsonify({"error": f"File not found: {filename}"}), 404
-        
+
     except Exception as e:
         logger.error(f"File download error: {str(e)}")
         return jsonify({"error": "Failed to download file", "details": str(e)}), 500
@@ -650,57 +719,51 @@ def create_blog():
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
-    try:
-        data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        user = db.session.get(User, data['user_id'])
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        if user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
-
-        try:
-            data = request.form
-            title = data.get('title')
-            content = data.get('content')
-            email = data.get('email')
-            url = data.get('url')
-            image_url = data.get('image_url')  # Changed from image file to image_url
-
-            if not title or not content:
-                return jsonify({"error": "Title and content are required"}), 400
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return auth_failure()
+    if user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
 
-            # Removed strict image URL validation - rely on frontend preview
-            # if image_url and not is_valid_image_url(image_url):
-            #     return jsonify({"error": "Image URL must reference a valid image (e.g., containing .png, .jpg, .jpeg, or .gif)"}), 400
-
-            # Normalize content
-            content = normalize_content(content)
-
-            blog = Blog(
-                title=title,
-                content=content,
-                image=image_url,  # Store the URL directly
-                email=email,
-                url=url,
-                author_id=user.id
-            )
-            db.session.add(blog)
-            db.session.commit()
-
-            socketio.emit('new_blog', blog.to_dict(), namespace='/blogs')
-            logger.info(f"Blog created by user ID: {user.id}, blog ID: {blog.id}")
-            return jsonify({"message": "Blog created successfully", "blog_id": blog.id}), 201
+    try:
+        data = request.form
+        title = data.get('title')
+        content = data.get('content')
+        email = data.get('email')
+        url = data.get('url')
+        image_url = data.get('image_url')  # Changed from image file to image_url
+
+        if not title or not content:
+            return jsonify({"error": "Title and content are required"}), 400
+
+        # Removed strict image URL validation - rely on frontend preview
+        # if image_url and not is_valid_image_url(image_url):
+        #     return jsonify({"error": "Image URL must reference a valid image (e.g., containing .png, .jpg, .jpeg, or .gif)"}), 400
+
+        # Normalize content
+        content = normalize_content(content)
+
+        blog = Blog(
+            title=title,
+            content=content,
+            image=image_url,  # Store the URL directly
+            email=email,
+            url=url,
+            author_id=user.id,
+            **render_content(content)
+        )
+        db.session.add(blog)
+        db.session.commit()
 
-        except Exception as e:
-            logger.error(f"Blog creation failed: {str(e)}")
-            db.session.rollback()
-            return jsonify({"error": "Failed to create blog", "details": str(e)}), 500
+        blog_list_cache.invalidate()
+        socketio.emit('new_blog', blog.to_summary_dict(), namespace='/blogs')
+        logger.info(f"Blog created by user ID: {user.id}, blog ID: {blog.id}")
+        return jsonify({"message": "Blog created successfully", "blog_id": blog.id}), 201
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+    except Exception as e:
+        logger.error(f"Blog creation failed: {str(e)}")
+        db.session.rollback()
+        return jsonify({"error": "Failed to create blog", "details": str(e)}), 500
 
 @app.route('/api/blogs', methods=['GET', 'OPTIONS'])
 def get_blogs():
@@ -710,14 +773,7 @@ def get_blogs():
     try:
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 6))
-        blogs = Blog.query.order_by(Blog.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-
-        return jsonify({
-            'blogs': [blog.to_dict() for blog in blogs.items],
-            'total': blogs.total,
-            'pages': blogs.pages,
-            'current_page': blogs.page
-        }), 200
+        return blog_list_response(page, per_page)
     except Exception as e:
         logger.error(f"Failed to retrieve blogs: {str(e)}")
         return jsonify({"error": "Failed to retrieve blogs", "details": str(e)}), 500
@@ -745,57 +801,52 @@ def update_blog(blog_id):
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return auth_failure()
+    if user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    blog = db.session.get(Blog, blog_id)
+    if not blog:
+        return jsonify({"error": "Blog not found"}), 404
+
     try:
-        data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        user = db.session.get(User, data['user_id'])
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        if user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
+        data = request.form
+        title = data.get('title')
+        content = data.get('content')
+        email = data.get('email')
+        url = data.get('url')
+        image_url = data.get('image_url')  # Changed from image file to image_url
+
+        if title:
+            blog.title = title
+        if content:
+            blog.content = normalize_content(content)
+            for field, value in render_content(blog.content).items():
+                setattr(blog, field, value)
+        if email is not None:
+            blog.email = email
+        if url is not None:
+            blog.url = url
+        if image_url is not None:  # Allow empty string to clear the image
+            # Removed strict image URL validation - rely on frontend preview
+            # if image_url and not is_valid_image_url(image_url):
+            #     return jsonify({"error": "Image URL must reference a valid image (e.g., containing .png, .jpg, .jpeg, or .gif)"}), 400
+            blog.image = image_url
 
-        blog = db.session.get(Blog, blog_id)
-        if not blog:
-            return jsonify({"error": "Blog not found"}), 404
+        blog.updated_at = datetime.now(timezone.utc)
+        db.session.commit()
 
-        try:
-            data = request.form
-            title = data.get('title')
-            content = data.get('content')
-            email = data.get('email')
-            url = data.get('url')
-            image_url = data.get('image_url')  # Changed from image file to image_url
-
-            if title:
-                blog.title = title
-            if content:
-                blog.content = normalize_content(content)
-            if email is not None:
-                blog.email = email
-            if url is not None:
-                blog.url = url
-            if image_url is not None:  # Allow empty string to clear the image
-                # Removed strict image URL validation - rely on frontend preview
-                # if image_url and not is_valid_image_url(image_url):
-                #     return jsonify({"error": "Image URL must reference a valid image (e.g., containing .png, .jpg, .jpeg, or .gif)"}), 400
-                blog.image = image_url
-
-            blog.updated_at = datetime.now(timezone.utc)
-            db.session.commit()
-
-            socketio.emit('blog_updated', blog.to_dict(), namespace='/blogs')
-            logger.info(f"Blog updated by user ID: {user.id}, blog ID: {blog.id}")
-            return jsonify({"message": "Blog updated successfully"}), 200
-
-        except Exception as e:
-            logger.error(f"Blog update failed: {str(e)}")
-            db.session.rollback()
-            return jsonify({"error": "Failed to update blog", "details": str(e)}), 500
-
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+        blog_list_cache.invalidate()
+        socketio.emit('blog_updated', blog.to_summary_dict(), namespace='/blogs')
+        logger.info(f"Blog updated by user ID: {user.id}, blog ID: {blog.id}")
+        return jsonify({"message": "Blog updated successfully"}), 200
+
+    except Exception as e:
+        logger.error(f"Blog update failed: {str(e)}")
+        db.session.rollback()
+        return jsonify({"error": "Failed to update blog", "details": str(e)}), 500
 
 @app.route('/api/blogs/<int:blog_id>', methods=['DELETE', 'OPTIONS'])
 def delete_blog(blog_id):
@@ -806,40 +857,34 @@ def delete_blog(blog_id):
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
-    try:
-        data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        user = db.session.get(User, data['user_id'])
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        if user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
-
-        blog = db.session.get(Blog, blog_id)
-        if not blog:
-            return jsonify({"error": "Blog not found"}), 404
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return auth_failure()
+    if user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
 
-        try:
-            if blog.image and os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], blog.image)):
-                os.remove(os.path.join(app.config['UPLOAD_FOLDER'], blog.image))
-            db.session.delete(blog)
-            db.session.commit()
+    blog = db.session.get(Blog, blog_id)
+    if not blog:
+        return jsonify({"error": "Blog not found"}), 404
 
-            socketio.emit('blog_deleted', {'blog_id': blog_id}, namespace='/blogs')
-            logger.info(f"Blog deleted by user ID: {user.id}, blog ID: {blog_id}")
-            return jsonify({"message": "Blog deleted successfully"}), 200
+    try:
+        if blog.image and os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], blog.image)):
+            os.remove(os.path.join(app.config['UPLOAD_FOLDER'], blog.image))
+        db.session.delete(blog)
+        db.session.commit()
 
-        except Exception as e:
-            logger.error(f"Blog deletion failed: {str(e)}")
-            db.session.rollback()
-            return jsonify({"error": "Failed to delete blog", "details": str(e)}), 500
+        blog_list_cache.invalidate()
+        socketio.emit('blog_deleted', {'blog_id': blog_id}, namespace='/blogs')
+        logger.info(f"Blog deleted by user ID: {user.id}, blog ID: {blog_id}")
+        return jsonify({"message": "Blog deleted successfully"}), 200
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+    except Exception as e:
+        logger.error(f"Blog deletion failed: {str(e)}")
+        db.session.rollback()
+        return jsonify({"error": "Failed to delete blog", "details": str(e)}), 500
 
 @app.route('/api/contact', methods=['POST', 'OPTIONS'])
+@app.limiter.limit('auth')
 def contact():
     if request.method == 'OPTIONS':
         return '', 200
@@ -850,12 +895,11 @@ def contact():
         if not user_email:
             return jsonify({"error": "Email required"}), 400
 
-        admin_emails = os.getenv('ADMIN_EMAILS', '').split(',')
-        if not admin_emails:
+        if not admin_directory.admin_emails:
             return jsonify({"error": "No admin emails configured"}), 500
 
         # Select one random admin email as per "one of given"
-        recipient = random.choice(admin_emails)
+        recipient = random.choice(admin_directory.admin_emails)
 
         from flask_mail import Message
         msg = Message(
@@ -864,9 +908,9 @@ def contact():
             recipients=[recipient]
         )
         msg.body = f"Hello, I would like to get more information about your services. My email is {user_email}."
-        mail.send(msg)
+        mail_queue.enqueue(msg)
 
-        logger.info(f"Contact email sent to {recipient} from {user_email}")
+        logger.info(f"Contact email queued for {recipient} from {user_email}")
         return jsonify({"message": "Thank you for contacting us! We will get back to you soon."}), 200
     except Exception as e:
         logger.error(f"Contact email failed: {str(e)}")
@@ -883,12 +927,13 @@ def handle_job_connect(auth):
 
     with app.app_context():
         try:
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            user = db.session.get(User, data['user_id'])
+            user, _ = resolve_token(token)
             if not user:
                 logger.error("SocketIO /jobs connect: User not found")
                 disconnect()
                 return
+            session['user'] = user
+            join_user_rooms(user)
             logger.info(f"Client connected to /jobs namespace, user ID: {user.id}")
         except (jwt.ExpiredSignatureError, jwt.InvalidTokenError) as e:
             logger.error(f"SocketIO /jobs connect: Invalid token - {str(e)}")
@@ -905,17 +950,38 @@ def handle_message_connect(auth):
 
     with app.app_context():
         try:
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            user = db.session.get(User, data['user_id'])
+            user, _ = resolve_token(token)
             if not user:
                 logger.error("SocketIO /messages connect: User not found")
                 disconnect()
                 return
+            session['user'] = user
+            join_user_rooms(user)
             logger.info(f"Client connected to /messages namespace, user ID: {user.id}")
         except (jwt.ExpiredSignatureError, jwt.InvalidTokenError) as e:
             logger.error(f"SocketIO /messages connect: Invalid token - {str(e)}")
             disconnect()
 
+@socketio.on('subscribe_job', namespace='/jobs')
+@socketio.on('subscribe_job', namespace='/messages')
+def handle_subscribe_job(data):
+    user = session.get('user')
+    job_id = (data or {}).get('job_id')
+    if not user or not isinstance(job_id, int):
+        return {'error': 'job_id required'}
+    with app.app_context():
+        if not subscribe_job(user, job_id):
+            return {'error': 'Unauthorized'}
+    return {'subscribed': job_id}
+
+@socketio.on('unsubscribe_job', namespace='/jobs')
+@socketio.on('unsubscribe_job', namespace='/messages')
+def handle_unsubscribe_job(data):
+    job_id = (data or {}).get('job_id')
+    if isinstance(job_id, int):
+        unsubscribe_job(job_id)
+    return {'unsubscribed': job_id}
+
 @socketio.on('connect', namespace='/blogs')
 def handle_blog_connect(auth):
     from flask import request
@@ -926,8 +992,7 @@ def handle_blog_connect(auth):
 
     with app.app_context():
         try:
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            user = db.session.get(User, data['user_id'])
+            user, _ = resolve_token(token)
             if not user:
                 logger.error("SocketIO /blogs connect: User not found")
                 disconnect()
@@ -938,4 +1003,5 @@ def handle_blog_connect(auth):
             disconnect()
 
 if __name__ == '__main__':
+    start_workers(app)
     socketio.run(app, debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
@@ -0,0 +1,93 @@
+# Benchmark: requests/sec on GET /api/jobs with the auth token cache on and off.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_auth_cache.py [--requests 2000] [--jobs 50]
+#
+# Runs against a throwaway SQLite database unless DATABASE_URL is already set.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-auth-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+
+import logging
+from datetime import datetime, timedelta
+
+from app import app
+from extensions import db
+from models import User, Job
+from server.routes.auth import generate_tokens
+from server.services.auth_cache import token_cache
+
+
+def seed(num_jobs):
+    with app.app_context():
+        db.create_all()
+        client = User(email='bench-client@example.com', name='Bench Client', role='client')
+        db.session.add(client)
+        db.session.commit()
+        for i in range(num_jobs):
+            db.session.add(Job(
+                user_id=client.id,
+                client_name=client.name,
+                client_email=client.email,
+                subject='Mathematics',
+                title=f'Bench job {i}',
+                pages=2,
+                deadline=datetime.utcnow() + timedelta(days=7),
+                instructions='Benchmark instructions',
+                total_amount=12,
+                payment_status='Partial',
+                status='In Progress'
+            ))
+        db.session.commit()
+        access_token, _ = generate_tokens(client)
+        return access_token
+
+
+def run(token, num_requests, cache_enabled):
+    app.config['AUTH_CACHE_ENABLED'] = cache_enabled
+    token_cache.clear()
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    client.get('/api/jobs', headers=headers)  # warm up
+    start = time.perf_counter()
+    for _ in range(num_requests):
+        response = client.get('/api/jobs', headers=headers)
+        assert response.status_code == 200, response.data
+    elapsed = time.perf_counter() - start
+    return num_requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--jobs', type=int, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    app.limiter.enabled = False
+    token = seed(args.jobs)
+
+    uncached = run(token, args.requests, cache_enabled=False)
+    cached = run(token, args.requests, cache_enabled=True)
+
+    print(f"GET /api/jobs x {args.requests} ({args.jobs} jobs)")
+    print(f"  cache off: {uncached:8.1f} req/s")
+    print(f"  cache on:  {cached:8.1f} req/s  ({cached / uncached:.2f}x)")
+    print(f"  cache stats: {token_cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
+    os._exit(0)  # don't wait on the app's background cleanup threads
@@ -0,0 +1,119 @@
+# Benchmark: GET /api/blogs, old paginate + lazy author loads + full content vs the joined summary
+# query, a cache hit, and a 304 revalidation.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_blog_listing.py [--blogs 2000] [--authors 20] [--per-page 6,50] [--requests 200]
+#
+# Runs against a throwaway SQLite database unless DATABASE_URL is already set.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-blogs-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+os.environ['SOCKETIO_MESSAGE_QUEUE'] = 'local'
+
+import logging
+from datetime import datetime, timedelta
+
+from flask import request, jsonify
+from sqlalchemy import event
+
+from app import app
+from extensions import db
+from models import User, Blog
+from server.services.blogs import blog_list_cache
+from server.services.blog_render import normalize_content, render_content
+
+queries = [0]
+
+
+def old_get_blogs():
+    # GET /api/blogs before the listing service
+    page = int(request.args.get('page', 1))
+    per_page = int(request.args.get('per_page', 6))
+    blogs = Blog.query.order_by(Blog.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    return jsonify({
+        'blogs': [{**blog.to_dict(), 'content_html': None} for blog in blogs.items],  # it had content only
+        'total': blogs.total,
+        'pages': blogs.pages,
+        'current_page': blogs.page
+    }), 200
+
+
+def timed(fn, requests):
+    latencies = []
+    before = queries[0]
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)[len(latencies) // 2] * 1000, (queries[0] - before) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blogs', type=int, default=2000)
+    parser.add_argument('--authors', type=int, default=20)
+    parser.add_argument('--per-page', default='6,50')
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    app.limiter.enabled = False
+    app.add_url_rule('/bench/old-blogs', 'bench_old_blogs', old_get_blogs)
+    client = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+        authors = [User(email=f'bench-author-{i}@example.com', name=f'Author {i}', role='admin') for i in range(args.authors)]
+        db.session.add_all(authors)
+        db.session.commit()
+        author_ids = [author.id for author in authors]
+        start = datetime.utcnow() - timedelta(days=args.blogs)
+        content = normalize_content('## Lorem ipsum\n' + 'Lorem ipsum dolor sit amet, **consectetur** adipiscing elit. ' * 200)
+        rendered = render_content(content)
+        db.session.execute(db.insert(Blog), [{
+            'title': f'Post {i}', 'content': content, 'author_id': author_ids[i % len(author_ids)],
+            'created_at': start + timedelta(days=i), 'updated_at': start + timedelta(days=i), **rendered
+        } for i in range(args.blogs)])
+        db.session.commit()
+
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: queries.__setitem__(0, queries[0] + 1))
+
+        print(f"{args.blogs} blogs by {args.authors} authors, median ms and SQL queries per request")
+        print(f"{'per_page':>9} {'old':>16} {'joined, uncached':>18} {'cache hit':>16} {'304':>16}   body size")
+        for per_page in (int(n) for n in args.per_page.split(',')):
+            url = f'/api/blogs?page=2&per_page={per_page}'
+            old_url = url.replace('/api/blogs', '/bench/old-blogs')
+            old, new = client.get(old_url), client.get(url)
+            assert [b['id'] for b in new.json['blogs']] == [b['id'] for b in old.json['blogs']]
+            assert new.json['total'] == old.json['total']
+
+            def request_uncached():
+                blog_list_cache.invalidate()
+                assert client.get(url).status_code == 200
+
+            etag = client.get(url).headers['ETag']
+            results = [
+                timed(lambda: client.get(old_url), args.requests),
+                timed(request_uncached, args.requests),
+                timed(lambda: client.get(url), args.requests),
+                timed(lambda: client.get(url, headers={'If-None-Match': etag}), args.requests)
+            ]
+            assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+            print(f"{per_page:>9} " + ' '.join(f"{ms:>9.2f} ms {q:>3.0f}q" for ms, q in results) +
+                  f"   {len(old.data) / 1024:.1f} KB -> {len(new.data) / 1024:.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
+    os._exit(0)  # don't wait on the app's background threads
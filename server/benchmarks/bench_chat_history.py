@@ -0,0 +1,102 @@
+# Benchmark: opening a long client/admin chat thread, full history vs one page, and opening one
+# job (50 of those messages belong to it) as the client's history grows.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_chat_history.py [--messages 1000,5000,20000] [--requests 50]
+#
+# Runs against a throwaway SQLite database unless DATABASE_URL is already set.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-chat-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+os.environ['SOCKETIO_MESSAGE_QUEUE'] = 'local'
+
+import logging
+from datetime import datetime, timedelta
+
+from app import app
+from extensions import db
+from models import User, Job, Message
+from server.routes.auth import generate_tokens
+
+
+def seed_thread(client_id, admin_id, count, job_id):
+    start = datetime.utcnow() - timedelta(days=365)
+    rows = []
+    for i in range(count):
+        sender, recipient, role = (client_id, admin_id, 'client') if i % 2 else (admin_id, client_id, 'admin')
+        created = start + timedelta(minutes=i)
+        rows.append({
+            'sender_id': sender, 'recipient_id': recipient, 'sender_role': role,
+            'content': f'Message {i} ' + 'lorem ipsum ' * 10,
+            'client_deleted': False, 'admin_deleted': False, 'created_at': created, 'updated_at': created,
+            'job_id': job_id if i >= count - 50 else None
+        })
+    db.session.execute(db.insert(Message), rows)
+    db.session.commit()
+
+
+def timed(client, url, headers, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.json
+    return sorted(latencies)[len(latencies) // 2] * 1000, response.json
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', default='1000,5000,20000')
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    app.limiter.enabled = False
+    test_client = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+        admin = User(email='bench-admin@example.com', name='Bench Admin', role='admin')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+
+        print(f"{'messages':>9} {'full history':>13} {'latest page':>12} {'oldest page':>12} {'job detail':>11}   (median ms, 50 per page)")
+        for i, count in enumerate(int(n) for n in args.messages.split(',')):
+            client = User(email=f'bench-client-{i}@example.com', name='Bench Client', role='client')
+            db.session.add(client)
+            db.session.commit()
+            client_id = client.id
+            headers = {'Authorization': f'Bearer {generate_tokens(client)[0]}'}
+            job = Job(user_id=client_id, subject='Mathematics', title='Bench job', pages=2, payment_status='Partial',
+                      deadline=datetime.utcnow() + timedelta(days=7), instructions='Benchmark', total_amount=12)
+            db.session.add(job)
+            db.session.commit()
+            job_id = job.id
+            seed_thread(client_id, admin_id, count, job_id)
+            oldest_id = db.session.query(db.func.min(Message.id)).filter(Message.recipient_id == client_id).scalar()
+
+            full_ms, _ = timed(test_client, '/api/messages', headers, max(5, args.requests // 10))
+            latest_ms, page = timed(test_client, '/api/messages?limit=50', headers, args.requests)
+            assert len(page['messages']) == 50 and page['has_more']
+            oldest_ms, _ = timed(test_client, f'/api/messages?limit=50&after_id={oldest_id}', headers, args.requests)
+            job_ms, detail = timed(test_client, f'/api/jobs/{job_id}', headers, args.requests)
+            assert len(detail['messages']) == 50
+            print(f"{count:>9} {full_ms:>13.1f} {latest_ms:>12.1f} {oldest_ms:>12.1f} {job_ms:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
+    os._exit(0)  # don't wait on the app's background threads
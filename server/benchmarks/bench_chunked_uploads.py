@@ -0,0 +1,134 @@
+# Benchmark: sending a large attachment over a flaky link, one multipart POST that starts over on
+# every drop vs resumable chunks through /api/uploads attached by id.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_chunked_uploads.py [--size-mb 80] [--drop-per-mb 0.02] [--trials 5]
+#
+# The link is simulated: each MB sent is lost with probability --drop-per-mb (seeded, the same for
+# both rows), and a lost transfer is retried from where the protocol allows. Only the attempts that
+# get through are sent to the app (test client, throwaway SQLite database). Reports MB put on the
+# wire, the largest single request (on a slow link, how long one request ties up a worker and its
+# connection) and the server's wall time.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-chunked-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+os.environ['SOCKETIO_MESSAGE_QUEUE'] = 'local'
+
+import io
+import logging
+from datetime import datetime
+
+from app import app
+from extensions import db
+from models import User, Job
+from server.routes.auth import generate_tokens
+
+MB = 1024 * 1024
+
+
+def delivered(rng, size, drop_per_mb):
+    """MB sent before the link drops, or None if all of size got through."""
+    for sent in range(0, size, MB):
+        if rng.random() < drop_per_mb:
+            return sent / MB
+    return None
+
+
+def single_post(client, headers, job_id, data, rng, drop_per_mb):
+    wire, server = 0.0, 0.0
+    while True:
+        lost = delivered(rng, len(data), drop_per_mb)
+        if lost is not None:
+            wire += lost  # the whole file goes again
+            continue
+        wire += len(data) / MB
+        start = time.perf_counter()
+        response = client.post(f'/api/jobs/{job_id}/messages', headers=headers,
+                               data={'files': (io.BytesIO(data), 'bench.zip')}, content_type='multipart/form-data')
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 201, response.json
+        return wire, len(data) / MB, server + elapsed
+
+
+def chunked(client, headers, job_id, data, rng, drop_per_mb):
+    chunk_size = app.config['UPLOAD_CHUNK_SIZE']
+    wire, largest, server = 0.0, 0.0, 0.0
+
+    def call(method, url, **kwargs):
+        nonlocal largest, server
+        largest = max(largest, len(kwargs.get('data') or b'') / MB)
+        start = time.perf_counter()
+        response = getattr(client, method)(url, headers={**headers, **kwargs.pop('extra_headers', {})}, **kwargs)
+        server += time.perf_counter() - start
+        return response
+
+    upload = call('post', '/api/uploads', json={'filename': 'bench.zip', 'size': len(data)}).json
+    offset = 0
+    while offset < len(data):
+        chunk = data[offset:offset + chunk_size]
+        lost = delivered(rng, len(chunk), drop_per_mb)
+        if lost is not None:
+            wire += lost  # only this chunk goes again
+            continue
+        wire += len(chunk) / MB
+        response = call('put', f"/api/uploads/{upload['id']}", data=chunk, extra_headers={
+            'Content-Range': f"bytes {offset}-{offset + len(chunk) - 1}/{len(data)}"})
+        assert response.status_code == 200, response.json
+        offset = response.json['offset']
+    assert call('post', f"/api/uploads/{upload['id']}/complete").status_code == 200
+    response = call('post', f'/api/jobs/{job_id}/messages', data={'upload_ids': upload['id']})
+    assert response.status_code == 201, response.json
+    return wire, largest, server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=80)
+    parser.add_argument('--drop-per-mb', type=float, default=0.02)
+    parser.add_argument('--trials', type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    app.limiter.enabled = False
+    client = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+        owner = User(email='bench-client@example.com', name='Bench Client', role='client')
+        db.session.add_all([owner, User(email='bench-admin@example.com', name='Bench Admin', role='admin')])
+        db.session.commit()
+        job = Job(user_id=owner.id, subject='Mathematics', title='Bench', pages=1, deadline=datetime.utcnow(),
+                  instructions='Bench', total_amount=10, payment_status='Completed', status='In Progress')
+        db.session.add(job)
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {generate_tokens(owner)[0]}'}
+        job_id = job.id
+
+    print(f"{args.size_mb} MB attachment, {args.drop_per_mb:.0%} chance per MB that the link drops, "
+          f"{args.trials} trials (means)")
+    print(f"{'':>14} {'MB on wire':>11} {'largest req':>12} {'server time':>12}")
+    for label, send in (('single POST', single_post), ('chunked', chunked)):
+        rng = random.Random(42)
+        totals = [0.0, 0.0, 0.0]
+        for _ in range(args.trials):
+            data = os.urandom(args.size_mb * MB)  # fresh content, so deduplication doesn't help either row
+            for i, value in enumerate(send(client, headers, job_id, data, rng, args.drop_per_mb)):
+                totals[i] += value / args.trials
+        print(f"{label:>14} {totals[0]:>11.1f} {totals[1]:>9.1f} MB {totals[2] * 1000:>9.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
+    os._exit(0)  # don't wait on the app's background threads
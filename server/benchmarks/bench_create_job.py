@@ -0,0 +1,145 @@
+# Benchmark: latency and memory of a 50 MB multi-file order through POST /api/jobs,
+# compared with the old loopback flow that re-uploaded every file to /api/payments/initiate-upfront.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_create_job.py [--size-mb 50] [--files 5] [--runs 3]
+#
+# The app is served by eventlet's WSGI server in-process (the loopback needs a real socket) and
+# Pesapal is replaced by benchmarks/pesapal_stub.py. The "loopback" route below reproduces the
+# removed create_job behaviour so both paths can be measured against the same tree.
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-create-job-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+
+import logging
+import uuid
+
+import eventlet.wsgi
+import requests
+from flask import request, jsonify
+
+from app import app
+from extensions import db
+from models import User, IPNRegistration
+from server.routes.auth import generate_tokens
+from pesapal_stub import start_stub
+
+
+def legacy_create_job():
+    # The pre-refactor create_job: parse the upload, then POST it again to ourselves
+    token = request.headers['Authorization'].split(' ')[1]
+    files_data = [('files', (f.filename, f, f.mimetype)) for f in request.files.getlist('files')]
+    response = requests.post(
+        f"{request.scheme}://{request.host}/api/payments/initiate-upfront",
+        data=request.form.to_dict(),
+        files=files_data,
+        headers={'Authorization': f'Bearer {token}'},
+        timeout=120
+    )
+    return jsonify(response.json()), response.status_code
+
+
+def build_body(path, size_mb, num_files):
+    # Pre-encode the multipart body on disk so the client streams it and adds no memory of its own
+    boundary = uuid.uuid4().hex
+    fields = {
+        'subject': 'Mathematics', 'title': 'Bench order', 'pages': '2',
+        'deadline': '2099-01-01T00:00:00Z', 'instructions': 'Benchmark', 'totalAmount': '12',
+        'writerLevel': 'highschool'
+    }
+    chunk = os.urandom(1024 * 1024)
+    per_file_mb = max(1, size_mb // num_files)
+    with open(path, 'wb') as body:
+        for name, value in fields.items():
+            body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        for i in range(num_files):
+            body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="part{i}.zip"\r\n'
+                       'Content-Type: application/zip\r\n\r\n'.encode())
+            for _ in range(per_file_mb):
+                body.write(chunk)
+            body.write(b'\r\n')
+        body.write(f'--{boundary}--\r\n'.encode())
+    return f'multipart/form-data; boundary={boundary}'
+
+
+def post_order(url, token, body_path, content_type):
+    with open(body_path, 'rb') as body:
+        response = requests.post(url, data=body, timeout=300, headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': content_type,
+            'Content-Length': str(os.path.getsize(body_path))
+        })
+    assert response.status_code == 200, response.text
+    return response
+
+
+def measure(url, token, body_path, content_type, runs):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        post_order(url, token, body_path, content_type)
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    post_order(url, token, body_path, content_type)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sorted(latencies)[len(latencies) // 2], peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=50)
+    parser.add_argument('--files', type=int, default=5)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    stub = start_stub()
+    app.config['PESAPAL_BASE_URL'] = stub.base_url
+    app.extensions['mail'].suppress = True
+    app.limiter.enabled = False
+    app.add_url_rule('/bench/legacy-create-job', 'bench_legacy_create_job', legacy_create_job, methods=['POST'])
+
+    with app.app_context():
+        db.create_all()
+        client = User(email='bench-client@example.com', name='Bench Client', role='client')
+        db.session.add(client)
+        db.session.add(IPNRegistration(ipn_id=str(uuid.uuid4()), url='http://localhost/api/payments/ipn'))
+        db.session.commit()
+        token, _ = generate_tokens(client)
+
+    listener = eventlet.listen(('127.0.0.1', 0))
+    base_url = f"http://127.0.0.1:{listener.getsockname()[1]}"
+    eventlet.spawn_n(eventlet.wsgi.server, listener, app, log_output=False)
+
+    body_path = os.path.join(_tmpdir, 'order-body.bin')
+    content_type = build_body(body_path, args.size_mb, args.files)
+
+    before = measure(f"{base_url}/bench/legacy-create-job", token, body_path, content_type, args.runs)
+    after = measure(f"{base_url}/api/jobs", token, body_path, content_type, args.runs)
+
+    print(f"{args.size_mb} MB order in {args.files} files, median of {args.runs} runs")
+    print(f"  loopback (before):   {before[0] * 1000:8.1f} ms   peak Python memory {before[1] / 2 ** 20:7.1f} MB")
+    print(f"  in-process (after):  {after[0] * 1000:8.1f} ms   peak Python memory {after[1] / 2 ** 20:7.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
+    os._exit(0)  # don't wait on the app's background cleanup threads
@@ -0,0 +1,133 @@
+# Benchmark: downloading a large completed-work zip through /api/files, the old send_from_directory
+# handler vs the sendfile() download path, on a real eventlet.wsgi server.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_downloads.py [--size-mb 200] [--clients 4] [--rounds 3]
+#
+# Reports wall time, throughput and CPU seconds per GB sent (server and client share the process, so
+# the difference between the rows is the worker's), then checks a resumed (Range) download and a
+# 304 revalidation against the live server.
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import os
+import resource
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-downloads-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+os.environ['SOCKETIO_MESSAGE_QUEUE'] = 'local'
+
+import logging
+from datetime import datetime
+
+import eventlet.wsgi
+from flask import send_from_directory
+
+from app import app
+from extensions import db
+from models import User, Job
+from server.routes.auth import generate_tokens
+
+
+def old_get_file(filename):
+    # The transfer part of GET /api/files before the download service
+    return send_from_directory(app.config['UPLOAD_FOLDER'], filename, as_attachment=True,
+                               download_name=filename.split('/')[-1])
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def fetch(port, path, headers=None):
+    """Plain socket client so the measurement isn't dominated by an HTTP library; returns (status, headers, body size)."""
+    sock = socket.create_connection(('127.0.0.1', port))
+    lines = [f'GET {path} HTTP/1.1', 'Host: bench', 'Connection: close'] + [f'{k}: {v}' for k, v in (headers or {}).items()]
+    sock.sendall(('\r\n'.join(lines) + '\r\n\r\n').encode())
+    received = b''
+    while b'\r\n\r\n' not in received:
+        received += sock.recv(65536)
+    head, body = received.split(b'\r\n\r\n', 1)
+    size = len(body)
+    while True:
+        chunk = sock.recv(1 << 20)
+        if not chunk:
+            break
+        size += len(chunk)
+    sock.close()
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    return int(status_line.split()[1]), {name.lower(): value for name, value in (line.split(': ', 1) for line in header_lines)}, size
+
+
+def run(port, path, headers, clients, rounds, expected_size):
+    pool = eventlet.GreenPool(clients)
+    cpu_before, start = cpu_seconds(), time.perf_counter()
+    for status, _, size in pool.imap(lambda _: fetch(port, path, headers), range(clients * rounds)):
+        assert status == 200 and size == expected_size, (status, size)
+    return time.perf_counter() - start, cpu_seconds() - cpu_before
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    app.limiter.enabled = False
+    app.add_url_rule('/bench/old-files/<path:filename>', 'bench_old_files', old_get_file)
+
+    with app.app_context():
+        db.create_all()
+        client = User(email='bench-client@example.com', name='Bench Client', role='client')
+        db.session.add(client)
+        db.session.commit()
+        job = Job(user_id=client.id, subject='Mathematics', title='Bench', pages=1, deadline=datetime.utcnow(),
+                  instructions='Bench', total_amount=10, payment_status='Completed', status='Completed')
+        db.session.add(job)
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {generate_tokens(client)[0]}'}
+        job_id = job.id
+
+    size = args.size_mb * 1024 * 1024
+    filename = f'job_{job_id}/completed_work.zip'
+    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], f'job_{job_id}'), exist_ok=True)
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], filename), 'wb') as file:
+        for _ in range(args.size_mb):
+            file.write(os.urandom(1024 * 1024))
+
+    listener = eventlet.listen(('127.0.0.1', 0))
+    port = listener.getsockname()[1]
+    eventlet.spawn(eventlet.wsgi.server, listener, app, log_output=False)
+
+    total_gb = size * args.clients * args.rounds / 1024 ** 3
+    print(f"{args.size_mb} MB file, {args.clients} concurrent clients x {args.rounds} rounds ({total_gb:.2f} GB)")
+    print(f"{'path':>22} {'wall s':>8} {'MB/s':>8} {'CPU s/GB':>10}")
+    for label, path in (('send_from_directory', f'/bench/old-files/{filename}'), ('sendfile', f'/api/files/{filename}')):
+        wall, cpu = run(port, path, headers, args.clients, args.rounds, size)
+        print(f"{label:>22} {wall:>8.2f} {total_gb * 1024 / wall:>8.0f} {cpu / total_gb:>10.2f}")
+
+    status, response_headers, received = fetch(port, f'/api/files/{filename}', {**headers, 'Range': f'bytes={size // 2}-'})
+    assert status == 206 and received == size - size // 2, (status, received)
+    print(f"resume from the middle: {status} {response_headers['content-range']}")
+    status, _, _ = fetch(port, f'/api/files/{filename}', {**headers, 'If-None-Match': response_headers['etag']})
+    assert status == 304
+    print(f"revalidation: {status}")
+
+
+if __name__ == '__main__':
+    main()
+    os._exit(0)  # don't wait on the app's background threads
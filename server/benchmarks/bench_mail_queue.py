@@ -0,0 +1,134 @@
+# Benchmark + check: POST /api/auth/forgot-password latency with inline SMTP vs the mail queue,
+# then batching, retry/backoff and the dead-letter view, all against benchmarks/smtp_sink.py.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_mail_queue.py [--requests 20] [--smtp-latency 0.2]
+#
+# Runs against a throwaway SQLite database unless DATABASE_URL is already set.
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from smtp_sink import start_sink
+
+sink = start_sink()
+_tmpdir = tempfile.mkdtemp(prefix='bench-mail-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+os.environ['MAIL_SERVER'] = '127.0.0.1'
+os.environ['MAIL_PORT'] = str(sink.port)
+os.environ['MAIL_USE_TLS'] = 'false'
+os.environ['MAIL_USERNAME'] = 'noreply@example.com'
+os.environ['MAIL_QUEUE_POLL_INTERVAL'] = '0.2'
+os.environ.setdefault('ADMIN_EMAILS', 'bench-admin@example.com')
+
+import logging
+
+from app import app
+from extensions import db
+from models import User
+from server.routes.auth import generate_tokens
+from server.services.mail_queue import mail_queue
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def forgot_password_latency(client, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.post('/api/auth/forgot-password', json={'email': 'bench-client@example.com'})
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.json
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--smtp-latency', type=float, default=0.2)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    app.limiter.enabled = False
+    app.extensions['mail'].debug = 0
+    client = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+        mail_queue.start(app)
+        db.session.add(User(email='bench-client@example.com', name='Bench Client', role='client'))
+        admin = User(email='bench-admin@example.com', name='Bench Admin', role='admin')
+        db.session.add(admin)
+        db.session.commit()
+        admin_headers = {'Authorization': f'Bearer {generate_tokens(admin)[0]}'}
+
+    sink.latency = args.smtp_latency
+
+    mail_queue.enabled = False
+    inline = forgot_password_latency(client, args.requests)
+    assert len(sink.messages) == args.requests
+
+    mail_queue.enabled = True
+    sink.messages.clear()
+    sink.connections = 0
+    queued = forgot_password_latency(client, args.requests)
+    drained = wait_for(lambda: len(sink.messages) == args.requests)
+
+    print(f"forgot-password, {args.requests} requests, SMTP latency {args.smtp_latency * 1000:.0f} ms")
+    print(f"  inline SMTP:  p50 {inline[0] * 1000:8.1f} ms   p95 {inline[1] * 1000:8.1f} ms")
+    print(f"  mail queue:   p50 {queued[0] * 1000:8.1f} ms   p95 {queued[1] * 1000:8.1f} ms")
+    print(f"  queue drained: {drained}, {len(sink.messages)} messages over {sink.connections} SMTP connections")
+
+    # Retry: the sink refuses the first two sessions, the queue backs off and delivers everything
+    sink.latency = 0
+    sink.messages.clear()
+    sink.fail_connections = 2
+    mail_queue.backoff_base = 0.1
+    for _ in range(5):
+        client.post('/api/contact', json={'email': 'visitor@example.com'})
+    assert wait_for(lambda: len(sink.messages) == 5), 'retried messages were not delivered'
+    print("  retry: 5 messages delivered after 2 refused sessions")
+
+    # Dead letter: every session is refused until the message runs out of attempts
+    mail_queue.max_attempts = 3
+    sink.messages.clear()
+    sink.fail_connections = 1000
+    client.post('/api/contact', json={'email': 'visitor@example.com'})
+
+    def dead_letters():
+        return client.get('/api/admin/mail/dead-letters', headers=admin_headers).json
+
+    assert wait_for(lambda: len(dead_letters()) == 1), 'message was not dead-lettered'
+    dead = dead_letters()[0]
+    assert dead['attempts'] == 3, dead
+    sink.fail_connections = 0
+    response = client.post(f"/api/admin/mail/{dead['id']}/retry", headers=admin_headers)
+    assert response.status_code == 200, response.json
+    assert wait_for(lambda: len(sink.messages) == 1), 'requeued dead letter was not delivered'
+    print(f"  dead letter: parked after {dead['attempts']} attempts, delivered after admin retry")
+    print(f"  stats: {client.get('/api/admin/metrics', headers=admin_headers).json['mail_queue']}")
+
+
+if __name__ == '__main__':
+    main()
+    os._exit(0)  # don't wait on the app's background threads
@@ -0,0 +1,130 @@
+# Benchmark: finding the job an IPN belongs to, by tracking id, at --jobs jobs.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_payment_lookup.py [--jobs 1000000] [--lookups 2000]
+#
+# Fills the job table (throwaway SQLite database unless DATABASE_URL is set; the jobs are deleted
+# again afterwards), then times find_job() by upfront and completion tracking id with the
+# ix_job_*_tracking_id / ix_job_*_reference indexes, and the OR query it replaced without them.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-payment-lookup-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+os.environ.setdefault('UPLOAD_RETENTION_ENABLED', 'false')
+os.environ.setdefault('IPN_QUEUE_ENABLED', 'false')
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+os.environ['SOCKETIO_MESSAGE_QUEUE'] = 'local'
+
+import logging
+import random
+
+logging.disable(logging.CRITICAL)
+
+from app import app
+from extensions import db
+from models import Job, User
+from server.services.payments import find_job
+
+BATCH = 50000
+INDEXES = ('order_tracking_id', 'completion_tracking_id', 'merchant_reference', 'completion_reference')
+
+
+def fill(jobs, user_id):
+    """Insert jobs; every job has an upfront order, a third of them a completion order too."""
+    deadline = datetime.utcnow() + timedelta(days=7)
+    orders = []
+    for start in range(0, jobs, BATCH):
+        rows = []
+        for i in range(start, min(start + BATCH, jobs)):
+            completion = str(uuid.uuid4()) if i % 3 == 0 else None
+            rows.append({
+                'user_id': user_id, 'subject': 'Bench', 'title': f'Job {i}', 'pages': 1,
+                'deadline': deadline, 'instructions': '-', 'total_amount': 10.0,
+                'payment_status': 'Partial' if completion else 'Pending',
+                'order_tracking_id': str(uuid.uuid4()), 'merchant_reference': f'JOB-{i}-{uuid.uuid4().hex[:8]}',
+                'completion_tracking_id': completion,
+                'completion_reference': f'JOB-{i}-{uuid.uuid4().hex[:8]}-C' if completion else None
+            })
+        db.session.execute(Job.__table__.insert(), rows)
+        db.session.commit()
+        orders.extend(row['completion_tracking_id'] or row['order_tracking_id'] for row in rows[::97])
+        print(f"\r  {min(start + BATCH, jobs)} jobs", end='', flush=True)
+    print()
+    return orders
+
+
+def timed(lookup, ids):
+    samples = []
+    for tracking_id in ids:
+        start = time.perf_counter()
+        job = lookup(tracking_id)
+        samples.append((time.perf_counter() - start) * 1e3)
+        assert job is not None
+        db.session.expunge_all()
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+def or_query(tracking_id):
+    return Job.query.filter(
+        (Job.order_tracking_id == tracking_id) |
+        (Job.completion_tracking_id == tracking_id)
+    ).first()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--scans', type=int, default=20, help='lookups timed without the indexes')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        user = User(email=f'bench-{uuid.uuid4().hex[:8]}@example.com', name='Bench')
+        user.set_password(uuid.uuid4().hex)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+        print(f"filling {args.jobs} jobs ({db.engine.dialect.name})")
+        orders = fill(args.jobs, user_id)
+        with db.engine.begin() as connection:
+            if db.engine.dialect.name == 'postgresql':
+                connection.exec_driver_sql('ANALYZE job')
+            else:
+                connection.exec_driver_sql('ANALYZE')
+
+        try:
+            print(f"\n{'':>24} {'p50':>10} {'p99':>10}")
+            p50, p99 = timed(lambda tid: find_job(tid), random.choices(orders, k=args.lookups))
+            print(f"{'find_job (indexed)':>24} {p50:>8.3f}ms {p99:>8.3f}ms")
+
+            with db.engine.begin() as connection:
+                for column in INDEXES:
+                    connection.exec_driver_sql(f'DROP INDEX ix_job_{column}')
+            p50, p99 = timed(or_query, random.choices(orders, k=args.scans))
+            print(f"{'OR query (no indexes)':>24} {p50:>8.3f}ms {p99:>8.3f}ms")
+        finally:
+            with db.engine.begin() as connection:
+                for column in INDEXES:
+                    connection.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS ix_job_{column} ON job ({column})')
+                connection.execute(Job.__table__.delete().where(Job.user_id == user_id))
+                connection.execute(User.__table__.delete().where(User.id == user_id))
+
+
+if __name__ == '__main__':
+    main()
+    os._exit(0)  # don't wait on the app's background threads
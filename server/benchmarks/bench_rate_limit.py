@@ -0,0 +1,107 @@
+# Benchmark: rate limit checks, per-process memory buckets (what Flask-Limiter's default storage
+# amounts to) vs the shared-memory table and the SQL table.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_rate_limit.py [--workers 4] [--requests 2000] [--checks 100000]
+#
+# First --workers forked processes hammer one client's bucket (capacity 100, no meaningful refill)
+# and the total let through is counted: per-process storage lets each worker grant the budget again.
+# Then the cost of a single check is timed against how many buckets are live, to show it doesn't
+# grow with them, and for the SQL table (throwaway SQLite database unless DATABASE_URL is set).
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-ratelimit-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+os.environ.setdefault('UPLOAD_RETENTION_ENABLED', 'false')
+os.environ['SOCKETIO_MESSAGE_QUEUE'] = 'local'
+
+import logging
+
+from server.services.rate_limit import SlotTable, SQLBuckets
+
+CAPACITY = 100
+RATE = 1 / 3600
+
+
+def enforced(table, workers, requests):
+    """Total requests let through when workers processes share table, each sending requests."""
+    read, write = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            allowed = sum(table.take('messages:user:1', CAPACITY, RATE, 1, time.time())[0] for _ in range(requests))
+            os.write(write, f"{allowed}\n".encode())
+            os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    os.close(write)
+    with os.fdopen(read) as results:
+        return sum(int(line) for line in results)
+
+
+def per_check(table, keys, checks, seed=True):
+    for i in range(keys if seed else 0):
+        table.take(f'default:user:{i}', CAPACITY, RATE, 1, time.time())
+    start = time.perf_counter()
+    for i in range(checks):
+        table.take(f'default:user:{i % keys}', CAPACITY, RATE, 1, time.time())
+    return (time.perf_counter() - start) / checks * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--checks', type=int, default=100000)
+    parser.add_argument('--slots', type=int, default=65536)
+    args = parser.parse_args()
+
+    shm_path = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else _tmpdir, f'bench-ratelimit-{os.getpid()}')
+
+    print(f"{args.workers} workers x {args.requests} requests against one bucket of {CAPACITY}")
+    for label, table in (('per-process memory', SlotTable(args.slots)), ('shared memory file', SlotTable(args.slots, shm_path))):
+        print(f"{label:>20} {enforced(table, args.workers, args.requests):>7} let through")
+
+    print(f"\nper check, by live buckets ({args.slots} slots)")
+    print(f"{'':>20} " + ''.join(f"{keys:>10}" for keys in (100, 10000, args.slots // 2)))
+    for label, make in (('memory', lambda: SlotTable(args.slots)), ('shm', lambda: SlotTable(args.slots, shm_path))):
+        timings = []
+        for keys in (100, 10000, args.slots // 2):
+            if os.path.exists(shm_path):
+                os.unlink(shm_path)
+            timings.append(per_check(make(), keys, args.checks))
+        print(f"{label:>20} " + ''.join(f"{us:>8.1f}us" for us in timings))
+
+    logging.disable(logging.CRITICAL)
+    from app import app
+    from extensions import db
+    from models import RateLimitBucket
+    with app.app_context():
+        db.create_all()
+        timings = []
+        for keys in (100, 10000, args.slots // 2):
+            now = time.time()
+            db.session.execute(RateLimitBucket.__table__.delete())
+            db.session.execute(RateLimitBucket.__table__.insert(), [
+                {'key': f'default:user:{i}', 'tokens': CAPACITY, 'updated_at': now, 'full_at': now} for i in range(keys)])
+            db.session.commit()
+            timings.append(per_check(SQLBuckets(), keys, min(args.checks, 5000), seed=False))
+        print(f"{'sql (' + db.engine.dialect.name + ')':>20} " + ''.join(f"{us:>8.1f}us" for us in timings))
+    os.unlink(shm_path)
+
+
+if __name__ == '__main__':
+    main()
+    os._exit(0)  # don't wait on the app's background threads
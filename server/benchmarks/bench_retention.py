@@ -0,0 +1,117 @@
+# Benchmark: upload retention, the old cleanup_old_files walk (os.walk + getmtime over UPLOAD_FOLDER)
+# vs the retention sweeper reading due rows through the stored_file.expires_at index.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_retention.py [--files 100000] [--rows 1000000] [--expired 1000]
+#
+# First both run over --files real files, --expired of them due. Then the sweeper alone runs over
+# index tables of growing size with the same number due, to show that its time follows what has
+# expired rather than what is stored. Throwaway SQLite database unless DATABASE_URL is set.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-retention-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+os.environ.setdefault('UPLOAD_RETENTION_ENABLED', 'false')
+os.environ['SOCKETIO_MESSAGE_QUEUE'] = 'local'
+
+import logging
+from datetime import datetime, timedelta
+
+from app import app
+from extensions import db
+from models import StoredFile
+from server.services.retention import retention
+
+OLD_AGE = 30 * 24 * 60 * 60
+
+
+def old_cleanup(upload_folder):
+    # cleanup_old_files' loop body, as it was
+    cutoff_time = time.time() - OLD_AGE
+    deleted = 0
+    for root, dirs, files in os.walk(upload_folder):
+        for file in files:
+            file_path = os.path.join(root, file)
+            if os.path.getmtime(file_path) < cutoff_time:
+                os.remove(file_path)
+                deleted += 1
+    return deleted
+
+
+def fill_index(rows, expired, with_files):
+    """rows stored_file rows for general message attachments, expired of them due; returns their paths."""
+    upload_folder = app.config['UPLOAD_FOLDER']
+    now = datetime.utcnow()
+    db.session.execute(StoredFile.__table__.delete())
+    records, paths = [], []
+    for i in range(rows):
+        path = f"temp/{i % 1000:03d}/msg-{i}.pdf"
+        due = i % (rows // expired) == 0 if expired else False
+        records.append({'path': path, 'filename': f'msg-{i}.pdf', 'kind': 'message', 'size': 1024,
+                        'message_id': None, 'created_at': now,
+                        'expires_at': now - timedelta(minutes=1) if due else now + timedelta(days=30)})
+        if with_files:
+            paths.append((path, due))
+    for start in range(0, rows, 50000):
+        db.session.execute(StoredFile.__table__.insert(), records[start:start + 50000])
+    db.session.commit()
+
+    for path, due in paths:
+        full_path = os.path.join(upload_folder, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as file:
+            file.write(b'x' * 1024)
+        if due:
+            old = time.time() - OLD_AGE - 60
+            os.utime(full_path, (old, old))
+
+
+def timed_sweep():
+    start = time.perf_counter()
+    report = retention.sweep(dry_run=False)
+    return time.perf_counter() - start, report['files']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=100000)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--expired', type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    retention.max_batches = 10 ** 6  # one pass clears everything due
+
+    with app.app_context():
+        db.create_all()
+
+        print(f"{args.files} files on disk, {args.expired} due")
+        fill_index(args.files, args.expired, with_files=True)
+        start = time.perf_counter()
+        deleted = old_cleanup(app.config['UPLOAD_FOLDER'])
+        print(f"{'os.walk + getmtime':>22} {(time.perf_counter() - start) * 1000:>9.1f} ms  {deleted} deleted")
+
+        fill_index(args.files, args.expired, with_files=True)
+        elapsed, deleted = timed_sweep()
+        print(f"{'indexed sweep':>22} {elapsed * 1000:>9.1f} ms  {deleted} deleted")
+
+        print(f"\nindexed sweep, {args.expired} due, growing index (files not on disk)")
+        for rows in sorted({args.rows // 100, args.rows // 10, args.rows}):
+            fill_index(rows, args.expired, with_files=False)
+            elapsed, deleted = timed_sweep()
+            print(f"{rows:>15} rows {elapsed * 1000:>9.1f} ms  {deleted} deleted")
+
+
+if __name__ == '__main__':
+    main()
+    os._exit(0)  # don't wait on the app's background threads
@@ -0,0 +1,149 @@
+# Benchmark: /api/search over 100k synthetic jobs vs the LIKE scan it replaces.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_search.py [--jobs 100000] [--requests 50]
+#
+# Runs against a throwaway SQLite database (in-process index) unless DATABASE_URL is set. On
+# PostgreSQL the search migration is applied to the fresh tables so the tsvector/GIN path is used.
+
+import argparse
+import importlib.util
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-search-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+os.environ['SOCKETIO_MESSAGE_QUEUE'] = 'local'
+
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from app import app
+from extensions import db
+from models import User, Job
+from server.routes.auth import generate_tokens
+from server.services import search
+
+SUBJECTS = ['Mathematics', 'Economics', 'History', 'Biology', 'Nursing', 'Computer Science', 'Law', 'Psychology']
+TOPICS = ['climate policy', 'supply chains', 'machine learning', 'public health', 'monetary policy', 'renaissance art',
+          'cell biology', 'contract law', 'child development', 'graph theory', 'cold war', 'patient safety']
+QUERIES = ['climate policy', 'machine learning essay', 'nursing patient safety', 'graph theory', 'contract',
+           'renaissance', 'monetary policy analysis', 'zzzz nothing matches']
+
+
+def vocabulary(size=3000):
+    rng = random.Random(1)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+
+
+def seed(count, client_ids):
+    rng = random.Random(2)
+    words = vocabulary()
+    start = datetime.utcnow() - timedelta(days=365)
+    for offset in range(0, count, 5000):
+        rows = []
+        for i in range(offset, min(offset + 5000, count)):
+            topic = rng.choice(TOPICS)
+            filler = ' '.join(rng.choice(words) for _ in range(rng.randint(40, 120)))
+            created = start + timedelta(seconds=i * 300)
+            rows.append({
+                'user_id': rng.choice(client_ids), 'subject': rng.choice(SUBJECTS),
+                'title': f'{rng.choice(["Essay", "Report", "Research paper", "Case study"])} on {topic}',
+                'pages': rng.randint(1, 20), 'deadline': created + timedelta(days=7),
+                'instructions': f'Discuss {topic} in depth. {filler}', 'total_amount': 12.0,
+                'payment_status': rng.choice(['Partial', 'Completed']), 'status': 'In Progress',
+                'created_at': created, 'updated_at': created
+            })
+        db.session.execute(db.insert(Job), rows)
+        db.session.commit()
+
+
+def like_scan(text):
+    # What finding an order looked like before: a substring scan over every paid job
+    query = Job.query.filter(Job.payment_status != 'Pending')
+    for term in text.split():
+        pattern = f'%{term}%'
+        query = query.filter(or_(Job.title.ilike(pattern), Job.subject.ilike(pattern), Job.instructions.ilike(pattern)))
+    return query.order_by(Job.updated_at.desc()).limit(20).all()
+
+
+def median_ms(fn, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)[len(latencies) // 2] * 1000
+
+
+def apply_search_migration():
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'migrations', 'versions', '9d3a5c7e1b24_add_search_vectors.py')
+    spec = importlib.util.spec_from_file_location('search_migration', path)
+    migration = importlib.util.module_from_spec(spec)
+    with db.engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            spec.loader.exec_module(migration)
+            migration.upgrade()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    app.limiter.enabled = False
+    client = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+        if db.engine.dialect.name == 'postgresql':
+            apply_search_migration()
+        admin = User(email='bench-admin@example.com', name='Bench Admin', role='admin')
+        clients = [User(email=f'bench-client-{i}@example.com', name=f'Client {i}', role='client') for i in range(200)]
+        db.session.add_all([admin] + clients)
+        db.session.commit()
+        admin_headers = {'Authorization': f'Bearer {generate_tokens(admin)[0]}'}
+        client_headers = {'Authorization': f'Bearer {generate_tokens(clients[0])[0]}'}
+        seed(args.jobs, [user.id for user in clients])
+
+        backend = search.backend()
+        print(f"{args.jobs} jobs, backend: {backend}")
+        if backend == 'memory':
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            start = time.perf_counter()
+            search.job_index.refresh(force=True)
+            build = time.perf_counter() - start
+            rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+            print(f"  index build {build:.1f} s, {search.job_index.stats()['terms']} terms, ~{rss_growth:.0f} MB RSS")
+
+        print(f"{'query':>28} {'matches':>8} {'LIKE scan':>10} {'admin':>9} {'client':>9}   (median ms)")
+        for text in QUERIES:
+            url = f'/api/search?type=jobs&q={text}'
+            response = client.get(url, headers=admin_headers)
+            assert response.status_code == 200, response.json
+            like_ms = median_ms(lambda: like_scan(text), max(3, args.requests // 10))
+            admin_ms = median_ms(lambda: client.get(url, headers=admin_headers), args.requests)
+            client_ms = median_ms(lambda: client.get(url, headers=client_headers), args.requests)
+            print(f"{text:>28} {response.json['total']:>8} {like_ms:>10.1f} {admin_ms:>9.2f} {client_ms:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
+    os._exit(0)  # don't wait on the app's background threads
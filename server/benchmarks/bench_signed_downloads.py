@@ -0,0 +1,99 @@
+# Benchmark: fetching every attachment on a job page, one bearer-authorized /api/files request per
+# file vs one /download-urls batch followed by signed links.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_signed_downloads.py [--files 40] [--rounds 20]
+#
+# Runs against a throwaway SQLite database unless DATABASE_URL is already set. The auth token cache
+# is disabled so the bearer path pays what a cold worker (or a token it hasn't seen) pays.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-signed-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+os.environ['SOCKETIO_MESSAGE_QUEUE'] = 'local'
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app import app
+from extensions import db
+from models import User, Job, StoredFile
+from server.routes.auth import generate_tokens
+
+queries = [0]
+
+
+def timed(fn, rounds):
+    latencies = []
+    before = queries[0]
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)[len(latencies) // 2] * 1000, (queries[0] - before) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=40)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    app.limiter.enabled = False
+    app.config['AUTH_CACHE_ENABLED'] = False
+    client = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+        owner = User(email='bench-client@example.com', name='Bench Client', role='client')
+        db.session.add(owner)
+        db.session.commit()
+        job = Job(user_id=owner.id, subject='Mathematics', title='Bench', pages=1, deadline=datetime.utcnow(),
+                  instructions='Bench', total_amount=10, payment_status='Completed', status='Completed')
+        db.session.add(job)
+        db.session.commit()
+        paths = [f'job_{job.id}/attachment_{i}.pdf' for i in range(args.files)]
+        db.session.add_all([StoredFile(path=path, filename=path.split('/')[-1], kind='completed', job=job) for path in paths])
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {generate_tokens(owner)[0]}'}
+        job_id = job.id
+
+    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], f'job_{job_id}'), exist_ok=True)
+    for path in paths:
+        with open(os.path.join(app.config['UPLOAD_FOLDER'], path), 'wb') as file:
+            file.write(os.urandom(32 * 1024))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: queries.__setitem__(0, queries[0] + 1))
+
+    def bearer_page():
+        for path in paths:
+            assert client.get(f'/api/files/{path}', headers=headers).status_code == 200
+
+    def signed_page():
+        urls = client.get(f'/api/jobs/{job_id}/download-urls', headers=headers).json['urls']
+        for path in paths:
+            assert client.get(urls[path]).status_code == 200
+
+    print(f"{args.files} attachments per job page, median ms and SQL queries per page")
+    for label, fn in (('bearer per file', bearer_page), ('batch + signed', signed_page)):
+        ms, per_page = timed(fn, args.rounds)
+        print(f"{label:>16} {ms:>9.2f} ms {per_page:>5.0f}q")
+
+
+if __name__ == '__main__':
+    main()
+    os._exit(0)  # don't wait on the app's background threads
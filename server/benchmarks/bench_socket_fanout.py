@@ -0,0 +1,82 @@
+# Benchmark: cost of one job_updated event with N connected /jobs sockets, namespace-wide
+# broadcast (old behaviour) vs the user/job/admins rooms.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_socket_fanout.py [--clients 1000] [--events 200]
+#
+# Uses Flask-SocketIO's in-process test clients against a throwaway SQLite database.
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-fanout-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+os.environ['SOCKETIO_MESSAGE_QUEUE'] = 'local'  # the in-process test clients need the plain manager
+
+import logging
+from datetime import datetime, timedelta
+
+from app import app
+from extensions import db, socketio
+from models import User, Job
+from server.routes.auth import generate_tokens
+from server.services.realtime import emit_to_job
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    socketio.server.logger.disabled = True
+    socketio.server.eio.logger.disabled = True
+
+    with app.app_context():
+        db.create_all()
+        users = [User(email=f'bench-{i}@example.com', name=f'Bench {i}', role='client') for i in range(args.clients)]
+        db.session.add_all(users)
+        db.session.add(User(email='bench-admin@example.com', name='Bench Admin', role='admin'))
+        db.session.commit()
+        tokens = [generate_tokens(user)[0] for user in User.query.all()]
+        job = Job(user_id=users[0].id, subject='Mathematics', title='Bench job', pages=2,
+                  deadline=datetime.utcnow() + timedelta(days=7), instructions='Benchmark', total_amount=12)
+        db.session.add(job)
+        db.session.commit()
+        payload = job.to_dict()
+
+        sockets = [socketio.test_client(app, namespace='/jobs', query_string=f'token={token}') for token in tokens]
+
+        def run(emit):
+            for client in sockets:
+                client.get_received('/jobs')
+            start = time.perf_counter()
+            for _ in range(args.events):
+                emit()
+            elapsed = time.perf_counter() - start
+            delivered = sum(len(client.get_received('/jobs')) for client in sockets)
+            return elapsed / args.events, delivered / args.events
+
+        broadcast = run(lambda: socketio.emit('job_updated', payload, namespace='/jobs'))
+        rooms = run(lambda: emit_to_job('job_updated', payload, job, '/jobs'))
+
+    print(f"job_updated with {len(sockets)} connected /jobs sockets, {args.events} events")
+    print(f"  namespace broadcast: {broadcast[0] * 1000:7.3f} ms/event   {broadcast[1]:7.1f} deliveries/event")
+    print(f"  rooms:               {rooms[0] * 1000:7.3f} ms/event   {rooms[1]:7.1f} deliveries/event")
+
+
+if __name__ == '__main__':
+    main()
+    os._exit(0)  # don't wait on the app's background threads
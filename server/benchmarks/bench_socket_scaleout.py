@@ -0,0 +1,165 @@
+# Load test: Socket.IO delivery across several app workers sharing one database.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/bench_socket_scaleout.py [--workers 4] [--clients 40] [--events 200] [--queue unix]
+#
+# Starts N eventlet worker processes on consecutive ports, spreads client sockets (plus one admin
+# socket per worker) across them, then updates random jobs through random workers. Every
+# job_updated event should reach the job owner and all admins wherever they are connected.
+# Pass --queue local to see the single-process behaviour for comparison.
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(HERE)
+
+
+def worker_env(args):
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(args.tmpdir, 'bench.db')}",
+        'UPLOAD_FOLDER': os.path.join(args.tmpdir, 'uploads'),
+        'JWT_SECRET_KEY': 'bench-secret',
+        'SECRET_KEY': 'bench-secret',
+        'SOCKETIO_MESSAGE_QUEUE': args.queue,
+        'MAIL_QUEUE_ENABLED': 'false'
+    })
+    return env
+
+
+def run_seed(clients):
+    import logging
+    from datetime import datetime, timedelta
+    sys.path.insert(0, SERVER_DIR)
+    from app import app
+    from extensions import db
+    from models import User, Job
+    from server.routes.auth import generate_tokens
+
+    logging.disable(logging.CRITICAL)
+    with app.app_context():
+        db.create_all()
+        users = [User(email=f'bench-{i}@example.com', name=f'Bench {i}', role='client') for i in range(clients)]
+        admin = User(email='bench-admin@example.com', name='Bench Admin', role='admin')
+        db.session.add_all(users + [admin])
+        db.session.commit()
+        jobs = [Job(user_id=user.id, subject='Mathematics', title='Bench job', pages=2,
+                    deadline=datetime.utcnow() + timedelta(days=7), instructions='Benchmark', total_amount=12)
+                for user in users]
+        db.session.add_all(jobs)
+        db.session.commit()
+        print(json.dumps({
+            'admin': generate_tokens(admin)[0],
+            'clients': [{'token': generate_tokens(user)[0], 'job_id': job.id} for user, job in zip(users, jobs)]
+        }))
+
+
+def run_worker(port):
+    import eventlet
+    eventlet.monkey_patch()
+    import eventlet.wsgi
+    import logging
+    sys.path.insert(0, SERVER_DIR)
+    from app import app
+    from extensions import socketio
+
+    logging.disable(logging.CRITICAL)
+    socketio.server.logger.disabled = True
+    socketio.server.eio.logger.disabled = True
+    app.limiter.enabled = False
+    eventlet.wsgi.server(eventlet.listen(('127.0.0.1', port)), app, log_output=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=40)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--queue', default='unix')
+    parser.add_argument('--base-port', type=int, default=18600)
+    parser.add_argument('--seed', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed:
+        return run_seed(args.clients)
+    if args.worker:
+        return run_worker(args.worker)
+
+    import requests
+    import socketio
+
+    args.tmpdir = tempfile.mkdtemp(prefix='bench-scaleout-')
+    env = worker_env(args)
+    seed = subprocess.run([sys.executable, __file__, '--seed', '--clients', str(args.clients)],
+                          env=env, cwd=args.tmpdir, capture_output=True, text=True, check=True)
+    seeded = json.loads(seed.stdout.strip().splitlines()[-1])
+
+    ports = [args.base_port + i for i in range(args.workers)]
+    workers = [subprocess.Popen([sys.executable, __file__, '--worker', str(port)], env=env, cwd=args.tmpdir,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for port in ports]
+    try:
+        for port in ports:
+            for _ in range(100):
+                try:
+                    requests.get(f'http://127.0.0.1:{port}/', timeout=1)
+                    break
+                except requests.ConnectionError:
+                    time.sleep(0.1)
+
+        received = {}
+        lock = threading.Lock()
+
+        def connect(token, port, owner_of=None):
+            sock = socketio.Client()
+
+            @sock.on('job_updated', namespace='/jobs')
+            def on_job_updated(job):
+                with lock:
+                    received.setdefault(job['status'], []).append(time.perf_counter())
+
+            sock.connect(f'http://127.0.0.1:{port}?token={token}', namespaces=['/jobs'], transports=['polling'])
+            return sock
+
+        sockets = [connect(seeded['admin'], port) for port in ports]
+        sockets += [connect(client['token'], ports[i % len(ports)]) for i, client in enumerate(seeded['clients'])]
+        time.sleep(1)
+
+        session = requests.Session()
+        sent = {}
+        for k in range(args.events):
+            client = random.choice(seeded['clients'])
+            port = random.choice(ports)
+            status = f'Bench {k}'
+            sent[status] = time.perf_counter()
+            response = session.put(f"http://127.0.0.1:{port}/api/jobs/{client['job_id']}", json={'status': status},
+                                   headers={'Authorization': f"Bearer {seeded['admin']}"}, timeout=10)
+            assert response.status_code == 200, response.text
+        time.sleep(2)
+
+        expected = 1 + len(ports)  # the job owner plus one admin socket per worker
+        delivered = sum(len(received.get(status, [])) for status in sent)
+        latencies = sorted((t - sent[status]) * 1000 for status in sent for t in received.get(status, []))
+        print(f"{args.workers} workers ({args.queue} bus), {len(sockets)} sockets, {args.events} job_updated events")
+        print(f"  delivered {delivered}/{expected * args.events} ({100 * delivered / (expected * args.events):.1f}%)")
+        if latencies:
+            print(f"  latency from PUT: p50 {statistics.median(latencies):.1f} ms   "
+                  f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms")
+        for sock in sockets:
+            sock.disconnect()
+    finally:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+# Minimal local stand-in for the Pesapal v3 API, for exercising the payment code without the sandbox.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/pesapal_stub.py [--port 8765] [--latency 0.2] [--token-ttl 300]
+#   PESAPAL_BASE_URL=http://127.0.0.1:8765 python app.py
+#
+# GET /_stats returns per-endpoint call counts. Benchmarks can also embed the stub via start_stub().
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class PesapalStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _count(self, name):
+        with self.server.lock:
+            self.server.calls[name] = self.server.calls.get(name, 0) + 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if path.endswith('/Auth/RequestToken'):
+            self._count('auth')
+            self._read_json()
+            expiry = datetime.now(timezone.utc) + timedelta(seconds=self.server.token_ttl)
+            self._send(200, {
+                'token': uuid.uuid4().hex,
+                'expiryDate': expiry.strftime('%Y-%m-%dT%H:%M:%S.%f') + '0Z',
+                'error': None,
+                'status': '200',
+                'message': 'Request processed successfully'
+            })
+        elif path.endswith('/URLSetup/RegisterIPN'):
+            self._count('register_ipn')
+            data = self._read_json()
+            self._send(200, {'ipn_id': str(uuid.uuid4()), 'url': data.get('url'), 'status': '200'})
+        elif path.endswith('/Transactions/SubmitOrderRequest'):
+            self._count('submit_order')
+            data = self._read_json()
+            tracking_id = str(uuid.uuid4())
+            with self.server.lock:
+                self.server.orders[tracking_id] = data
+            self._send(200, {
+                'order_tracking_id': tracking_id,
+                'merchant_reference': data.get('id'),
+                'redirect_url': f"https://pay.example.invalid/iframe?OrderTrackingId={tracking_id}",
+                'error': None,
+                'status': '200'
+            })
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == '/_stats':
+            with self.server.lock:
+                self._send(200, dict(self.server.calls))
+        elif parsed.path.endswith('/Transactions/GetTransactionStatus'):
+            self._count('get_transaction_status')
+            tracking_id = parse_qs(parsed.query).get('orderTrackingId', [''])[0]
+            with self.server.lock:
+                order = self.server.orders.get(tracking_id, {})
+            self._send(200, {
+                'payment_method': 'Visa',
+                'amount': order.get('amount', 0),
+                'confirmation_code': tracking_id[:8],
+                'payment_status_description': self.server.transaction_status,
+                'merchant_reference': order.get('id'),
+                'currency': 'USD',
+                'status': '200'
+            })
+        else:
+            self._send(404, {'error': 'not found'})
+
+
+def start_stub(port=0, latency=0.0, token_ttl=300, transaction_status='Completed'):
+    server = ThreadingHTTPServer(('127.0.0.1', port), PesapalStubHandler)
+    server.lock = threading.Lock()
+    server.calls = {}
+    server.orders = {}
+    server.latency = latency
+    server.token_ttl = token_ttl
+    server.transaction_status = transaction_status
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every call')
+    parser.add_argument('--token-ttl', type=int, default=300)
+    parser.add_argument('--transaction-status', default='Completed')
+    args = parser.parse_args()
+
+    stub = start_stub(args.port, args.latency, args.token_ttl, args.transaction_status)
+    print(f"Pesapal stub listening on {stub.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.shutdown()
@@ -0,0 +1,100 @@
+# Local SMTP sink: accepts and discards mail, for exercising the mail queue without a real server.
+#
+# Usage (from the server/ directory):
+#   python benchmarks/smtp_sink.py [--port 8025] [--latency 0.5]
+#   MAIL_SERVER=127.0.0.1 MAIL_PORT=8025 MAIL_USE_TLS=false python app.py
+#
+# Benchmarks can embed it via start_sink(); the returned server exposes .messages (list of
+# (mail_from, rcpt_tos, data)), .connections, and .fail_connections (refuse the next N sessions).
+
+import argparse
+import socketserver
+import threading
+import time
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+        self.wfile.flush()
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            refuse = server.fail_connections > 0
+            if refuse:
+                server.fail_connections -= 1
+        if refuse:
+            self.reply('421 sink: service not available')
+            return
+
+        self.reply('220 smtp-sink ready')
+        mail_from, rcpt_tos = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 smtp-sink')
+            elif verb == 'MAIL':
+                mail_from, rcpt_tos = command[10:], []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                rcpt_tos.append(command[8:])
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(chunk)
+                if server.latency:
+                    time.sleep(server.latency)
+                with server.lock:
+                    server.messages.append((mail_from, rcpt_tos, b''.join(data)))
+                self.reply('250 OK: queued')
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_sink(port=0, latency=0.0):
+    server = SMTPSink(('127.0.0.1', port), SMTPSinkHandler)
+    server.lock = threading.Lock()
+    server.messages = []
+    server.connections = 0
+    server.fail_connections = 0
+    server.latency = latency
+    server.port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every message')
+    args = parser.parse_args()
+
+    sink = start_sink(args.port, args.latency)
+    print(f"SMTP sink listening on 127.0.0.1:{sink.port}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"{sink.connections} connections, {len(sink.messages)} messages")
+    except KeyboardInterrupt:
+        sink.shutdown()
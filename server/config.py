@@ -25,22 +25,137 @@ class Config:
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_USERNAME')
+
+    # Outbound mail queue (outbound_email table, drained by background workers)
+    MAIL_QUEUE_ENABLED = os.getenv('MAIL_QUEUE_ENABLED', 'true').lower() == 'true'  # false sends inline
+    MAIL_QUEUE_WORKERS = int(os.getenv('MAIL_QUEUE_WORKERS', 2))
+    MAIL_QUEUE_BATCH_SIZE = int(os.getenv('MAIL_QUEUE_BATCH_SIZE', 20))  # messages per SMTP connection
+    MAIL_QUEUE_POLL_INTERVAL = float(os.getenv('MAIL_QUEUE_POLL_INTERVAL', 5))  # seconds
+    MAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv('MAIL_QUEUE_MAX_ATTEMPTS', 6))  # then dead-lettered
+    MAIL_QUEUE_BACKOFF_BASE = float(os.getenv('MAIL_QUEUE_BACKOFF_BASE', 30))  # seconds, doubled per attempt
+    MAIL_QUEUE_BACKOFF_MAX = float(os.getenv('MAIL_QUEUE_BACKOFF_MAX', 3600))
+    MAIL_QUEUE_LEASE = int(os.getenv('MAIL_QUEUE_LEASE', 300))  # seconds before a stuck claimed batch is retried
+    MAIL_QUEUE_RETENTION_DAYS = int(os.getenv('MAIL_QUEUE_RETENTION_DAYS', 7))  # sent rows kept this long
     
     # JWT configuration
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+
+    # Auth middleware: per-process cache of verified tokens -> user snapshots
+    AUTH_CACHE_ENABLED = os.getenv('AUTH_CACHE_ENABLED', 'true').lower() == 'true'
+    AUTH_CACHE_MAX_SIZE = int(os.getenv('AUTH_CACHE_MAX_SIZE', 4096))
+    AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', 300))  # seconds
+    AUTH_CACHE_RECHECK = int(os.getenv('AUTH_CACHE_RECHECK', 5))  # seconds before a cached user is checked against user.updated_at
+
+    # Admin directory: per-process admin list and client -> admin routing ring
+    ADMIN_DIRECTORY_TTL = int(os.getenv('ADMIN_DIRECTORY_TTL', 60))  # seconds before other workers' changes are seen
+    ADMIN_DIRECTORY_REPLICAS = int(os.getenv('ADMIN_DIRECTORY_REPLICAS', 64))  # ring points per admin
+
+    # Blog listing: per-process cache of rendered pages, invalidated by the blog handlers
+    BLOG_CACHE_ENABLED = os.getenv('BLOG_CACHE_ENABLED', 'true').lower() == 'true'
+    BLOG_CACHE_MAX_SIZE = int(os.getenv('BLOG_CACHE_MAX_SIZE', 256))  # (page, per_page) entries
+    BLOG_CACHE_TTL = int(os.getenv('BLOG_CACHE_TTL', 30))  # seconds before other workers' changes are seen
+
+    # Search: 'auto' uses the PostgreSQL search_vector columns when present, else an in-process index
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')  # auto, postgres, memory
+    SEARCH_INDEX_REFRESH = float(os.getenv('SEARCH_INDEX_REFRESH', 2))  # seconds between in-process index syncs
+
+    # File downloads: 'none' streams from the worker with sendfile(), 'x-accel' (nginx) and
+    # 'x-sendfile' (Apache, lighttpd) hand the transfer to the front server once authorized
+    DOWNLOAD_OFFLOAD = os.getenv('DOWNLOAD_OFFLOAD', 'none')
+    DOWNLOAD_ACCEL_PREFIX = os.getenv('DOWNLOAD_ACCEL_PREFIX', '/protected-uploads')  # nginx internal location for UPLOAD_FOLDER
+    DOWNLOAD_URL_SECRET = os.getenv('DOWNLOAD_URL_SECRET')  # signs download links; falls back to SECRET_KEY
+    DOWNLOAD_URL_TTL = int(os.getenv('DOWNLOAD_URL_TTL', 900))  # seconds a signed download link stays valid
+
+    # Resumable chunked uploads (/api/uploads), attached to jobs and messages by id once complete
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))  # largest chunk accepted per PUT
+    UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', 100 * 1024 * 1024))  # per file
+    UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL', 24 * 60 * 60))  # seconds an idle or unattached upload is kept
+
+    # Start the scheduler and queue workers when the app is created; python app.py and gunicorn
+    # (gunicorn.conf.py) start them regardless. Leave off for migrations, seed.py and scripts
+    START_WORKERS = os.getenv('START_WORKERS', 'false').lower() == 'true'
+
+    # Scheduler for periodic maintenance: every worker runs it, each due task runs in one of them
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SCHEDULER_TICK = float(os.getenv('SCHEDULER_TICK', 30))  # seconds between checks for due tasks
+    SCHEDULER_JITTER = float(os.getenv('SCHEDULER_JITTER', 60))  # up to this many seconds added to each run time
+    SCHEDULER_HISTORY_DAYS = int(os.getenv('SCHEDULER_HISTORY_DAYS', 14))  # scheduled_task_run rows kept
+
+    # Upload retention: stored_file.expires_at is set by policy and swept through its index
+    UPLOAD_RETENTION_ENABLED = os.getenv('UPLOAD_RETENTION_ENABLED', 'true').lower() == 'true'
+    UPLOAD_RETENTION_DRY_RUN = os.getenv('UPLOAD_RETENTION_DRY_RUN', 'false').lower() == 'true'  # count and log, delete nothing
+    UPLOAD_RETENTION_DAYS = int(os.getenv('UPLOAD_RETENTION_DAYS', 30))  # general message attachments, from sending; 0 keeps them
+    UPLOAD_JOB_RETENTION_DAYS = int(os.getenv('UPLOAD_JOB_RETENTION_DAYS', 30))  # job files, from completion; 0 keeps them
+    UPLOAD_RETENTION_SCHEDULE = os.getenv('UPLOAD_RETENTION_SCHEDULE', '*/15 * * * *')  # cron, UTC
+    UPLOAD_RETENTION_BATCH_SIZE = int(os.getenv('UPLOAD_RETENTION_BATCH_SIZE', 500))  # files per committed batch
+    UPLOAD_RETENTION_MAX_BATCHES = int(os.getenv('UPLOAD_RETENTION_MAX_BATCHES', 100))  # per sweep; the rest waits for the next
+
+    # Rate limiting: token buckets per signed-in user (per client address otherwise) in named budgets.
+    # '<n>/<second|minute|hour|day>' refills n tokens per period; 'burst <m>' makes the bucket hold m instead of n
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_STORAGE = os.getenv('RATE_LIMIT_STORAGE', 'shm')  # shm (file shared by this host's workers), sql, memory
+    RATE_LIMIT_SHM_PATH = os.getenv('RATE_LIMIT_SHM_PATH')  # defaults to a file in /dev/shm named for the database
+    RATE_LIMIT_SLOTS = int(os.getenv('RATE_LIMIT_SLOTS', 65536))  # buckets held by shm/memory storage, 32 bytes each
+    RATE_LIMIT_BUDGETS = {
+        'default': os.getenv('RATE_LIMIT_DEFAULT', '120/minute burst 60'),
+        'auth': os.getenv('RATE_LIMIT_AUTH', '10/minute'),  # sign-in, registration, password reset, contact form
+        'session': os.getenv('RATE_LIMIT_SESSION', '60/minute'),  # /me, refresh, logout
+        'messages': os.getenv('RATE_LIMIT_MESSAGES', '600/minute burst 120'),  # chat, including sync polling
+        'files': os.getenv('RATE_LIMIT_FILES', '1200/hour burst 300'),
+        'uploads': os.getenv('RATE_LIMIT_UPLOADS', '2000/hour burst 200'),  # one request per chunk
+        'payments': os.getenv('RATE_LIMIT_PAYMENTS', '30/minute'),
+    }
     
+    # Socket.IO cross-process bus: 'local', 'unix' (broker run by one of the workers), 'unix:///path.sock',
+    # 'postgres' (LISTEN/NOTIFY on DATABASE_URL), or a redis://, amqp://, kafka:// URL
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', 'unix')
+    SOCKETIO_CHANNEL = os.getenv('SOCKETIO_CHANNEL', 'flask-socketio')
+
+    # Outbound HTTP client (Pesapal, Apple, Google)
+    HTTP_CLIENT_POOL_CONNECTIONS = int(os.getenv('HTTP_CLIENT_POOL_CONNECTIONS', 10))  # hosts kept pooled
+    HTTP_CLIENT_POOL_MAXSIZE = int(os.getenv('HTTP_CLIENT_POOL_MAXSIZE', 20))  # keep-alive connections per host
+    HTTP_CLIENT_CONNECT_TIMEOUT = float(os.getenv('HTTP_CLIENT_CONNECT_TIMEOUT', 5))
+    HTTP_CLIENT_READ_TIMEOUT = float(os.getenv('HTTP_CLIENT_READ_TIMEOUT', 10))
+    HTTP_CLIENT_MAX_RETRIES = int(os.getenv('HTTP_CLIENT_MAX_RETRIES', 2))
+    HTTP_CLIENT_BACKOFF_BASE = float(os.getenv('HTTP_CLIENT_BACKOFF_BASE', 0.5))  # seconds, doubled per attempt
+    HTTP_CLIENT_BACKOFF_MAX = float(os.getenv('HTTP_CLIENT_BACKOFF_MAX', 8))
+
     # Pesapal configuration
     PESAPAL_CONSUMER_KEY = os.getenv('PESAPAL_CONSUMER_KEY')
     PESAPAL_CONSUMER_SECRET = os.getenv('PESAPAL_CONSUMER_SECRET')
     PESAPAL_ENVIRONMENT = os.getenv('PESAPAL_ENVIRONMENT', 'sandbox')  # 'sandbox' or 'live'
     PESAPAL_ADMIN_EMAIL = os.getenv('PESAPAL_ADMIN_EMAIL', 'admin@example.com')  # Admin email for notifications
+    PESAPAL_BASE_URL = os.getenv('PESAPAL_BASE_URL')  # Optional override, e.g. a local stub server
+    PESAPAL_TOKEN_REFRESH_MARGIN = int(os.getenv('PESAPAL_TOKEN_REFRESH_MARGIN', 60))  # seconds before expiry to refresh
+
+    # Pesapal IPN pipeline: notifications are recorded and acknowledged, then reconciled by background workers
+    IPN_QUEUE_ENABLED = os.getenv('IPN_QUEUE_ENABLED', 'true').lower() == 'true'  # false reconciles before answering
+    IPN_QUEUE_WORKERS = int(os.getenv('IPN_QUEUE_WORKERS', 4))
+    IPN_QUEUE_BATCH_SIZE = int(os.getenv('IPN_QUEUE_BATCH_SIZE', 10))  # notifications claimed per worker pass
+    IPN_QUEUE_POLL_INTERVAL = float(os.getenv('IPN_QUEUE_POLL_INTERVAL', 5))  # seconds
+    IPN_QUEUE_MAX_ATTEMPTS = int(os.getenv('IPN_QUEUE_MAX_ATTEMPTS', 8))  # then left 'failed' until the next notification
+    IPN_QUEUE_BACKOFF_BASE = float(os.getenv('IPN_QUEUE_BACKOFF_BASE', 15))  # seconds, doubled per attempt
+    IPN_QUEUE_BACKOFF_MAX = float(os.getenv('IPN_QUEUE_BACKOFF_MAX', 1800))
+    IPN_QUEUE_LEASE = int(os.getenv('IPN_QUEUE_LEASE', 120))  # seconds before a stuck claimed notification is retried
+
+    # Payment reconciliation: settles jobs no IPN has settled by asking Pesapal for their orders' status
+    PAYMENT_RECONCILE_ENABLED = os.getenv('PAYMENT_RECONCILE_ENABLED', 'true').lower() == 'true'
+    PAYMENT_RECONCILE_SCHEDULE = os.getenv('PAYMENT_RECONCILE_SCHEDULE', '*/5 * * * *')
+    PAYMENT_RECONCILE_CONCURRENCY = int(os.getenv('PAYMENT_RECONCILE_CONCURRENCY', 8))  # status requests in flight; keep under HTTP_CLIENT_POOL_MAXSIZE
+    PAYMENT_RECONCILE_BATCH_SIZE = int(os.getenv('PAYMENT_RECONCILE_BATCH_SIZE', 100))
+    PAYMENT_RECONCILE_MAX_BATCHES = int(os.getenv('PAYMENT_RECONCILE_MAX_BATCHES', 20))  # per run
+    PAYMENT_RECONCILE_STALE_AFTER = int(os.getenv('PAYMENT_RECONCILE_STALE_AFTER', 600))  # seconds a job sits unsettled before it is checked
+    PAYMENT_RECONCILE_RECHECK_AFTER = int(os.getenv('PAYMENT_RECONCILE_RECHECK_AFTER', 900))  # seconds between checks of one order
+    PAYMENT_RECONCILE_GIVE_UP_DAYS = int(os.getenv('PAYMENT_RECONCILE_GIVE_UP_DAYS', 3))  # older unsettled jobs are left alone
+    PAYMENT_STATUS_MAX_AGE = int(os.getenv('PAYMENT_STATUS_MAX_AGE', 30))  # seconds a recorded status answers status polls
+    PAYMENT_STATUS_CACHE_TTL = int(os.getenv('PAYMENT_STATUS_CACHE_TTL', 5))  # seconds a worker reuses a status in memory
+    PAYMENT_STATUS_CACHE_FINAL_TTL = int(os.getenv('PAYMENT_STATUS_CACHE_FINAL_TTL', 300))  # for Completed, Failed, Reversed
+    PAYMENT_STATUS_CACHE_MAX_SIZE = int(os.getenv('PAYMENT_STATUS_CACHE_MAX_SIZE', 1024))  # orders kept per worker
 
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_ECHO = False  # Log SQL queries
-    # Increase rate limits for development
-    RATE_LIMITS = ["1000 per day", "200 per hour"]
 
 class ProductionConfig(Config):
     DEBUG = False
@@ -50,7 +165,6 @@ class ProductionConfig(Config):
         'pool_size': 10,
         'max_overflow': 20,
     }
-    RATE_LIMITS = ["1000 per day", "200 per hour"]
 
 config = {
     'development': DevelopmentConfig,
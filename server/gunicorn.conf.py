@@ -0,0 +1,7 @@
+# Picked up from the working directory: gunicorn -k eventlet -w 4 app:app
+
+
+def post_worker_init(worker):
+    # Each worker process runs its own scheduler and queue workers; importing the app doesn't start them
+    from app import start_workers
+    start_workers(worker.wsgi)
@@ -0,0 +1,132 @@
+"""Move upload paths from JSON columns into stored_file / stored_blob
+
+Revision ID: 2f6a8c1d9b57
+Revises: 9d3a5c7e1b24
+Create Date: 2026-10-17 19:26:43.510377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import posixpath
+
+
+# revision identifiers, used by Alembic.
+revision = '2f6a8c1d9b57'
+down_revision = '9d3a5c7e1b24'
+branch_labels = None
+depends_on = None
+
+job = sa.table('job', sa.column('id', sa.Integer), sa.column('files', sa.JSON),
+               sa.column('completed_files', sa.JSON), sa.column('user_id', sa.Integer),
+               sa.column('created_at', sa.DateTime))
+message = sa.table('message', sa.column('id', sa.Integer), sa.column('job_id', sa.Integer),
+                   sa.column('files', sa.JSON), sa.column('sender_id', sa.Integer),
+                   sa.column('created_at', sa.DateTime))
+
+
+def _stored_file_table():
+    return sa.table('stored_file', sa.column('id', sa.Integer), sa.column('path', sa.String),
+                    sa.column('filename', sa.String), sa.column('kind', sa.String),
+                    sa.column('job_id', sa.Integer), sa.column('message_id', sa.Integer),
+                    sa.column('uploaded_by', sa.Integer), sa.column('created_at', sa.DateTime))
+
+
+def upgrade():
+    op.create_table('stored_blob',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_table('stored_file',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('path', sa.String(length=512), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('content_type', sa.String(length=255), nullable=True),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('sha256', sa.String(length=64), nullable=True),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('job_id', sa.Integer(), nullable=True),
+        sa.Column('message_id', sa.Integer(), nullable=True),
+        sa.Column('uploaded_by', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['sha256'], ['stored_blob.sha256']),
+        sa.ForeignKeyConstraint(['job_id'], ['job.id']),
+        sa.ForeignKeyConstraint(['message_id'], ['message.id']),
+        sa.ForeignKeyConstraint(['uploaded_by'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('stored_file', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_stored_file_path'), ['path'], unique=False)
+        batch_op.create_index(batch_op.f('ix_stored_file_sha256'), ['sha256'], unique=False)
+        batch_op.create_index(batch_op.f('ix_stored_file_job_id'), ['job_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_stored_file_message_id'), ['message_id'], unique=False)
+
+    # Existing files keep their paths and are recorded without a blob (not deduplicated)
+    connection = op.get_bind()
+    rows, job_rows = [], {}
+    for job_id, files, completed, user_id, created_at in connection.execute(sa.select(
+            job.c.id, job.c.files, job.c.completed_files, job.c.user_id, job.c.created_at).order_by(job.c.id)):
+        for kind, paths, uploaded_by in (('job', files, user_id), ('completed', completed, None)):
+            for path in paths or []:
+                path = path.replace('\\', '/')
+                row = {'path': path, 'filename': posixpath.basename(path), 'kind': kind, 'job_id': job_id,
+                       'message_id': None, 'uploaded_by': uploaded_by, 'created_at': created_at}
+                job_rows[(job_id, path)] = row
+                rows.append(row)
+
+    # A job message's attachments were also appended to the job's lists; record each once
+    for message_id, job_id, files, sender_id, created_at in connection.execute(sa.select(
+            message.c.id, message.c.job_id, message.c.files, message.c.sender_id, message.c.created_at
+    ).order_by(message.c.id)):
+        for path in files or []:
+            path = path.replace('\\', '/')
+            row = job_rows.get((job_id, path))
+            if row is not None and row['message_id'] is None:
+                row.update(message_id=message_id, uploaded_by=sender_id, created_at=created_at)
+            else:
+                rows.append({'path': path, 'filename': posixpath.basename(path), 'kind': 'message', 'job_id': job_id,
+                             'message_id': message_id, 'uploaded_by': sender_id, 'created_at': created_at})
+
+    if rows:
+        op.bulk_insert(_stored_file_table(), rows)
+
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_column('files')
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_column('completed_files')
+        batch_op.drop_column('files')
+
+
+def downgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('files', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('completed_files', sa.JSON(), nullable=True))
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('files', sa.JSON(), nullable=True))
+
+    # Deduplicated uploads are hard links at these paths, so the old code can serve them as they are
+    stored_file = _stored_file_table()
+    connection = op.get_bind()
+    by_job, by_message = {}, {}
+    for path, kind, job_id, message_id in connection.execute(sa.select(
+            stored_file.c.path, stored_file.c.kind, stored_file.c.job_id, stored_file.c.message_id
+    ).order_by(stored_file.c.id)):
+        if job_id is not None and kind in ('job', 'completed'):
+            by_job.setdefault(job_id, {'files': [], 'completed_files': []})[
+                'files' if kind == 'job' else 'completed_files'].append(path)
+        if message_id is not None:
+            by_message.setdefault(message_id, []).append(path)
+    for job_id, values in by_job.items():
+        connection.execute(job.update().where(job.c.id == job_id).values(**values))
+    for message_id, files in by_message.items():
+        connection.execute(message.update().where(message.c.id == message_id).values(files=files))
+
+    with op.batch_alter_table('stored_file', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_stored_file_message_id'))
+        batch_op.drop_index(batch_op.f('ix_stored_file_job_id'))
+        batch_op.drop_index(batch_op.f('ix_stored_file_sha256'))
+        batch_op.drop_index(batch_op.f('ix_stored_file_path'))
+    op.drop_table('stored_file')
+    op.drop_table('stored_blob')
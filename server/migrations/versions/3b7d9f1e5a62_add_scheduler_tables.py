@@ -0,0 +1,51 @@
+"""Add scheduled_task and scheduled_task_run tables for the maintenance scheduler
+
+Revision ID: 3b7d9f1e5a62
+Revises: 8e1f5b2c7d40
+Create Date: 2026-10-18 00:27:44.902316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7d9f1e5a62'
+down_revision = '8e1f5b2c7d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scheduled_task',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('schedule', sa.String(length=100), nullable=False),
+        sa.Column('next_run_at', sa.DateTime(), nullable=False),
+        sa.Column('last_started_at', sa.DateTime(), nullable=True),
+        sa.Column('last_finished_at', sa.DateTime(), nullable=True),
+        sa.Column('last_status', sa.String(length=20), nullable=True),
+        sa.Column('last_runner', sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('scheduled_task_run',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('task', sa.String(length=100), nullable=False),
+        sa.Column('runner', sa.String(length=255), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('duration', sa.Float(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('detail', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('scheduled_task_run', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_scheduled_task_run_task'), ['task'], unique=False)
+        batch_op.create_index(batch_op.f('ix_scheduled_task_run_started_at'), ['started_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('scheduled_task_run', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_scheduled_task_run_started_at'))
+        batch_op.drop_index(batch_op.f('ix_scheduled_task_run_task'))
+    op.drop_table('scheduled_task_run')
+    op.drop_table('scheduled_task')
@@ -0,0 +1,118 @@
+"""Add rendered HTML and summary fields to Blog model
+
+Revision ID: 4b8e1d6f2a93
+Revises: e7b2d4a9c615
+Create Date: 2026-10-17 14:02:11.384920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from html import escape
+from urllib.parse import urlsplit
+import math
+import re
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8e1d6f2a93'
+down_revision = 'e7b2d4a9c615'
+branch_labels = None
+depends_on = None
+
+
+# The blog renderer (server/services/blog_render.py) as of this revision, frozen here so the
+# backfill doesn't change with, or break on, later changes to the application
+
+_BOLD = re.compile(r'\*\*(.*?)\*\*')
+_ITALIC = re.compile(r'(?<!\*)\*([^*]+?)\*(?!\*)')
+_LINK = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
+_IGNORED_IN_URL = re.compile(r'[\x00-\x20]')
+
+_PLAIN_STEPS = (
+    (re.compile(r'##\s+'), ''),
+    (re.compile(r'^\*\s+', re.MULTILINE), ''),
+    (_BOLD, r'\1'),
+    (_ITALIC, r'\1'),
+    (_LINK, r'\1'),
+    (re.compile(r'\s+'), ' ')
+)
+
+
+def _link(match):
+    text, url = match.group(1), match.group(2)
+    if urlsplit(_IGNORED_IN_URL.sub('', url)).scheme.lower() not in ('', 'http', 'https', 'mailto'):
+        return text
+    return f'<a href="{url}" class="content-link" target="_blank" rel="noopener noreferrer">{text}</a>'
+
+
+def _inline(text):
+    text = escape(text)
+    text = _BOLD.sub(r'<strong class="bold-text">\1</strong>', text)
+    text = _ITALIC.sub(r'<em class="italic-text">\1</em>', text)
+    return _LINK.sub(_link, text)
+
+
+def _content_to_html(content):
+    parts = []
+    items = []
+    section = 0
+
+    def close_list():
+        if items:
+            parts.append('<ul class="content-list">' + ''.join(items) + '</ul>')
+            items.clear()
+
+    for line in content.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('## '):
+            close_list()
+            parts.append(f'<h2 id="section-{section}" class="section-heading">{escape(line[3:])}</h2>')
+            section += 1
+        elif line.endswith(':') and not line.startswith('*') and len(line.split(' ')) <= 4:
+            close_list()
+            parts.append(f'<h3 class="subsection-heading">{escape(line.replace(":", "", 1))}</h3>')
+        elif line.startswith('* '):
+            items.append(f'<li class="list-item">{_inline(line[2:])}</li>')
+        else:
+            close_list()
+            parts.append(f'<p class="content-paragraph">{_inline(line)}</p>')
+    close_list()
+    return '\n'.join(parts)
+
+
+def _render_content(content):
+    text = content
+    for pattern, replacement in _PLAIN_STEPS:
+        text = pattern.sub(replacement, text)
+    text = text.strip()
+    word_count = len(text.split())
+    return {
+        'content_html': _content_to_html(content),
+        'excerpt': text if len(text) <= 150 else text[:147] + '...',
+        'word_count': word_count,
+        'reading_time': max(1, math.ceil(word_count / 200))
+    }
+
+
+def upgrade():
+    op.add_column('blog', sa.Column('content_html', sa.Text(), nullable=True))
+    op.add_column('blog', sa.Column('excerpt', sa.String(length=255), nullable=True))
+    op.add_column('blog', sa.Column('word_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('blog', sa.Column('reading_time', sa.Integer(), server_default='1', nullable=False))
+
+    # Render existing posts so the listing never has to
+    blog = sa.table('blog', sa.column('id', sa.Integer), sa.column('content', sa.Text),
+                    sa.column('content_html', sa.Text), sa.column('excerpt', sa.String),
+                    sa.column('word_count', sa.Integer), sa.column('reading_time', sa.Integer))
+    connection = op.get_bind()
+    for blog_id, content in connection.execute(sa.select(blog.c.id, blog.c.content)).fetchall():
+        connection.execute(blog.update().where(blog.c.id == blog_id).values(**_render_content(content or '')))
+
+
+def downgrade():
+    op.drop_column('blog', 'reading_time')
+    op.drop_column('blog', 'word_count')
+    op.drop_column('blog', 'excerpt')
+    op.drop_column('blog', 'content_html')
@@ -0,0 +1,45 @@
+"""Add payment_notification table for the IPN pipeline
+
+Revision ID: 5f2a8c6e0d19
+Revises: 3b7d9f1e5a62
+Create Date: 2026-10-18 01:12:09.415873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2a8c6e0d19'
+down_revision = '3b7d9f1e5a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payment_notification',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_tracking_id', sa.String(length=64), nullable=False),
+        sa.Column('payment_status', sa.String(length=50), nullable=False),
+        sa.Column('merchant_reference', sa.String(length=100), nullable=True),
+        sa.Column('notification_type', sa.String(length=32), nullable=True),
+        sa.Column('state', sa.String(length=20), nullable=False),
+        sa.Column('received_count', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('job_id', sa.Integer(), nullable=True),
+        sa.Column('first_received_at', sa.DateTime(), nullable=False),
+        sa.Column('last_received_at', sa.DateTime(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('order_tracking_id', 'payment_status', name='uq_payment_notification_order_status')
+    )
+    with op.batch_alter_table('payment_notification', schema=None) as batch_op:
+        batch_op.create_index('ix_payment_notification_state_next_attempt_at', ['state', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payment_notification', schema=None) as batch_op:
+        batch_op.drop_index('ix_payment_notification_state_next_attempt_at')
+    op.drop_table('payment_notification')
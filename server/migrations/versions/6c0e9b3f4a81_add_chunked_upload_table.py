@@ -0,0 +1,44 @@
+"""Add chunked_upload table for resumable uploads
+
+Revision ID: 6c0e9b3f4a81
+Revises: 2f6a8c1d9b57
+Create Date: 2026-10-17 21:04:12.338190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c0e9b3f4a81'
+down_revision = '2f6a8c1d9b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chunked_upload',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('content_type', sa.String(length=255), nullable=True),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('received', sa.BigInteger(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['sha256'], ['stored_blob.sha256']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('chunked_upload', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chunked_upload_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_chunked_upload_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('chunked_upload', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chunked_upload_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_chunked_upload_user_id'))
+    op.drop_table('chunked_upload')
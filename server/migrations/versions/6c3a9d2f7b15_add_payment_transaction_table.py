@@ -0,0 +1,35 @@
+"""Add payment_transaction table caching Pesapal transaction statuses
+
+Revision ID: 6c3a9d2f7b15
+Revises: b8e4f0a2c917
+Create Date: 2026-10-18 03:20:44.718302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c3a9d2f7b15'
+down_revision = 'b8e4f0a2c917'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payment_transaction',
+        sa.Column('order_tracking_id', sa.String(length=64), nullable=False),
+        sa.Column('job_id', sa.Integer(), nullable=True),
+        sa.Column('payment_status', sa.String(length=50), nullable=True),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('amount', sa.Float(), nullable=True),
+        sa.Column('currency', sa.String(length=10), nullable=True),
+        sa.Column('confirmation_code', sa.String(length=100), nullable=True),
+        sa.Column('data', sa.JSON(), nullable=False),
+        sa.Column('checked_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('order_tracking_id')
+    )
+
+
+def downgrade():
+    op.drop_table('payment_transaction')
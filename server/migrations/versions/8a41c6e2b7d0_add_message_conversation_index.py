@@ -0,0 +1,25 @@
+"""Add (sender_id, recipient_id, created_at) index to Message model
+
+Revision ID: 8a41c6e2b7d0
+Revises: 5e2c7a9d1f43
+Create Date: 2026-10-17 11:20:53.614207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a41c6e2b7d0'
+down_revision = '5e2c7a9d1f43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Backs before_id/after_id paging of chat history, one range scan per direction of a thread
+    op.create_index('ix_message_sender_recipient_created_at', 'message', ['sender_id', 'recipient_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_message_sender_recipient_created_at', table_name='message')
@@ -0,0 +1,34 @@
+"""Add rate_limit_bucket table for the SQL rate limiter storage
+
+Revision ID: 8e1f5b2c7d40
+Revises: a4d7c2e9f063
+Create Date: 2026-10-17 23:41:06.517204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e1f5b2c7d40'
+down_revision = 'a4d7c2e9f063'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rate_limit_bucket',
+        sa.Column('key', sa.String(length=160), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.Float(), nullable=False),
+        sa.Column('full_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('rate_limit_bucket', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_rate_limit_bucket_full_at'), ['full_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('rate_limit_bucket', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_rate_limit_bucket_full_at'))
+    op.drop_table('rate_limit_bucket')
@@ -0,0 +1,32 @@
+"""Add change_marker table for the blog listing's Last-Modified
+
+Revision ID: 9d1e7a4c3b28
+Revises: 6c3a9d2f7b15
+Create Date: 2026-10-18 09:41:27.530218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime
+
+
+# revision identifiers, used by Alembic.
+revision = '9d1e7a4c3b28'
+down_revision = '6c3a9d2f7b15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('change_marker',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    # Now, rather than the newest post's date: a post may have been deleted since
+    marker = sa.table('change_marker', sa.column('name', sa.String), sa.column('changed_at', sa.DateTime))
+    op.bulk_insert(marker, [{'name': 'blog', 'changed_at': datetime.utcnow()}])
+
+
+def downgrade():
+    op.drop_table('change_marker')
@@ -0,0 +1,47 @@
+"""Add full-text search_vector columns and GIN indexes to Job and Blog
+
+Revision ID: 9d3a5c7e1b24
+Revises: 4b8e1d6f2a93
+Create Date: 2026-10-17 15:21:37.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3a5c7e1b24'
+down_revision = '4b8e1d6f2a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # PostgreSQL only; other databases use the in-process index in server/services/search.py.
+    # Generated columns keep the vectors current without triggers or application code.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("""
+        ALTER TABLE job ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(subject, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(instructions, '')), 'C')
+        ) STORED
+    """)
+    op.execute("""
+        ALTER TABLE blog ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(content, '')), 'C')
+        ) STORED
+    """)
+    op.create_index('ix_job_search_vector', 'job', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_blog_search_vector', 'blog', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_blog_search_vector', table_name='blog')
+    op.drop_index('ix_job_search_vector', table_name='job')
+    op.drop_column('blog', 'search_vector')
+    op.drop_column('job', 'search_vector')
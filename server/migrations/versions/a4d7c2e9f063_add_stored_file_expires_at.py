@@ -0,0 +1,53 @@
+"""Add stored_file.expires_at for upload retention
+
+Revision ID: a4d7c2e9f063
+Revises: 6c0e9b3f4a81
+Create Date: 2026-10-17 22:18:37.904215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime, timedelta
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d7c2e9f063'
+down_revision = '6c0e9b3f4a81'
+branch_labels = None
+depends_on = None
+
+RETENTION_DAYS = 30  # the UPLOAD_RETENTION_DAYS / UPLOAD_JOB_RETENTION_DAYS defaults
+
+stored_file = sa.table('stored_file', sa.column('id', sa.Integer), sa.column('job_id', sa.Integer),
+                       sa.column('message_id', sa.Integer), sa.column('created_at', sa.DateTime),
+                       sa.column('expires_at', sa.DateTime))
+job = sa.table('job', sa.column('id', sa.Integer), sa.column('status', sa.String))
+
+
+def upgrade():
+    with op.batch_alter_table('stored_file', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('expires_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_stored_file_expires_at'), ['expires_at'], unique=False)
+
+    connection = op.get_bind()
+    now = datetime.utcnow()
+    # Completed jobs get a full retention period from now rather than a mass deletion on deploy
+    connection.execute(stored_file.update().where(
+        stored_file.c.job_id.in_(sa.select(job.c.id).where(job.c.status == 'Completed'))
+    ).values(expires_at=now + timedelta(days=RETENTION_DAYS)))
+    # General message attachments keep the old 30 days from upload
+    rows = [{'file_id': file_id, 'expires': (created_at or now) + timedelta(days=RETENTION_DAYS)}
+            for file_id, created_at in connection.execute(sa.select(stored_file.c.id, stored_file.c.created_at).where(
+                stored_file.c.job_id.is_(None), stored_file.c.message_id.isnot(None)))]
+    if rows:
+        connection.execute(stored_file.update().where(stored_file.c.id == sa.bindparam('file_id')).values(
+            expires_at=sa.bindparam('expires')), rows)
+    connection.execute(stored_file.update().where(
+        stored_file.c.job_id.is_(None), stored_file.c.message_id.is_(None)
+    ).values(expires_at=now))
+
+
+def downgrade():
+    with op.batch_alter_table('stored_file', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_stored_file_expires_at'))
+        batch_op.drop_column('expires_at')
@@ -0,0 +1,31 @@
+"""Add indexes on Job tracking ids and merchant references
+
+Revision ID: b8e4f0a2c917
+Revises: 5f2a8c6e0d19
+Create Date: 2026-10-18 02:03:51.260448
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4f0a2c917'
+down_revision = '5f2a8c6e0d19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Backs the job lookups of IPN processing and GET /api/payments/status
+    op.create_index(op.f('ix_job_order_tracking_id'), 'job', ['order_tracking_id'], unique=False)
+    op.create_index(op.f('ix_job_completion_tracking_id'), 'job', ['completion_tracking_id'], unique=False)
+    op.create_index(op.f('ix_job_merchant_reference'), 'job', ['merchant_reference'], unique=False)
+    op.create_index(op.f('ix_job_completion_reference'), 'job', ['completion_reference'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_job_completion_reference'), table_name='job')
+    op.drop_index(op.f('ix_job_merchant_reference'), table_name='job')
+    op.drop_index(op.f('ix_job_completion_tracking_id'), table_name='job')
+    op.drop_index(op.f('ix_job_order_tracking_id'), table_name='job')
@@ -0,0 +1,25 @@
+"""Add (job_id, created_at) index to Message model
+
+Revision ID: c3f9e1a7d254
+Revises: 8a41c6e2b7d0
+Create Date: 2026-10-17 12:02:37.118460
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f9e1a7d254'
+down_revision = '8a41c6e2b7d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Job threads (job detail, GET /api/jobs/<id>/messages) filter on job_id and page by created_at
+    op.create_index('ix_message_job_id_created_at', 'message', ['job_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_message_job_id_created_at', table_name='message')
@@ -0,0 +1,27 @@
+"""Add (updated_at, id) keyset indexes to Job model
+
+Revision ID: d53b0581a5f9
+Revises: df5ab8fbbe27
+Create Date: 2026-10-16 09:12:41.508213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd53b0581a5f9'
+down_revision = 'df5ab8fbbe27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Backs keyset pagination and updated_since sync on GET /api/jobs
+    op.create_index('ix_job_updated_at_id', 'job', ['updated_at', 'id'], unique=False)
+    op.create_index('ix_job_user_id_updated_at_id', 'job', ['user_id', 'updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_job_user_id_updated_at_id', table_name='job')
+    op.drop_index('ix_job_updated_at_id', table_name='job')
@@ -0,0 +1,25 @@
+"""Add updated_at index to Blog model
+
+Revision ID: e7b2d4a9c615
+Revises: c3f9e1a7d254
+Create Date: 2026-10-17 13:10:52.604117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2d4a9c615'
+down_revision = 'c3f9e1a7d254'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The blog listing's Last-Modified is max(updated_at) over all blogs
+    op.create_index(op.f('ix_blog_updated_at'), 'blog', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_blog_updated_at'), table_name='blog')
@@ -53,21 +53,32 @@ class Job(db.Model):
     spacing = db.Column(db.String(50), default='double')
     total_amount = db.Column(db.Float, nullable=False)
     payment_status = db.Column(db.String(50), default='Pending', index=True)
-    order_tracking_id = db.Column(db.String(36), nullable=True)
-    completion_tracking_id = db.Column(db.String(36), nullable=True)
-    merchant_reference = db.Column(db.String(100), nullable=True)
-    completion_reference = db.Column(db.String(100), nullable=True)
+    order_tracking_id = db.Column(db.String(36), nullable=True, index=True)
+    completion_tracking_id = db.Column(db.String(36), nullable=True, index=True)
+    merchant_reference = db.Column(db.String(100), nullable=True, index=True)
+    completion_reference = db.Column(db.String(100), nullable=True, index=True)
     status = db.Column(db.String(50), default='Pending Payment', index=True)
-    files = db.Column(db.JSON, default=list)
-    completed_files = db.Column(db.JSON, default=list)
     completed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC), onupdate=lambda: datetime.now(pytz.UTC))
 
     __table_args__ = (
         db.CheckConstraint('payment_status IN (\'Pending\', \'Partial\', \'Completed\')', name='check_payment_status'),
+        db.Index('ix_job_updated_at_id', 'updated_at', 'id'),
+        db.Index('ix_job_user_id_updated_at_id', 'user_id', 'updated_at', 'id'),
     )
 
+    stored_files = db.relationship('StoredFile', backref='job', lazy='selectin', order_by='StoredFile.id')
+
+    # Upload paths by kind, as the API has always listed them; the rows live in stored_file
+    @property
+    def files(self):
+        return [f.path for f in self.stored_files if f.kind == 'job']
+
+    @property
+    def completed_files(self):
+        return [f.path for f in self.stored_files if f.kind == 'completed']
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -97,6 +108,31 @@ class Job(db.Model):
             'updated_at': self.updated_at.isoformat()
         }
 
+    # Compact list projection: leaves out instructions and the file arrays
+    def to_summary_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'client_name': self.client_name,
+            'client_email': self.client_email,
+            'subject': self.subject,
+            'title': self.title,
+            'pages': self.pages,
+            'deadline': self.deadline.isoformat(),
+            'cited_resources': self.cited_resources,
+            'formatting_style': self.formatting_style,
+            'writer_level': self.writer_level,
+            'spacing': self.spacing,
+            'total_amount': self.total_amount,
+            'payment_status': self.payment_status,
+            'order_tracking_id': self.order_tracking_id,
+            'completion_tracking_id': self.completion_tracking_id,
+            'status': self.status,
+            'completed': self.completed,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
 class ResetToken(db.Model):
     __tablename__ = 'reset_token'
     id = db.Column(db.Integer, primary_key=True)
@@ -122,12 +158,23 @@ class Message(db.Model):
     recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
     sender_role = db.Column(db.String(50), nullable=False)
     content = db.Column(db.Text, nullable=True)
-    files = db.Column(db.JSON, default=list)
     client_deleted = db.Column(db.Boolean, default=False)
     admin_deleted = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC), index=True)
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC), onupdate=lambda: datetime.now(pytz.UTC))
 
+    __table_args__ = (
+        db.Index('ix_message_sender_recipient_created_at', 'sender_id', 'recipient_id', 'created_at'),
+        db.Index('ix_message_job_id_created_at', 'job_id', 'created_at'),
+    )
+
+    # Message pages serialize every attachment, so load them for the whole page in one query
+    attachments = db.relationship('StoredFile', backref='message', lazy='selectin', order_by='StoredFile.id')
+
+    @property
+    def files(self):
+        return [f.path for f in self.attachments]
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -169,14 +216,21 @@ class Blog(db.Model):
     email = db.Column(db.String(120), nullable=True)
     url = db.Column(db.String(255), nullable=True)
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Rendered from content when the post is saved (server/services/blog_render.py)
+    content_html = db.Column(db.Text, nullable=True)
+    excerpt = db.Column(db.String(255), nullable=True)
+    word_count = db.Column(db.Integer, default=0, nullable=False)
+    reading_time = db.Column(db.Integer, default=1, nullable=False)  # minutes
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC), index=True)
-    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC), onupdate=lambda: datetime.now(pytz.UTC))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC), onupdate=lambda: datetime.now(pytz.UTC), index=True)
 
-    def to_dict(self):
+    def to_summary_dict(self):
         return {
             'id': self.id,
             'title': self.title,
-            'content': self.content,
+            'excerpt': self.excerpt,
+            'word_count': self.word_count,
+            'reading_time': self.reading_time,
             'image': self.image,
             'email': self.email,
             'url': self.url,
@@ -184,4 +238,202 @@ class Blog(db.Model):
             'author_name': self.author.name,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+    def to_dict(self):
+        return {
+            **self.to_summary_dict(),
+            'content': self.content,
+            'content_html': self.content_html
+        }
+
+class ChangeMarker(db.Model):
+    # When a collection last changed, deletions included ('blog': the blog listing's Last-Modified)
+    __tablename__ = 'change_marker'
+    name = db.Column(db.String(50), primary_key=True)
+    changed_at = db.Column(db.DateTime, nullable=False)
+
+class OutboundEmail(db.Model):
+    __tablename__ = 'outbound_email'
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(255), nullable=True)
+    recipients = db.Column(db.JSON, nullable=False)
+    body = db.Column(db.Text, nullable=True)
+    html = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, sending, sent, dead
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_outbound_email_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'subject': self.subject,
+            'sender': self.sender,
+            'recipients': self.recipients,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class StoredBlob(db.Model):
+    # One row per distinct upload content; the file is kept under UPLOAD_FOLDER/blobs by SHA-256
+    __tablename__ = 'stored_blob'
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)  # stored_file rows and finished chunked uploads
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC))
+
+class StoredFile(db.Model):
+    __tablename__ = 'stored_file'
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(512), nullable=False, index=True)  # under UPLOAD_FOLDER, as used in /api/files URLs
+    filename = db.Column(db.String(255), nullable=False)  # as uploaded
+    content_type = db.Column(db.String(255), nullable=True)
+    size = db.Column(db.BigInteger, nullable=True)
+    sha256 = db.Column(db.String(64), db.ForeignKey('stored_blob.sha256'), nullable=True, index=True)  # None for pre-dedup files
+    kind = db.Column(db.String(20), nullable=False)  # job (brief and client additions), completed, message
+    job_id = db.Column(db.Integer, db.ForeignKey('job.id'), nullable=True, index=True)
+    message_id = db.Column(db.Integer, db.ForeignKey('message.id'), nullable=True, index=True)
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC))
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)  # set by the retention policy; None keeps it
+
+    blob = db.relationship('StoredBlob', lazy=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'path': self.path,
+            'filename': self.filename,
+            'content_type': self.content_type,
+            'size': self.size,
+            'sha256': self.sha256,
+            'kind': self.kind,
+            'job_id': self.job_id,
+            'message_id': self.message_id,
+            'created_at': self.created_at.isoformat(),
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+class ChunkedUpload(db.Model):
+    # A resumable upload: chunks are written into UPLOAD_FOLDER/blobs/partial/<id> until it is
+    # completed, then it holds a blob reference until attached to a job or message by id
+    __tablename__ = 'chunked_upload'
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(255), nullable=True)
+    size = db.Column(db.BigInteger, nullable=False)  # declared at init
+    received = db.Column(db.BigInteger, default=0, nullable=False)  # contiguous bytes written so far
+    sha256 = db.Column(db.String(64), db.ForeignKey('stored_blob.sha256'), nullable=True)  # set once complete
+    status = db.Column(db.String(20), default='uploading', nullable=False)  # uploading, complete
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # pushed back by each chunk
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.received,
+            'sha256': self.sha256,
+            'status': self.status,
+            'expires_at': self.expires_at.isoformat()
+        }
+
+
+class RateLimitBucket(db.Model):
+    # Token bucket for RATE_LIMIT_STORAGE=sql; times are Unix seconds so the refill is plain arithmetic in SQL
+    __tablename__ = 'rate_limit_bucket'
+    key = db.Column(db.String(160), primary_key=True)  # '<budget>:user:<id>' or '<budget>:ip:<address>'
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False)
+    full_at = db.Column(db.Float, nullable=False, index=True)  # after this the row is the same as no row
+
+
+class ScheduledTask(db.Model):
+    # One row per scheduler task, shared by every worker; whoever moves next_run_at on runs the task
+    __tablename__ = 'scheduled_task'
+    name = db.Column(db.String(100), primary_key=True)
+    schedule = db.Column(db.String(100), nullable=False)  # cron expression
+    next_run_at = db.Column(db.DateTime, nullable=False)  # naive UTC, jitter included
+    last_started_at = db.Column(db.DateTime, nullable=True)
+    last_finished_at = db.Column(db.DateTime, nullable=True)
+    last_status = db.Column(db.String(20), nullable=True)  # ok, failed
+    last_runner = db.Column(db.String(255), nullable=True)  # host:pid
+
+
+class ScheduledTaskRun(db.Model):
+    __tablename__ = 'scheduled_task_run'
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(100), nullable=False, index=True)
+    runner = db.Column(db.String(255), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False, index=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration = db.Column(db.Float, nullable=True)  # seconds
+    status = db.Column(db.String(20), nullable=False)  # running, ok, failed
+    detail = db.Column(db.Text, nullable=True)  # the task's report as JSON, or the error
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'task': self.task,
+            'runner': self.runner,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration': self.duration,
+            'status': self.status,
+            'detail': self.detail
+        }
+
+
+class PaymentNotification(db.Model):
+    # Pesapal IPNs, one row per (order, transaction status). A notification waits with payment_status ''
+    # (one such row per order, repeats bump received_count) until a worker moves it to the status it
+    # finds; the unique key is what makes each status take effect on the job once
+    __tablename__ = 'payment_notification'
+    id = db.Column(db.Integer, primary_key=True)
+    order_tracking_id = db.Column(db.String(64), nullable=False)
+    payment_status = db.Column(db.String(50), default='', nullable=False)  # payment_status_description once reconciled
+    merchant_reference = db.Column(db.String(100), nullable=True)
+    notification_type = db.Column(db.String(32), nullable=True)
+    state = db.Column(db.String(20), default='pending', nullable=False)  # pending, processing, done, failed
+    received_count = db.Column(db.Integer, default=1, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    job_id = db.Column(db.Integer, nullable=True)  # no foreign key: a failed upfront payment deletes the job
+    first_received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('order_tracking_id', 'payment_status', name='uq_payment_notification_order_status'),
+        db.Index('ix_payment_notification_state_next_attempt_at', 'state', 'next_attempt_at'),
+    )
+
+
+class PaymentTransaction(db.Model):
+    # Latest GetTransactionStatus answer per Pesapal order, written by the reconciler, the IPN workers
+    # and status polls, so the polling endpoint can answer without asking Pesapal again
+    __tablename__ = 'payment_transaction'
+    order_tracking_id = db.Column(db.String(64), primary_key=True)
+    job_id = db.Column(db.Integer, nullable=True)  # no foreign key: a failed upfront payment deletes the job
+    payment_status = db.Column(db.String(50), nullable=True)  # payment_status_description
+    status_code = db.Column(db.Integer, nullable=True)
+    amount = db.Column(db.Float, nullable=True)
+    currency = db.Column(db.String(10), nullable=True)
+    confirmation_code = db.Column(db.String(100), nullable=True)
+    data = db.Column(db.JSON, nullable=False)  # the whole response
+    checked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
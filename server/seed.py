@@ -1,17 +1,21 @@
 from datetime import datetime, timedelta
-from models import User, Job, Message, ResetToken
+from models import User, Job, Message, ResetToken, StoredFile, ChunkedUpload, PaymentNotification, PaymentTransaction
 from sqlalchemy import inspect
 
 def seed_database(app, db):
     with app.app_context():
         # Check if tables exist before attempting to delete
         inspector = inspect(db.engine)
-        tables_to_check = ['user', 'reset_token', 'job', 'message']
+        tables_to_check = ['user', 'reset_token', 'job', 'message', 'stored_file', 'chunked_upload']
         tables_exist = all(inspector.has_table(table) for table in tables_to_check)
 
         if tables_exist:
             print("Clearing existing data...")
             try:
+                db.session.query(StoredFile).delete()
+                db.session.query(ChunkedUpload).delete()
+                db.session.query(PaymentNotification).delete()
+                db.session.query(PaymentTransaction).delete()
                 db.session.query(Message).delete()
                 db.session.query(Job).delete()
                 db.session.query(ResetToken).delete()
@@ -64,11 +68,10 @@ def seed_database(app, db):
             spacing='double',
             total_amount=150.00,
             status='Pending',
-            files=['sample.pdf'],
-            completed_files=[],
             client_email=client_user.email
         )
         db.session.add(job)
+        db.session.add(StoredFile(path='sample.pdf', filename='sample.pdf', kind='job', job=job))
         db.session.commit()
         print("Test jobs seeded.")
 
@@ -78,10 +81,10 @@ def seed_database(app, db):
             job_id=job.id,
             sender_id=admin_user.id,
             sender_role='admin',
-            content='I have started working on your calculus assignment.',
-            files=['progress.pdf']
+            content='I have started working on your calculus assignment.'
         )
         db.session.add(message)
+        db.session.add(StoredFile(path='progress.pdf', filename='progress.pdf', kind='message', message=message))
         db.session.commit()
         print("Test messages seeded.")
 
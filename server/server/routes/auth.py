@@ -3,12 +3,16 @@ from datetime import datetime, timedelta
 import jwt
 import uuid
 import logging
-import requests
 import os
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
 from flask_mail import Message
-from extensions import db, bcrypt, mail
+from extensions import db, bcrypt
+from server.services.http_client import http_client
+from server.services.rate_limit import rate_limiter
+from server.services.mail_queue import mail_queue
+from server.services.admin_directory import admin_directory
+from server.services.auth_cache import auth_failure
 from models import User, ResetToken
 
 auth_bp = Blueprint('auth', __name__)
@@ -99,13 +103,10 @@ def login():
         if not user or not user.check_password(data['password']):
             return jsonify({"error": "Invalid credentials"}), 401
 
-        admin_emails_str = os.getenv('ADMIN_EMAILS')
-        if not admin_emails_str:
+        if not admin_directory.admin_emails:
             return jsonify({"error": "Server configuration error: ADMIN_EMAILS not set"}), 500
 
-        admin_emails = [email.strip() for email in admin_emails_str.split(',') if email.strip()]
-
-        if user.email in admin_emails:
+        if admin_directory.is_admin_email(user.email):
             user.role = 'admin'
         else:
             user.role = 'client'
@@ -126,6 +127,7 @@ def login():
         return jsonify({"error": "Login failed", "details": str(e)}), 500
 
 @auth_bp.route('/me', methods=['GET', 'OPTIONS'])
+@rate_limiter.limit('session')
 def get_current_user():
     if request.method == 'OPTIONS':
         return '', 200
@@ -134,22 +136,13 @@ def get_current_user():
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
-    try:
-        data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        user = db.session.get(User, data['user_id'])
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-
-        g.current_user = user
-        return jsonify({
-            'user': user.to_dict(),
-            'role': user.role
-        }), 200
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return auth_failure()
+    return jsonify({
+        'user': user.to_dict(),
+        'role': user.role
+    }), 200
 
 @auth_bp.route('/google', methods=['POST', 'OPTIONS'])
 def google_login():
@@ -168,7 +161,7 @@ def google_login():
 
         id_info = id_token.verify_oauth2_token(
             data['credential'],
-            google_requests.Request(),
+            google_requests.Request(session=http_client.session),
             client_id
         )
 
@@ -189,13 +182,10 @@ def google_login():
             db.session.add(user)
             db.session.commit()
 
-        admin_emails_str = os.getenv('ADMIN_EMAILS')
-        if not admin_emails_str:
+        if not admin_directory.admin_emails:
             return jsonify({"error": "Server configuration error: ADMIN_EMAILS not set"}), 500
 
-        admin_emails = [email.strip() for email in admin_emails_str.split(',') if email.strip()]
-
-        if user.email in admin_emails:
+        if admin_directory.is_admin_email(user.email):
             user.role = 'admin'
         else:
             user.role = 'client'
@@ -232,7 +222,7 @@ def apple_login():
     try:
         id_token_str = data['id_token']
         decoded = jwt.decode(id_token_str, options={"verify_signature": False})
-        apple_public_keys = requests.get('https://appleid.apple.com/auth/keys').json()
+        apple_public_keys = http_client.get('https://appleid.apple.com/auth/keys', endpoint='apple.auth_keys').json()
         key = None
         for k in apple_public_keys['keys']:
             if k['kid'] == decoded['kid']:
@@ -263,13 +253,10 @@ def apple_login():
             db.session.add(user)
             db.session.commit()
 
-        admin_emails_str = os.getenv('ADMIN_EMAILS')
-        if not admin_emails_str:
+        if not admin_directory.admin_emails:
             return jsonify({"error": "Server configuration error: ADMIN_EMAILS not set"}), 500
 
-        admin_emails = [email.strip() for email in admin_emails_str.split(',') if email.strip()]
-
-        if user.email in admin_emails:
+        if admin_directory.is_admin_email(user.email):
             user.role = 'admin'
         else:
             user.role = 'client'
@@ -291,6 +278,7 @@ def apple_login():
         return jsonify({"error": "Failed to process Apple login", "details": str(e)}), 500
 
 @auth_bp.route('/logout', methods=['POST', 'OPTIONS'])
+@rate_limiter.limit('session')
 def logout():
     if request.method == 'OPTIONS':
         return '', 200
@@ -303,6 +291,7 @@ def logout():
     return jsonify({"message": "Successfully logged out"}), 200
 
 @auth_bp.route('/refresh', methods=['POST', 'OPTIONS'])
+@rate_limiter.limit('session')
 def refresh():
     if request.method == 'OPTIONS':
         return '', 200
@@ -311,23 +300,15 @@ def refresh():
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
-    try:
-        data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        user = db.session.get(User, data['user_id'])
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-
-        g.current_user = user
-        access_token, _ = generate_tokens(user)
-        logger.info(f"Token refreshed for user ID: {user.id}")
-        return jsonify({'access_token': access_token})
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return auth_failure()
+    access_token, _ = generate_tokens(user)
+    logger.info(f"Token refreshed for user ID: {user.id}")
+    return jsonify({'access_token': access_token})
 
 @auth_bp.route('/forgot-password', methods=['POST', 'OPTIONS'])
+@rate_limiter.limit('auth', cost=3)  # each one sends an email
 def forgot_password():
     if request.method == 'OPTIONS':
         return '', 200
@@ -372,10 +353,10 @@ Apex Study Forge Team
             """
         )
         try:
-            mail.send(msg)
-            logger.info(f"Password reset email sent to: {user.email}")
+            mail_queue.enqueue(msg)
+            logger.info(f"Password reset email queued for: {user.email}")
         except Exception as e:
-            logger.error(f"Failed to send reset email to {user.email}: {str(e)}")
+            logger.error(f"Failed to queue reset email to {user.email}: {str(e)}")
             return jsonify({"error": "Failed to send reset email", "details": str(e)}), 500
 
         return jsonify({"message": "Password reset link sent to your email. Please check your inbox (and spam folder if needed)."}), 200
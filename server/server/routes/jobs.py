@@ -1,14 +1,20 @@
-from flask import Blueprint, request, jsonify, g, current_app
+from flask import Blueprint, request, jsonify, g
 from flask_socketio import emit
 from datetime import datetime, timezone
-import jwt
 import logging
 import os
-from werkzeug.utils import secure_filename
-import requests
-from extensions import db, socketio
-from models import Job, User, Message
+from extensions import db
+from server.services.auth_cache import auth_failure
+from server.services.orders import create_job_order
+from server.services.rate_limit import rate_limiter
+from server.services.chat import job_messages
+from server.services.downloads import signed_urls
+from server.services.realtime import emit_to_job
+from models import Job
 from sqlalchemy import and_, or_
+from sqlalchemy.orm import defer
+import base64
+import json
 
 jobs_bp = Blueprint('jobs', __name__)
 
@@ -16,6 +22,9 @@ logger = logging.getLogger(__name__)
 
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'png', 'jpg', 'jpeg', 'zip'}
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -23,6 +32,7 @@ def sanitize_filename(filename):
     return filename.replace('..', '.')
 
 @jobs_bp.route('', methods=['POST', 'OPTIONS'])
+@rate_limiter.limit('default', cost=5)
 def create_job():
     if request.method == 'OPTIONS':
         return '', 200
@@ -31,143 +41,34 @@ def create_job():
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return auth_failure()
+    if user.role != 'client':
+        logger.error(f"Unauthorized job creation attempt by user ID: {user.id}")
+        return jsonify({"error": "Only clients can create jobs"}), 403
+
     try:
-        if not hasattr(g, 'current_user'):
-            data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            g.current_user = db.session.get(User, data['user_id'])
-            if not g.current_user:
-                return jsonify({'error': 'User not found'}), 404
+        # Job creation and payment initiation run in-process; files are stored once
+        body, status = create_job_order(user, request.form, request.files.getlist('files'), request.form.getlist('upload_ids'))
+        if status != 200:
+            logger.error(f"Payment initiation failed: {body.get('error')}")
+            return jsonify(body), status
 
-        user = g.current_user
-        if user.role != 'client':
-            logger.error(f"Unauthorized job creation attempt by user ID: {user.id}")
-            return jsonify({"error": "Only clients can create jobs"}), 403
+        logger.info(f"Job creation initiated with payment, redirect to: {body['redirect_url']}")
+        return jsonify({
+            'message': 'Job creation initiated, redirect to Pesapal for payment',
+            'job_id': body['job_id'],
+            'redirect_url': body['redirect_url'],
+            'order_tracking_id': body['order_tracking_id']
+        }), 200
 
-        try:
-            data = request.form
-            files = request.files.getlist('files')
-            
-            # Validate required fields
-            required_fields = ['subject', 'title', 'pages', 'deadline', 'instructions', 'totalAmount']
-            for field in required_fields:
-                if field not in data:
-                    return jsonify({"error": f"{field} is required"}), 400
-
-            # Parse and validate deadline
-            deadline_str = data.get('deadline')
-            try:
-                deadline = datetime.fromisoformat(deadline_str.replace('Z', '+00:00'))
-                if not deadline.tzinfo:
-                    deadline = deadline.replace(tzinfo=timezone.utc)
-                
-                current_time = datetime.now(timezone.utc)
-                if deadline < current_time:
-                    return jsonify({
-                        "error": "Deadline must be in the future",
-                        "details": {
-                            "deadline": deadline.isoformat(),
-                            "current_time": current_time.isoformat()
-                        }
-                    }), 400
-            except ValueError as ve:
-                logger.error(f"Invalid deadline format: {str(ve)}")
-                return jsonify({
-                    "error": "Invalid deadline format. Use ISO 8601 format",
-                    "details": str(ve)
-                }), 400
-
-            # Validate numeric fields
-            try:
-                pages = int(data['pages'])
-                total_amount = float(data['totalAmount'])
-                cited_resources = int(data.get('citedResources', 0))
-                if pages <= 0 or total_amount <= 0:
-                    raise ValueError
-            except ValueError:
-                return jsonify({"error": "Pages and totalAmount must be positive numbers"}), 400
-
-            # Calculate rates based on education level
-            education_level = data.get('writerLevel', 'highschool').lower()
-            rates = {
-                'highschool': 6,
-                'college': 9,
-                'bachelors': 12,
-                'masters': 15,
-                'phd': 18
-            }
-            calculated_total = pages * rates.get(education_level, 6)
-            
-            if abs(calculated_total - total_amount) > 0.01:
-                return jsonify({
-                    "error": "Total amount doesn't match calculated amount",
-                    "details": f"Calculated: ${calculated_total}, Provided: ${total_amount}"
-                }), 400
-
-            # Prepare payment data (no job creation here)
-            payment_data = {
-                'pages': pages,
-                'education_level': education_level,
-                'title': data['title'],
-                'subject': data['subject'],
-                'deadline': deadline.isoformat(),
-                'instructions': data['instructions'],
-                'phone_number': data.get('phone_number', ''),
-                'country_code': data.get('country_code', 'KE'),
-                'citedResources': cited_resources,
-                'formattingStyle': data.get('formattingStyle', 'APA'),
-                'writerLevel': data.get('writerLevel', 'PHD'),
-                'spacing': data.get('spacing', 'double'),
-                'totalAmount': total_amount,
-            }
-            
-            # Send files with payment request
-            files_data = [('files', (file.filename, file, file.mimetype)) for file in files if file and allowed_file(file.filename)]
-            
-            # Use the correct URL format for the payment initiation
-            payment_url = f"{request.scheme}://{request.host}/api/payments/initiate-upfront"
-            logger.info(f"Sending payment request to: {payment_url}")
-            
-            payment_response = requests.post(
-                payment_url,
-                data=payment_data,
-                files=files_data,
-                headers={'Authorization': f'Bearer {token}'},
-                timeout=30
-            )
-            
-            if payment_response.status_code != 200:
-                error_msg = payment_response.json().get('error', 'Payment initiation failed')
-                logger.error(f"Payment initiation failed: {error_msg}")
-                return jsonify({'error': 'Payment initiation failed', 'details': error_msg}), 400
-
-            payment_response_data = payment_response.json()
-            logger.info(f"Job creation initiated with payment, redirect to: {payment_response_data['redirect_url']}")
-            
-            return jsonify({
-                'message': 'Job creation initiated, redirect to Pesapal for payment',
-                'job_id': payment_response_data.get('job_id'),
-                'redirect_url': payment_response_data['redirect_url'],
-                'order_tracking_id': payment_response_data.get('order_tracking_id')
-            }), 200
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Network error during payment initiation: {str(e)}")
-            return jsonify({
-                "error": "Network error during payment initiation",
-                "details": str(e)
-            }), 500
-        except Exception as e:
-            logger.error(f"Job creation failed: {str(e)}", exc_info=True)
-            return jsonify({
-                "error": "Failed to create job",
-                "details": str(e)
-            }), 500
-
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+    except Exception as e:
+        logger.error(f"Job creation failed: {str(e)}", exc_info=True)
+        return jsonify({
+            "error": "Failed to create job",
+            "details": str(e)
+        }), 500
 
 @jobs_bp.route('', methods=['GET', 'OPTIONS'])
 def get_jobs():
@@ -178,33 +79,92 @@ def get_jobs():
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return auth_failure()
+    if user.role == 'admin':
+        # Admin sees all jobs except those with Pending payment status
+        query = Job.query.filter(Job.payment_status != 'Pending')
+    else:
+        # Client sees only their jobs that are not Pending payment status
+        query = Job.query.filter(and_(Job.user_id == user.id, Job.payment_status != 'Pending'))
+
+    if any(arg in request.args for arg in ('limit', 'cursor', 'updated_since')):
+        return list_jobs_page(query, user)
+
+    jobs = query.all()
+    logger.info(f"Jobs retrieved for user ID: {user.id}, count: {len(jobs)}")
+    return jsonify([{
+        **job.to_dict(),
+        'client_name': job.client_name,
+        'client_email': job.client_email,
+        'payment_status': job.payment_status
+    } for job in jobs])
+
+def encode_cursor(job):
+    raw = json.dumps([job.updated_at.isoformat(), job.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    updated_at, job_id = json.loads(raw)
+    return datetime.fromisoformat(updated_at), int(job_id)
+
+def parse_timestamp(value):
+    # updated_at is stored as naive UTC
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def list_jobs_page(query, user):
+    # Keyset pagination over (updated_at, id) with a compact projection
     try:
-        if not hasattr(g, 'current_user'):
-            data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            g.current_user = db.session.get(User, data['user_id'])
-            if not g.current_user:
-                return jsonify({'error': 'User not found'}), 404
-
-        user = g.current_user
-        if user.role == 'admin':
-            # Admin sees all jobs except those with Pending payment status
-            jobs = Job.query.filter(Job.payment_status != 'Pending').all()
-        else:
-            # Client sees only their jobs that are not Pending payment status
-            jobs = Job.query.filter(and_(Job.user_id == user.id, Job.payment_status != 'Pending')).all()
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
 
-        logger.info(f"Jobs retrieved for user ID: {user.id}, count: {len(jobs)}")
-        return jsonify([{
-            **job.to_dict(),
-            'client_name': job.client_name,
-            'client_email': job.client_email,
-            'payment_status': job.payment_status
-        } for job in jobs])
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+    order = request.args.get('order', 'asc' if 'updated_since' in request.args else 'desc')
+    if order not in ('asc', 'desc'):
+        return jsonify({"error": "order must be 'asc' or 'desc'"}), 400
+
+    if request.args.get('updated_since'):
+        try:
+            query = query.filter(Job.updated_at > parse_timestamp(request.args['updated_since']))
+        except ValueError:
+            return jsonify({"error": "Invalid updated_since format. Use ISO 8601 format"}), 400
+
+    if request.args.get('cursor'):
+        try:
+            cursor_updated_at, cursor_id = decode_cursor(request.args['cursor'])
+        except (ValueError, TypeError):
+            return jsonify({"error": "Invalid cursor"}), 400
+        if order == 'asc':
+            query = query.filter(or_(
+                Job.updated_at > cursor_updated_at,
+                and_(Job.updated_at == cursor_updated_at, Job.id > cursor_id)
+            ))
+        else:
+            query = query.filter(or_(
+                Job.updated_at < cursor_updated_at,
+                and_(Job.updated_at == cursor_updated_at, Job.id < cursor_id)
+            ))
+
+    if order == 'asc':
+        query = query.order_by(Job.updated_at.asc(), Job.id.asc())
+    else:
+        query = query.order_by(Job.updated_at.desc(), Job.id.desc())
+
+    jobs = query.options(defer(Job.instructions)).limit(limit + 1).all()
+    has_more = len(jobs) > limit
+    jobs = jobs[:limit]
+
+    logger.info(f"Jobs page retrieved for user ID: {user.id}, count: {len(jobs)}, has_more: {has_more}")
+    return jsonify({
+        'jobs': [job.to_summary_dict() for job in jobs],
+        'next_cursor': encode_cursor(jobs[-1]) if jobs else request.args.get('cursor'),
+        'has_more': has_more
+    })
 
 @jobs_bp.route('/<int:job_id>', methods=['GET', 'OPTIONS'])
 def get_job(job_id):
@@ -215,15 +175,10 @@ def get_job(job_id):
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
     try:
-        if not hasattr(g, 'current_user'):
-            data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            g.current_user = db.session.get(User, data['user_id'])
-            if not g.current_user:
-                return jsonify({'error': 'User not found'}), 404
-
-        user = g.current_user
+        user = getattr(g, 'current_user', None)
+        if not user:
+            return auth_failure()
         job = db.session.get(Job, job_id)
         if not job:
             return jsonify({"error": "Job not found"}), 404
@@ -237,21 +192,7 @@ def get_job(job_id):
             logger.error(f"Unauthorized job access attempt by user ID: {user.id} for job ID: {job_id}")
             return jsonify({"error": "Unauthorized"}), 403
 
-        admin = User.query.filter_by(role='admin').first()
-        if not admin:
-            return jsonify({"error": "Admin not found"}), 404
-
-        messages = Message.query.filter(
-            or_(
-                and_(Message.sender_id == job.user_id, Message.recipient_id == admin.id),
-                and_(Message.sender_id == admin.id, Message.recipient_id == job.user_id)
-            )
-        ).filter(
-            or_(
-                and_(user.role == 'admin', ~Message.admin_deleted),
-                and_(user.role == 'client', ~Message.client_deleted)
-            )
-        ).order_by(Message.created_at).all()
+        messages = job_messages(job.id, user.role)
 
         message_files = []
         for message in messages:
@@ -269,14 +210,40 @@ def get_job(job_id):
             'all_files': all_files,
             'payment_status': job.payment_status
         })
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
     except Exception as e:
         logger.error(f"Failed to retrieve job {job_id}: {str(e)}", exc_info=True)
         return jsonify({"error": "Failed to retrieve job", "details": str(e)}), 500
 
+@jobs_bp.route('/<int:job_id>/download-urls', methods=['GET', 'OPTIONS'])
+def get_download_urls(job_id):
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return jsonify({'error': 'Token missing or invalid'}), 401
+
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    if job.payment_status == 'Pending' and user.role != 'admin':
+        return jsonify({"error": "Job payment pending. Please complete payment first."}), 403
+    if user.role != 'admin' and job.user_id != user.id:
+        logger.error(f"Unauthorized download link request by user ID: {user.id} for job ID: {job_id}")
+        return jsonify({"error": "Unauthorized"}), 403
+
+    # Authorize once for every file the job page lists; each link is then checked by signature alone
+    paths = (job.files or []) + (job.completed_files or [])
+    for message in job_messages(job.id, user.role):
+        paths.extend(message.files or [])
+    paths = dict.fromkeys(os.path.normpath(path).replace('\\', '/') for path in paths)
+    urls, expires_at = signed_urls(paths)
+
+    return jsonify({
+        'urls': urls,
+        'expires_at': datetime.fromtimestamp(expires_at, timezone.utc).isoformat()
+    }), 200
+
 @jobs_bp.route('/<int:job_id>', methods=['PUT', 'OPTIONS'])
 def update_job(job_id):
     if request.method == 'OPTIONS':
@@ -286,37 +253,27 @@ def update_job(job_id):
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
-    try:
-        if not hasattr(g, 'current_user'):
-            data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            g.current_user = db.session.get(User, data['user_id'])
-            if not g.current_user:
-                return jsonify({'error': 'User not found'}), 404
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return auth_failure()
+    if user.role != 'admin':
+        logger.error(f"Unauthorized job update attempt by user ID: {user.id}")
+        return jsonify({"error": "Only admins can update jobs"}), 403
 
-        user = g.current_user
-        if user.role != 'admin':
-            logger.error(f"Unauthorized job update attempt by user ID: {user.id}")
-            return jsonify({"error": "Only admins can update jobs"}), 403
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
 
-        job = db.session.get(Job, job_id)
-        if not job:
-            return jsonify({"error": "Job not found"}), 404
+    data = request.get_json()
+    if 'status' in data:
+        job.status = data['status']
+        if data['status'] == 'Completed':
+            job.completed = True
+        db.session.commit()
+        emit_to_job('job_updated', job.to_dict(), job, '/jobs')
+        logger.info(f"Job updated: {job_id}, new status: {job.status}")
 
-        data = request.get_json()
-        if 'status' in data:
-            job.status = data['status']
-            if data['status'] == 'Completed':
-                job.completed = True
-            db.session.commit()
-            socketio.emit('job_updated', job.to_dict(), namespace='/jobs')
-            logger.info(f"Job updated: {job_id}, new status: {job.status}")
-
-        return jsonify(job.to_dict())
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+    return jsonify(job.to_dict())
 
 @jobs_bp.route('/payment-status/<int:job_id>', methods=['GET', 'OPTIONS'])
 def check_job_payment_status(job_id):
@@ -327,15 +284,10 @@ def check_job_payment_status(job_id):
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    token = token.split(' ')[1]
     try:
-        if not hasattr(g, 'current_user'):
-            data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            g.current_user = db.session.get(User, data['user_id'])
-            if not g.current_user:
-                return jsonify({'error': 'User not found'}), 404
-
-        user = g.current_user
+        user = getattr(g, 'current_user', None)
+        if not user:
+            return auth_failure()
         job = db.session.get(Job, job_id)
         if not job:
             return jsonify({"error": "Job not found"}), 404
@@ -351,10 +303,6 @@ def check_job_payment_status(job_id):
             'completion_tracking_id': job.completion_tracking_id
         }), 200
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
     except Exception as e:
         logger.error(f"Failed to check payment status for job {job_id}: {str(e)}")
         return jsonify({"error": "Failed to check payment status", "details": str(e)}), 500
\ No newline at end of file
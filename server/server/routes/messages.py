@@ -1,11 +1,13 @@
 from flask import Blueprint, request, jsonify, g, current_app
 from flask_socketio import emit
 from datetime import datetime
-import jwt
 import logging
-import os
-from werkzeug.utils import secure_filename
-from extensions import db, socketio
+from extensions import db
+from server.services.chat import list_conversation_page, list_job_messages_page, job_messages, sync_conversation, sync_job_thread, conversation_filter
+from server.services.admin_directory import admin_directory
+from server.services.auth_cache import auth_failure
+from server.services.realtime import emit_to_client, emit_to_job
+from server.services.uploads import upload_store
 from models import Job, User, Message
 from sqlalchemy import and_, or_
 
@@ -32,103 +34,85 @@ def send_job_message(job_id):
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
-    try:
-        token = token.split(' ')[1]
-        data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        g.current_user = db.session.get(User, data['user_id'])
-        if not g.current_user:
-            return jsonify({'error': 'User not found'}), 404
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return auth_failure()
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
 
-        user = g.current_user
-        job = db.session.get(Job, job_id)
-        if not job:
-            return jsonify({"error": "Job not found"}), 404
+    if user.role != 'admin' and job.user_id != user.id:
+        logger.error(f"Unauthorized message attempt by user ID: {user.id} for job ID: {job_id}")
+        return jsonify({"error": "Unauthorized"}), 403
 
-        if user.role != 'admin' and job.user_id != user.id:
-            logger.error(f"Unauthorized message attempt by user ID: {user.id} for job ID: {job_id}")
-            return jsonify({"error": "Unauthorized"}), 403
-
-        try:
-            data = request.form
-            content = data.get('content', '')
-            completed_files = request.files.getlist('completed_files') if user.role == 'admin' else []
-            additional_files = request.files.getlist('files') if user.role == 'client' else []
-
-            if not content and not completed_files and not additional_files:
-                return jsonify({"error": "Message content or files required"}), 400
-
-            job_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], f"job_{job_id}")
-            os.makedirs(job_folder, exist_ok=True)
-
-            completed_file_paths = []
-            for file in completed_files:
-                if file and file.filename:
-                    if not allowed_file(file.filename):
-                        return jsonify({"error": f"File type not allowed for {file.filename}"}), 400
-                    filename = secure_filename(file.filename)
-                    filename = f"completed-{datetime.now().timestamp()}-{filename}"
-                    file_path = os.path.join(job_folder, filename)
-                    file.save(file_path)
-                    completed_file_paths.append(os.path.join(f"job_{job_id}", filename))
-
-            additional_file_paths = []
-            for file in additional_files:
-                if file and file.filename:
-                    if not allowed_file(file.filename):
-                        return jsonify({"error": f"File type not allowed for {file.filename}"}), 400
-                    filename = secure_filename(file.filename)
-                    filename = f"additional-{datetime.now().timestamp()}-{filename}"
-                    file_path = os.path.join(job_folder, filename)
-                    file.save(file_path)
-                    additional_file_paths.append(os.path.join(f"job_{job_id}", filename))
-
-            recipient_id = job.user_id if user.role == 'admin' else User.query.filter_by(role='admin').first().id
-            if not recipient_id:
-                return jsonify({"error": "Recipient not found"}), 404
-
-            message = Message(
-                job_id=None,  # Treat as general message
-                sender_id=user.id,
-                recipient_id=recipient_id,
-                sender_role=user.role,
-                content=content if content else None,
-                files=completed_file_paths + additional_file_paths
-            )
-
-            db.session.add(message)
-
-            if user.role == 'admin' and completed_file_paths:
-                if not job.completed_files:
-                    job.completed_files = []
-                job.completed_files.extend(completed_file_paths)
-                job.status = 'Completed'
-                job.completed = True
-            elif user.role == 'client' and additional_file_paths:
-                if not job.files:
-                    job.files = []
-                job.files.extend(additional_file_paths)
+    try:
+        data = request.form
+        content = data.get('content', '')
+        completed_files = request.files.getlist('completed_files') if user.role == 'admin' else []
+        additional_files = request.files.getlist('files') if user.role == 'client' else []
+        # Large files sent beforehand through /api/uploads, by id
+        uploads = upload_store.completed_uploads(user, data.getlist('upload_ids'))
+        if uploads is None:
+            return jsonify({"error": "Upload not found or not complete"}), 400
+        completed_uploads = uploads if user.role == 'admin' else []
+        additional_uploads = uploads if user.role == 'client' else []
+
+        if not (content or completed_files or additional_files or completed_uploads or additional_uploads):
+            return jsonify({"error": "Message content or files required"}), 400
+
+        completed_files = [file for file in completed_files if file and file.filename]
+        additional_files = [file for file in additional_files if file and file.filename]
+        for file in completed_files + additional_files:
+            if not allowed_file(file.filename):
+                return jsonify({"error": f"File type not allowed for {file.filename}"}), 400
 
-            db.session.commit()
+        if user.role == 'admin':
+            recipient_id = job.user_id
+        else:
+            admin = admin_directory.admin_for_client(user.id)
+            recipient_id = admin.id if admin else None
+        if not recipient_id:
+            return jsonify({"error": "Recipient not found"}), 404
+
+        message = Message(
+            job_id=job_id,
+            sender_id=user.id,
+            recipient_id=recipient_id,
+            sender_role=user.role,
+            content=content if content else None
+        )
+
+        db.session.add(message)
+        # Stored once per distinct content and linked into the job's folder
+        for file in completed_files:
+            upload_store.store(file, f"job_{job_id}", 'completed', 'completed', job=job, message=message, user=user)
+        for file in additional_files:
+            upload_store.store(file, f"job_{job_id}", 'additional', 'job', job=job, message=message, user=user)
+        for upload in completed_uploads:
+            upload_store.attach(upload, f"job_{job_id}", 'completed', 'completed', job=job, message=message, user=user)
+        for upload in additional_uploads:
+            upload_store.attach(upload, f"job_{job_id}", 'additional', 'job', job=job, message=message, user=user)
+
+        if user.role == 'admin' and (completed_files or completed_uploads):
+            job.status = 'Completed'
+            job.completed = True
 
-            socketio.emit('new_general_message', {
-                **message.to_dict(),
-                'client_id': job.user_id,
-                'sender_role': user.role
-            }, namespace='/messages')
+        db.session.commit()
 
-            socketio.emit('job_updated', job.to_dict(), namespace='/jobs')
+        emit_to_job('new_general_message', {
+            **message.to_dict(),
+            'client_id': job.user_id,
+            'sender_role': user.role
+        }, job, '/messages')
 
-            return jsonify(message.to_dict()), 201
+        emit_to_job('job_updated', job.to_dict(), job, '/jobs')
 
-        except Exception as e:
-            logger.error(f"Job message sending failed: {str(e)}", exc_info=True)
-            db.session.rollback()
-            return jsonify({"error": "Failed to send message", "details": str(e)}), 500
+        return jsonify(message.to_dict()), 201
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+    except Exception as e:
+        logger.error(f"Job message sending failed: {str(e)}", exc_info=True)
+        db.session.rollback()
+        return jsonify({"error": "Failed to send message", "details": str(e)}), 500
 
 @messages_bp.route('/api/jobs/<int:job_id>/messages', methods=['GET', 'OPTIONS'])
 def get_job_messages(job_id):
@@ -145,13 +129,9 @@ def get_job_messages(job_id):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
     try:
-        token = token.split(' ')[1]
-        data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        g.current_user = db.session.get(User, data['user_id'])
-        if not g.current_user:
-            return jsonify({'error': 'User not found'}), 404
-
-        user = g.current_user
+        user = getattr(g, 'current_user', None)
+        if not user:
+            return auth_failure()
         job = db.session.get(Job, job_id)
         if not job:
             return jsonify({"error": "Job not found"}), 404
@@ -160,32 +140,49 @@ def get_job_messages(job_id):
             logger.error(f"Unauthorized message access attempt by user ID: {user.id} for job ID: {job_id}")
             return jsonify({"error": "Unauthorized"}), 403
 
-        admin = User.query.filter_by(role='admin').first()
-        if not admin:
-            return jsonify({"error": "Admin not found"}), 404
+        if any(arg in request.args for arg in ('limit', 'before_id', 'after_id')):
+            return list_job_messages_page(job.id, user.role)
 
-        messages = Message.query.filter(
-            or_(
-                and_(Message.sender_id == job.user_id, Message.recipient_id == admin.id),
-                and_(Message.sender_id == admin.id, Message.recipient_id == job.user_id)
-            ),
-            or_(
-                and_(user.role == 'admin', ~Message.admin_deleted),
-                and_(user.role == 'client', ~Message.client_deleted)
-            )
-        ).order_by(Message.created_at).all()
+        messages = job_messages(job.id, user.role)
 
         logger.info(f"Messages retrieved for job ID: {job_id}, count: {len(messages)}")
         return jsonify([msg.to_dict() for msg in messages])
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
     except Exception as e:
         logger.error(f"Failed to retrieve messages for job ID: {job_id}: {str(e)}", exc_info=True)
         return jsonify({"error": "Failed to retrieve messages", "details": str(e)}), 500
 
+@messages_bp.route('/api/jobs/<int:job_id>/messages/sync', methods=['GET', 'OPTIONS'])
+def sync_job_messages(job_id):
+    if request.method == 'OPTIONS':
+        response = jsonify({})
+        response.headers.add('Access-Control-Allow-Origin', current_app.config.get('FRONTEND_URL', 'http://localhost:5173'))
+        response.headers.add('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        response.headers.add('Access-Control-Allow-Headers', 'Authorization, Content-Type')
+        response.headers.add('Access-Control-Allow-Credentials', 'true')
+        return response, 200
+
+    token = request.headers.get('Authorization')
+    if not token or not token.startswith('Bearer '):
+        return jsonify({'error': 'Token missing or invalid'}), 401
+
+    try:
+        user = getattr(g, 'current_user', None)
+        if not user:
+            return auth_failure()
+        job = db.session.get(Job, job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+
+        if user.role != 'admin' and job.user_id != user.id:
+            logger.error(f"Unauthorized message sync attempt by user ID: {user.id} for job ID: {job_id}")
+            return jsonify({"error": "Unauthorized"}), 403
+
+        return sync_job_thread(job.id, user.role)
+    except Exception as e:
+        logger.error(f"Failed to sync messages for job ID: {job_id}: {str(e)}", exc_info=True)
+        return jsonify({"error": "Failed to sync messages", "details": str(e)}), 500
+
 @messages_bp.route('/api/messages', methods=['POST', 'OPTIONS'])
 def send_message():
     if request.method == 'OPTIONS':
@@ -200,67 +197,55 @@ def send_message():
     if not token or not token.startswith('Bearer '):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return auth_failure()
     try:
-        token = token.split(' ')[1]
-        data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        g.current_user = db.session.get(User, data['user_id'])
-        if not g.current_user:
-            return jsonify({'error': 'User not found'}), 404
-
-        user = g.current_user
-        try:
-            data = request.form
-            content = data.get('content', '')
-            files = request.files.getlist('files')
-
-            if not content and not files:
-                return jsonify({"error": "Message content or files required"}), 400
-
-            recipient = User.query.filter_by(role='admin').first() if user.role != 'admin' else User.query.get(data.get('recipient_id'))
-            if not recipient:
-                return jsonify({"error": "Recipient not found"}), 404
-
-            file_paths = []
-            if files:
-                temp_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'temp')
-                os.makedirs(temp_folder, exist_ok=True)
-                for file in files:
-                    if file and file.filename:
-                        if not allowed_file(file.filename):
-                            return jsonify({"error": f"File type not allowed for {file.filename}"}), 400
-                        filename = secure_filename(file.filename)
-                        filename = f"msg-{datetime.now().timestamp()}-{filename}"
-                        file_path = os.path.join(temp_folder, filename)
-                        file.save(file_path)
-                        file_paths.append(os.path.join('temp', filename))
-
-            message = Message(
-                sender_id=user.id,
-                recipient_id=recipient.id,
-                sender_role=user.role,
-                content=content if content else None,
-                files=file_paths
-            )
-
-            db.session.add(message)
-            db.session.commit()
-
-            socketio.emit('new_general_message', {
-                **message.to_dict(),
-                'client_id': user.id if user.role != 'admin' else recipient.id
-            }, namespace='/messages')
+        data = request.form
+        content = data.get('content', '')
+        files = request.files.getlist('files')
+        uploads = upload_store.completed_uploads(user, data.getlist('upload_ids'))
+        if uploads is None:
+            return jsonify({"error": "Upload not found or not complete"}), 400
+
+        if not content and not files and not uploads:
+            return jsonify({"error": "Message content or files required"}), 400
+
+        recipient = admin_directory.admin_for_client(user.id) if user.role != 'admin' else User.query.get(data.get('recipient_id'))
+        if not recipient:
+            return jsonify({"error": "Recipient not found"}), 404
+
+        files = [file for file in files if file and file.filename]
+        for file in files:
+            if not allowed_file(file.filename):
+                return jsonify({"error": f"File type not allowed for {file.filename}"}), 400
+
+        message = Message(
+            sender_id=user.id,
+            recipient_id=recipient.id,
+            sender_role=user.role,
+            content=content if content else None
+        )
+
+        db.session.add(message)
+        for file in files:
+            upload_store.store(file, 'temp', 'msg', 'message', message=message, user=user)
+        for upload in uploads:
+            upload_store.attach(upload, 'temp', 'msg', 'message', message=message, user=user)
+        db.session.commit()
 
-            return jsonify(message.to_dict()), 201
+        client_id = user.id if user.role != 'admin' else recipient.id
+        emit_to_client('new_general_message', {
+            **message.to_dict(),
+            'client_id': client_id
+        }, client_id, '/messages')
 
-        except Exception as e:
-            logger.error(f"General message sending failed: {str(e)}", exc_info=True)
-            db.session.rollback()
-            return jsonify({"error": "Failed to send message", "details": str(e)}), 500
+        return jsonify(message.to_dict()), 201
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+    except Exception as e:
+        logger.error(f"General message sending failed: {str(e)}", exc_info=True)
+        db.session.rollback()
+        return jsonify({"error": "Failed to send message", "details": str(e)}), 500
 
 @messages_bp.route('/api/messages/<int:message_id>', methods=['PUT', 'OPTIONS'])
 def edit_message(message_id):
@@ -277,13 +262,9 @@ def edit_message(message_id):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
     try:
-        token = token.split(' ')[1]
-        data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        g.current_user = db.session.get(User, data['user_id'])
-        if not g.current_user:
-            return jsonify({'error': 'User not found'}), 404
-
-        user = g.current_user
+        user = getattr(g, 'current_user', None)
+        if not user:
+            return auth_failure()
         message = db.session.get(Message, message_id)
         if not message:
             return jsonify({"error": "Message not found"}), 404
@@ -301,18 +282,15 @@ def edit_message(message_id):
         message.updated_at = datetime.utcnow()
         db.session.commit()
 
-        socketio.emit('message_updated', {
+        client_id = message.recipient_id if user.role == 'admin' else message.sender_id
+        emit_to_client('message_updated', {
             **message.to_dict(),
-            'client_id': message.recipient_id if user.role == 'admin' else message.sender_id
-        }, namespace='/messages')
+            'client_id': client_id
+        }, client_id, '/messages')
 
         logger.info(f"Message edited by user ID: {user.id}, message ID: {message_id}")
         return jsonify(message.to_dict()), 200
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
     except Exception as e:
         logger.error(f"Message editing failed: {str(e)}", exc_info=True)
         db.session.rollback()
@@ -333,11 +311,9 @@ def delete_message(message_id):
         return jsonify({'error': 'Token missing or invalid'}), 401
 
     try:
-        token = token.split(' ')[1]
-        data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        user = db.session.get(User, data['user_id'])
+        user = getattr(g, 'current_user', None)
         if not user:
-            return jsonify({'error': 'User not found'}), 404
+            return auth_failure()
 
         message = db.session.get(Message, message_id)
         if not message:
@@ -360,18 +336,15 @@ def delete_message(message_id):
 
         db.session.commit()
 
-        socketio.emit('message_deleted', {
+        client_id = message.recipient_id if user.role == 'admin' else message.sender_id
+        emit_to_client('message_deleted', {
             'message_id': message_id,
-            'client_id': message.recipient_id if user.role == 'admin' else message.sender_id
-        }, namespace='/messages')
+            'client_id': client_id
+        }, client_id, '/messages')
 
         logger.info(f"Message marked as deleted by user ID: {user.id}, message ID: {message_id}")
         return jsonify({"message": "Message deleted successfully"}), 200
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
     except Exception as e:
         logger.error(f"Message deletion failed: {str(e)}", exc_info=True)
         db.session.rollback()
@@ -392,22 +365,18 @@ def get_general_messages():
         return jsonify({'error': 'Token missing or invalid'}), 401
 
     try:
-        token = token.split(' ')[1]
-        data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        g.current_user = db.session.get(User, data['user_id'])
-        if not g.current_user:
-            return jsonify({'error': 'User not found'}), 404
-
-        user = g.current_user
-        admin = User.query.filter_by(role='admin').first()
-        if not admin:
+        user = getattr(g, 'current_user', None)
+        if not user:
+            return auth_failure()
+        admin_ids = admin_directory.admin_ids()
+        if not admin_ids:
             return jsonify({"error": "Admin not found"}), 404
 
+        if any(arg in request.args for arg in ('limit', 'before_id', 'after_id')):
+            return list_conversation_page(user.id, admin_ids, user.role)
+
         messages = Message.query.filter(
-            or_(
-                and_(Message.sender_id == user.id, Message.recipient_id == admin.id),
-                and_(Message.sender_id == admin.id, Message.recipient_id == user.id)
-            ),
+            conversation_filter(user.id, admin_ids),
             or_(
                 and_(user.role == 'admin', ~Message.admin_deleted),
                 and_(user.role == 'client', ~Message.client_deleted)
@@ -417,14 +386,37 @@ def get_general_messages():
         logger.info(f"General messages retrieved for user ID: {user.id}, count: {len(messages)}")
         return jsonify([msg.to_dict() for msg in messages])
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
     except Exception as e:
         logger.error(f"Failed to retrieve general messages: {str(e)}", exc_info=True)
         return jsonify({"error": "Failed to retrieve messages", "details": str(e)}), 500
 
+@messages_bp.route('/api/messages/sync', methods=['GET', 'OPTIONS'])
+def sync_messages():
+    if request.method == 'OPTIONS':
+        response = jsonify({})
+        response.headers.add('Access-Control-Allow-Origin', current_app.config.get('FRONTEND_URL', 'http://localhost:5173'))
+        response.headers.add('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        response.headers.add('Access-Control-Allow-Headers', 'Authorization, Content-Type')
+        response.headers.add('Access-Control-Allow-Credentials', 'true')
+        return response, 200
+
+    token = request.headers.get('Authorization')
+    if not token or not token.startswith('Bearer '):
+        return jsonify({'error': 'Token missing or invalid'}), 401
+
+    try:
+        user = getattr(g, 'current_user', None)
+        if not user:
+            return auth_failure()
+        admin_ids = admin_directory.admin_ids()
+        if not admin_ids:
+            return jsonify({"error": "Admin not found"}), 404
+
+        return sync_conversation(user.id, admin_ids, user.role)
+    except Exception as e:
+        logger.error(f"Failed to sync messages: {str(e)}", exc_info=True)
+        return jsonify({"error": "Failed to sync messages", "details": str(e)}), 500
+
 @messages_bp.route('/api/messages/clear', methods=['POST', 'OPTIONS'])
 def clear_chat_history():
     if request.method == 'OPTIONS':
@@ -440,23 +432,16 @@ def clear_chat_history():
         return jsonify({'error': 'Token missing or invalid'}), 401
 
     try:
-        token = token.split(' ')[1]
-        data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        user = db.session.get(User, data['user_id'])
+        user = getattr(g, 'current_user', None)
         if not user:
-            return jsonify({'error': 'User not found'}), 404
+            return auth_failure()
 
-        admin = User.query.filter_by(role='admin').first()
-        if not admin:
+        admin_ids = admin_directory.admin_ids()
+        if not admin_ids:
             return jsonify({"error": "Admin not found"}), 404
 
-        # Fetch messages between the user and admin
-        messages = Message.query.filter(
-            or_(
-                and_(Message.sender_id == user.id, Message.recipient_id == admin.id),
-                and_(Message.sender_id == admin.id, Message.recipient_id == user.id)
-            )
-        ).all()
+        # Fetch messages between the user and the admins
+        messages = Message.query.filter(conversation_filter(user.id, admin_ids)).all()
 
         # Mark messages as deleted for the requesting user
         for message in messages:
@@ -472,18 +457,14 @@ def clear_chat_history():
         db.session.commit()
 
         # Emit a single event to notify the frontend of cleared history
-        socketio.emit('message_deleted', {
+        emit_to_client('message_deleted', {
             'message_id': None,  # Indicate full history clear
             'client_id': user.id
-        }, namespace='/messages')
+        }, user.id, '/messages')
 
         logger.info(f"Chat history cleared for user ID: {user.id}")
         return jsonify({"message": "Chat history cleared successfully"}), 200
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
     except Exception as e:
         logger.error(f"Chat history clearing failed: {str(e)}", exc_info=True)
         db.session.rollback()
@@ -1,95 +1,24 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, g, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from extensions import db, mail
+from extensions import db
 from models import Job, User, IPNRegistration
-from flask_mail import Message
 import requests
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime
 import logging
 import time
-import os
-from werkzeug.utils import secure_filename
+from server.services.pesapal import get_pesapal_token, pesapal_url
+from server.services.http_client import http_client
+from server.services.notifications import send_payment_email
+from server.services.ipn import ipn_pipeline
+from server.services.orders import create_job_order
+from server.services.payments import find_job, payment_status_cache, status_summary
+from server.services.rate_limit import rate_limiter
 
 payments_bp = Blueprint('payments', __name__)
 
 logger = logging.getLogger(__name__)
 
-PESAPAL_URLS = {
-    'sandbox': {
-        'auth': 'https://cybqa.pesapal.com/pesapalv3/api/Auth/RequestToken',
-        'register_ipn': 'https://cybqa.pesapal.com/pesapalv3/api/URLSetup/RegisterIPN',
-        'submit_order': 'https://cybqa.pesapal.com/pesapalv3/api/Transactions/SubmitOrderRequest',
-        'get_transaction_status': 'https://cybqa.pesapal.com/pesapalv3/api/Transactions/GetTransactionStatus'
-    },
-    'live': {
-        'auth': 'https://pay.pesapal.com/v3/api/Auth/RequestToken',
-        'register_ipn': 'https://pay.pesapal.com/v3/api/URLSetup/RegisterIPN',
-        'submit_order': 'https://pay.pesapal.com/v3/api/Transactions/SubmitOrderRequest',
-        'get_transaction_status': 'https://pay.pesapal.com/v3/api/Transactions/GetTransactionStatus'
-    }
-}
-
-ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'png', 'jpg', 'jpeg', 'zip'}
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def get_pesapal_token():
-    consumer_key = current_app.config.get('PESAPAL_CONSUMER_KEY', 'not_set')
-    consumer_secret = current_app.config.get('PESAPAL_CONSUMER_SECRET', 'not_set')
-    logger.info(f"Attempting authentication with consumer_key: {consumer_key[:5]}...")
-    headers = {
-        'Accept': 'application/json',
-        'Content-Type': 'application/json'
-    }
-    payload = {
-        'consumer_key': consumer_key,
-        'consumer_secret': consumer_secret
-    }
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(
-                PESAPAL_URLS[current_app.config['PESAPAL_ENVIRONMENT']]['auth'],
-                json=payload,
-                headers=headers,
-                timeout=10
-            )
-            logger.info(f"Auth response status: {response.status_code}")
-            response.raise_for_status()
-            data = response.json()
-            logger.debug(f"Authentication response: {data}")
-            if 'token' in data:
-                return data['token']
-            else:
-                logger.error(f"No token in response: {data}")
-                return None
-        except requests.RequestException as e:
-            logger.error(f"Auth attempt {attempt + 1}/{max_retries} failed: {str(e)} - Response: {getattr(e.response, 'text', 'No response')}")
-            if attempt < max_retries - 1:
-                time.sleep(2)
-            else:
-                return None
-
-def send_payment_email(to_email, admin_email, job, payment_type, status, amount, order_tracking_id=None):
-    subject = f"Payment {status} for Job #{job.id if job else 'N/A'}"
-    body = f"""
-    Job ID: {job.id if job else 'N/A'}
-    Title: {job.title if job else 'Untitled'}
-    Payment Type: {payment_type}
-    Amount: {amount} USD
-    Status: {status}
-    Order Tracking ID: {order_tracking_id or 'N/A'}
-    Date: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}
-    """
-    msg = Message(subject, recipients=[to_email, admin_email], body=body)
-    try:
-        mail.send(msg)
-        logger.info(f"Payment email sent to {to_email} and {admin_email}")
-    except Exception as e:
-        logger.error(f"Failed to send payment email: {str(e)}")
-
 @payments_bp.route('/register-ipn', methods=['POST'])
 @jwt_required()
 def register_ipn():
@@ -120,11 +49,11 @@ def register_ipn():
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = requests.post(
-                PESAPAL_URLS[current_app.config['PESAPAL_ENVIRONMENT']]['register_ipn'],
+            response = http_client.post(
+                pesapal_url('register_ipn'),
                 json=payload,
                 headers=headers,
-                timeout=10
+                endpoint='pesapal.register_ipn'
             )
             logger.info(f"IPN registration response status: {response.status_code}, text: {response.text}")
             response.raise_for_status()
@@ -164,10 +93,11 @@ def register_ipn():
             return jsonify({'error': 'Failed to register IPN', 'details': str(e)}), 500
 
 @payments_bp.route('/initiate-upfront', methods=['POST'])
+@rate_limiter.limit('payments', cost=5)
 @jwt_required()
 def initiate_upfront():
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = getattr(g, 'current_user', None)
     if not user:
         logger.error(f"User not found for payment initiation: ID={user_id}")
         return jsonify({'error': 'User not found'}), 404
@@ -177,10 +107,11 @@ def initiate_upfront():
     return handle_new_job_payment(data, user)
 
 @payments_bp.route('/initiate-completion', methods=['POST'])
+@rate_limiter.limit('payments', cost=5)
 @jwt_required()
 def initiate_completion():
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = getattr(g, 'current_user', None)
     if not user:
         logger.error(f"User not found for payment initiation: ID={user_id}")
         return jsonify({'error': 'User not found'}), 404
@@ -192,184 +123,8 @@ def initiate_completion():
     return handle_completion_payment(data['job_id'], user, data)
 
 def handle_new_job_payment(data, user):
-    required_fields = ['pages', 'title', 'subject', 'instructions', 'deadline', 'totalAmount']
-    for field in required_fields:
-        if field not in data:
-            logger.error(f"Missing required field in payment initiation: {field}")
-            return jsonify({'error': f'{field} is required'}), 400
-
-    try:
-        pages = int(data['pages'])
-        education_level = data.get('education_level', data.get('writerLevel', 'highschool')).lower()
-        total_amount = float(data['totalAmount'])
-        rates = {"highschool": 6, "college": 9, "bachelors": 12, "masters": 15, "phd": 18}
-        calculated_total = pages * rates.get(education_level, 6)
-        if abs(calculated_total - total_amount) > 0.01:
-            logger.error(f"Total amount mismatch: calculated={calculated_total}, provided={total_amount}")
-            return jsonify({'error': 'Total amount mismatch'}), 400
-        initial_amount = total_amount * 0.05
-    except ValueError:
-        logger.error("Invalid pages or totalAmount value")
-        return jsonify({'error': 'Pages and totalAmount must be valid numbers'}), 400
-
-    try:
-        deadline = datetime.fromisoformat(data['deadline'].replace('Z', '+00:00'))
-        if not deadline.tzinfo:
-            deadline = deadline.replace(tzinfo=timezone.utc)
-        
-        # Create job with Pending Payment status - DO NOT COMMIT YET
-        job = Job(
-            user_id=user.id,
-            client_name=user.name,
-            client_email=user.email,
-            subject=data['subject'],
-            title=data['title'],
-            pages=pages,
-            deadline=deadline,
-            instructions=data['instructions'],
-            cited_resources=int(data.get('citedResources', 0)),
-            formatting_style=data.get('formattingStyle', 'APA'),
-            writer_level=data.get('writerLevel', 'PHD'),
-            spacing=data.get('spacing', 'double'),
-            total_amount=total_amount,
-            status='Pending Payment',
-            payment_status='Pending'
-        )
-        
-        db.session.add(job)
-        db.session.flush()  # Get the ID but don't commit
-        
-        # Save files temporarily but don't link to job yet
-        file_paths = []
-        if 'files' in request.files:
-            files = request.files.getlist('files')
-            job_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], f"job_{job.id}")
-            os.makedirs(job_folder, exist_ok=True)
-            for file in files:
-                if file and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    filename = f"initial-{datetime.now().timestamp()}-{filename}"
-                    file_path = os.path.join(job_folder, filename)
-                    file.save(file_path)
-                    file_paths.append(os.path.join(f"job_{job.id}", filename))
-
-        token = get_pesapal_token()
-        if not token:
-            logger.error("Failed to authenticate with Pesapal")
-            db.session.rollback()
-            # Clean up uploaded files
-            for file_path in file_paths:
-                try:
-                    os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], file_path))
-                except:
-                    pass
-            return jsonify({'error': 'Failed to authenticate with Pesapal'}), 500
-
-        ipn_registration = IPNRegistration.query.filter_by(ipn_status='Active').first()
-        if not ipn_registration:
-            logger.error("No active IPN registration found")
-            db.session.rollback()
-            # Clean up uploaded files
-            for file_path in file_paths:
-                try:
-                    os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], file_path))
-                except:
-                    pass
-            return jsonify({'error': 'IPN not registered. Contact admin.'}), 500
-
-        headers = {
-            'Accept': 'application/json',
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {token}'
-        }
-        
-        merchant_reference = f"JOB-{job.id}-{int(datetime.utcnow().timestamp())}"
-        
-        payload = {
-            'id': merchant_reference,
-            'currency': 'USD',
-            'amount': initial_amount,
-            'description': f"25% payment for job: {data['title']}",
-            'callback_url': f"{current_app.config['FRONTEND_URL']}/payment-callback?job_id={job.id}",
-            'notification_id': ipn_registration.ipn_id,
-            'billing_address': {
-                'email_address': user.email,
-                'phone_number': data.get('phone_number', ''),
-                'country_code': data.get('country_code', 'KE'),
-                'first_name': user.name.split()[0] if user.name else '',
-                'last_name': user.name.split()[-1] if user.name else ''
-            }
-        }
-        
-        logger.info(f"Submitting Pesapal payload: {payload}")
-        response = requests.post(
-            PESAPAL_URLS[current_app.config['PESAPAL_ENVIRONMENT']]['submit_order'],
-            json=payload,
-            headers=headers,
-            timeout=10
-        )
-        logger.info(f"Pesapal response status: {response.status_code}, text: {response.text}")
-        response.raise_for_status()
-        payment_data = response.json()
-        
-        if payment_data.get('error'):
-            error_msg = payment_data['error'].get('message', 'Payment initiation failed')
-            logger.error(f"Pesapal error: {error_msg}")
-            db.session.rollback()
-            # Clean up uploaded files
-            for file_path in file_paths:
-                try:
-                    os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], file_path))
-                except:
-                    pass
-            return jsonify({'error': error_msg}), 400
-        
-        if 'redirect_url' not in payment_data:
-            logger.error(f"Invalid response from Pesapal: {payment_data}")
-            db.session.rollback()
-            # Clean up uploaded files
-            for file_path in file_paths:
-                try:
-                    os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], file_path))
-                except:
-                    pass
-            return jsonify({'error': 'Invalid response from payment gateway'}), 500
-        
-        # Now link files to job and commit
-        job.files = file_paths
-        job.order_tracking_id = payment_data.get('order_tracking_id')
-        job.merchant_reference = merchant_reference
-        db.session.commit()
-        
-        send_payment_email(user.email, current_app.config['PESAPAL_ADMIN_EMAIL'], job, 'Upfront', 'Pending', initial_amount, payment_data.get('order_tracking_id'))
-        
-        return jsonify({
-            'redirect_url': payment_data['redirect_url'],
-            'order_tracking_id': payment_data.get('order_tracking_id'),
-            'job_id': job.id
-        }), 200
-        
-    except requests.RequestException as e:
-        logger.error(f"Failed to initiate payment: {str(e)} - Response: {getattr(e.response, 'text', 'No response')}")
-        db.session.rollback()
-        # Clean up uploaded files
-        for file_path in file_paths:
-            try:
-                os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], file_path))
-            except:
-                pass
-        send_payment_email(user.email, current_app.config['PESAPAL_ADMIN_EMAIL'], None, 'Upfront', 'Failed', initial_amount)
-        return jsonify({'error': 'Failed to initiate payment', 'details': str(e)}), 500
-    except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
-        db.session.rollback()
-        # Clean up uploaded files
-        for file_path in file_paths:
-            try:
-                os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], file_path))
-            except:
-                pass
-        return jsonify({'error': 'Internal server error'}), 500
+    body, status = create_job_order(user, data, request.files.getlist('files'), data.getlist('upload_ids'))
+    return jsonify(body), status
 
 def handle_completion_payment(job_id, user, data):
     job = Job.query.get(job_id)
@@ -415,11 +170,11 @@ def handle_completion_payment(job_id, user, data):
     
     logger.info(f"Submitting Pesapal payload for completion: {payload}")
     try:
-        response = requests.post(
-            PESAPAL_URLS[current_app.config['PESAPAL_ENVIRONMENT']]['submit_order'],
+        response = http_client.post(
+            pesapal_url('submit_order'),
             json=payload,
             headers=headers,
-            timeout=10
+            endpoint='pesapal.submit_order'
         )
         logger.info(f"Pesapal response status: {response.status_code}, text: {response.text}")
         response.raise_for_status()
@@ -452,11 +207,12 @@ def handle_completion_payment(job_id, user, data):
         return jsonify({'error': 'Failed to initiate completion payment', 'details': str(e)}), 500
 
 @payments_bp.route('/ipn', methods=['GET', 'POST'])
+@rate_limiter.exempt  # every notification comes from Pesapal's few addresses
 def handle_ipn():
     if request.method == 'GET':
         data = request.args
     else:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
     
     logger.info(f"IPN notification received: {data}")
     
@@ -468,149 +224,38 @@ def handle_ipn():
         logger.error(f"Invalid IPN data: OrderTrackingId={order_tracking_id}, OrderNotificationType={notification_type}")
         return jsonify({'error': 'Invalid IPN data'}), 400
 
-    job = None
-    if order_merchant_reference and order_merchant_reference.startswith('JOB-'):
-        try:
-            job_id = int(order_merchant_reference.split('-')[1])
-            job = Job.query.get(job_id)
-        except (ValueError, IndexError):
-            logger.error(f"Invalid merchant reference format: {order_merchant_reference}")
-    
-    if not job:
-        job = Job.query.filter(
-            (Job.order_tracking_id == order_tracking_id) | 
-            (Job.completion_tracking_id == order_tracking_id)
-        ).first()
-    
-    if not job:
-        logger.error(f"Job not found for OrderTrackingId: {order_tracking_id}, MerchantReference: {order_merchant_reference}")
-        return jsonify({'error': 'Job not found'}), 404
-
-    token = get_pesapal_token()
-    if not token:
-        logger.error("Failed to authenticate with Pesapal for IPN processing")
-        return jsonify({'error': 'Failed to authenticate with Pesapal'}), 500
-
-    headers = {
-        'Accept': 'application/json',
-        'Authorization': f'Bearer {token}'
-    }
-    
+    # Recorded and acknowledged here; the transaction status is fetched and applied by the IPN workers
     try:
-        response = requests.get(
-            f"{PESAPAL_URLS[current_app.config['PESAPAL_ENVIRONMENT']]['get_transaction_status']}?orderTrackingId={order_tracking_id}",
-            headers=headers,
-            timeout=10
-        )
-        logger.info(f"Transaction status response status: {response.status_code}, text: {response.text}")
-        response.raise_for_status()
-        status_data = response.json()
-        logger.info(f"Transaction status response: {status_data}")
-
-        payment_status = status_data.get('payment_status_description')
-        payment_method = status_data.get('payment_method', 'Unknown')
-        amount = status_data.get('amount', 0)
-        
-        payment_type = 'completion' if order_tracking_id == job.completion_tracking_id else 'upfront'
-        
-        if payment_status == 'Completed':
-            if payment_type == 'upfront' and job.payment_status == 'Pending':
-                job.payment_status = 'Partial'
-                job.status = 'In Progress'
-                job.order_tracking_id = order_tracking_id
-                db.session.commit()
-                logger.info(f"25% payment completed for job {job.id}")
-                
-            elif payment_type == 'completion' and job.payment_status == 'Partial':
-                job.payment_status = 'Completed'
-                db.session.commit()
-                logger.info(f"75% payment completed for job {job.id}")
-                
-            send_payment_email(
-                job.client_email,
-                current_app.config['PESAPAL_ADMIN_EMAIL'],
-                job,
-                'Upfront' if payment_type == 'upfront' else 'Completion',
-                'Success',
-                amount,
-                order_tracking_id
-            )
-            
-        elif payment_status in ['Failed', 'Invalid']:
-            amount = job.total_amount * (0.01 if payment_type == 'completion' else 0.05)
-            # For upfront failures, delete the job and clean up files
-            if payment_type == 'upfront':
-                # Clean up files first
-                if job.files:
-                    for file_path in job.files:
-                        try:
-                            full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], file_path)
-                            os.remove(full_path)
-                        except Exception as e:
-                            logger.error(f"Failed to delete file {file_path}: {str(e)}")
-                # Delete job from database
-                db.session.delete(job)
-                db.session.commit()
-                logger.info(f"Deleted job {job.id} due to failed upfront payment")
-            send_payment_email(
-                job.client_email,
-                current_app.config['PESAPAL_ADMIN_EMAIL'],
-                job,
-                'Completion' if payment_type == 'completion' else 'Upfront',
-                'Failed',
-                amount,
-                order_tracking_id
-            )
-
-        return jsonify({
-            'orderNotificationType': notification_type,
-            'orderTrackingId': order_tracking_id,
-            'orderMerchantReference': order_merchant_reference,
-            'status': 200
-        }), 200
-        
-    except requests.RequestException as e:
-        logger.error(f"Failed to process IPN: {str(e)} - Response: {getattr(e.response, 'text', 'No response')}")
+        ipn_pipeline.receive(order_tracking_id, order_merchant_reference, notification_type)
+    except Exception as e:
+        logger.error(f"Failed to record IPN for {order_tracking_id}: {str(e)}", exc_info=True)
+        db.session.rollback()
         return jsonify({'error': 'Failed to process IPN', 'details': str(e)}), 500
 
+    return jsonify({
+        'orderNotificationType': notification_type,
+        'orderTrackingId': order_tracking_id,
+        'orderMerchantReference': order_merchant_reference,
+        'status': 200
+    }), 200
+
 @payments_bp.route('/status/<order_tracking_id>', methods=['GET'])
 @jwt_required()
 def get_payment_status(order_tracking_id):
     user_id = get_jwt_identity()
-    job = Job.query.filter(
-        (Job.order_tracking_id == order_tracking_id) | 
-        (Job.completion_tracking_id == order_tracking_id)
-    ).first()
+    job = find_job(order_tracking_id)
     
     if not job or job.user_id != user_id:
         logger.error(f"Unauthorized or job not found for OrderTrackingId: {order_tracking_id}, user ID: {user_id}")
         return jsonify({'error': 'Job not found or unauthorized'}), 404
 
-    token = get_pesapal_token()
-    if not token:
-        logger.error("Failed to authenticate with Pesapal for payment status check")
-        return jsonify({'error': 'Failed to authenticate with Pesapal'}), 500
-
-    headers = {
-        'Accept': 'application/json',
-        'Authorization': f'Bearer {token}'
-    }
     try:
-        response = requests.get(
-            f"{PESAPAL_URLS[current_app.config['PESAPAL_ENVIRONMENT']]['get_transaction_status']}?orderTrackingId={order_tracking_id}",
-            headers=headers,
-            timeout=10
-        )
-        logger.info(f"Payment status response status: {response.status_code}, text: {response.text}")
-        response.raise_for_status()
-        data = response.json()
-        logger.info(f"Payment status retrieved: {data}")
-        return jsonify({
-            'payment_status': data.get('payment_status_description'),
-            'confirmation_code': data.get('confirmation_code'),
-            'amount': data.get('amount'),
-            'currency': data.get('currency')
-        }), 200
+        # Pesapal is only asked when neither this worker nor payment_transaction has a recent answer;
+        # changes are also pushed to the job's sockets as 'payment_status' on /jobs
+        data = payment_status_cache.get(job, order_tracking_id)
+        if data is None:
+            return jsonify({'error': 'Failed to authenticate with Pesapal'}), 500
+        return jsonify(status_summary(data)), 200
     except requests.RequestException as e:
         logger.error(f"Failed to get payment status: {str(e)} - Response: {getattr(e.response, 'text', 'No response')}")
         return jsonify({'error': 'Failed to get payment status', 'details': str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,47 @@
+from flask import Blueprint, request, jsonify, g
+import logging
+import math
+from server.services.search import search, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+search_bp = Blueprint('search', __name__)
+
+logger = logging.getLogger(__name__)
+
+KINDS = {'all': ('jobs', 'blogs'), 'jobs': ('jobs',), 'blogs': ('blogs',)}
+
+
+@search_bp.route('', methods=['GET', 'OPTIONS'])
+def search_all():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({"error": "q is required"}), 400
+    if len(text) > 200:
+        return jsonify({"error": "q must be at most 200 characters"}), 400
+    kind = request.args.get('type', 'all')
+    if kind not in KINDS:
+        return jsonify({"error": "type must be one of all, jobs, blogs"}), 400
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "page and per_page must be integers"}), 400
+
+    # Visitors search blogs; signed-in clients also their own jobs, admins all paid jobs
+    user = getattr(g, 'current_user', None)
+    if kind == 'jobs' and not user:
+        return jsonify({'error': 'Token missing or invalid'}), 401
+
+    try:
+        results, total = search(text, user, KINDS[kind], page, per_page)
+        return jsonify({
+            'results': results,
+            'total': total,
+            'pages': math.ceil(total / per_page) if total else 0,
+            'current_page': page
+        }), 200
+    except Exception as e:
+        logger.error(f"Search failed for query {text!r}: {str(e)}", exc_info=True)
+        return jsonify({"error": "Search failed", "details": str(e)}), 500
@@ -0,0 +1,183 @@
+from flask import Blueprint, request, jsonify, g, current_app
+from datetime import datetime, timedelta
+from sqlalchemy import case, update
+import logging
+import re
+from extensions import db
+from models import ChunkedUpload
+from server.services.orders import allowed_file
+from server.services.uploads import upload_store
+
+uploads_bp = Blueprint('uploads', __name__)
+
+logger = logging.getLogger(__name__)
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+def _own_upload(upload_id, user):
+    upload = db.session.get(ChunkedUpload, upload_id)
+    if not upload or upload.user_id != user.id:
+        return None
+    return upload
+
+
+@uploads_bp.route('', methods=['POST', 'OPTIONS'])
+def create_upload():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return jsonify({'error': 'Token missing or invalid'}), 401
+
+    data = request.get_json(silent=True) or {}
+    filename = (data.get('filename') or '').strip()
+    if not filename or not allowed_file(filename):
+        return jsonify({"error": f"File type not allowed for {filename}"}), 400
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({"error": "size must be an integer"}), 400
+    if size <= 0 or size > current_app.config['UPLOAD_MAX_SIZE']:
+        return jsonify({"error": f"size must be between 1 and {current_app.config['UPLOAD_MAX_SIZE']} bytes"}), 400
+
+    try:
+        upload = upload_store.begin_chunked(user, filename, size, data.get('content_type'))
+        db.session.commit()
+        logger.info(f"Chunked upload {upload.id} started by user ID: {user.id} ({size} bytes)")
+        return jsonify({**upload.to_dict(), 'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE']}), 201
+    except Exception as e:
+        logger.error(f"Chunked upload creation failed: {str(e)}", exc_info=True)
+        db.session.rollback()
+        return jsonify({"error": "Failed to start upload", "details": str(e)}), 500
+
+
+@uploads_bp.route('/<upload_id>', methods=['GET', 'OPTIONS'])
+def get_upload(upload_id):
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return jsonify({'error': 'Token missing or invalid'}), 401
+
+    # Where to resume from after a failed chunk
+    upload = _own_upload(upload_id, user)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify({**upload.to_dict(), 'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE']}), 200
+
+
+@uploads_bp.route('/<upload_id>', methods=['PUT', 'OPTIONS'])
+def put_chunk(upload_id):
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return jsonify({'error': 'Token missing or invalid'}), 401
+
+    match = CONTENT_RANGE.match(request.headers.get('Content-Range', ''))
+    if not match:
+        return jsonify({"error": "Content-Range: bytes <start>-<end>/<size> is required"}), 400
+    start, end = int(match.group(1)), int(match.group(2))
+    length = end - start + 1
+    if length <= 0 or request.content_length != length:
+        return jsonify({"error": "Content-Range does not match the request body"}), 400
+    if length > current_app.config['UPLOAD_CHUNK_SIZE']:
+        return jsonify({"error": f"Chunks are limited to {current_app.config['UPLOAD_CHUNK_SIZE']} bytes"}), 413
+
+    upload = _own_upload(upload_id, user)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    if upload.status != 'uploading':
+        return jsonify({"error": "Upload already completed", **upload.to_dict()}), 409
+    if match.group(3) != '*' and int(match.group(3)) != upload.size or end >= upload.size:
+        return jsonify({"error": f"Chunk is outside the declared size of {upload.size} bytes"}), 400
+    if start > upload.received:
+        # Chunks go in order; a resent earlier chunk simply overwrites
+        return jsonify({"error": "Chunk starts past the received data", **upload.to_dict()}), 409
+
+    # Don't hold a pooled connection while the chunk arrives
+    db.session.commit()
+
+    try:
+        written = upload_store.write_chunk(upload_id, start, request.stream, length)
+    except FileNotFoundError:
+        return jsonify({"error": "Upload not found"}), 404
+    if written != length:
+        logger.error(f"Chunk for upload {upload_id} ended after {written} of {length} bytes")
+        return jsonify({"error": "Incomplete chunk"}), 400
+
+    try:
+        db.session.execute(update(ChunkedUpload).where(ChunkedUpload.id == upload_id).values(
+            received=case((ChunkedUpload.received < end + 1, end + 1), else_=ChunkedUpload.received),
+            expires_at=datetime.utcnow() + timedelta(seconds=current_app.config['UPLOAD_SESSION_TTL'])
+        ))
+        db.session.commit()
+        upload = db.session.get(ChunkedUpload, upload_id, populate_existing=True)
+        return jsonify(upload.to_dict()), 200
+    except Exception as e:
+        logger.error(f"Chunk bookkeeping failed for upload {upload_id}: {str(e)}", exc_info=True)
+        db.session.rollback()
+        return jsonify({"error": "Failed to save chunk", "details": str(e)}), 500
+
+
+@uploads_bp.route('/<upload_id>/complete', methods=['POST', 'OPTIONS'])
+def complete_upload(upload_id):
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return jsonify({'error': 'Token missing or invalid'}), 401
+
+    upload = _own_upload(upload_id, user)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    if upload.status == 'complete':
+        return jsonify(upload.to_dict()), 200
+    if upload.received < upload.size:
+        return jsonify({"error": "Upload is missing data", **upload.to_dict()}), 409
+
+    try:
+        sha256 = upload_store.checksum(upload.id)
+        expected = ((request.get_json(silent=True) or {}).get('sha256') or '').lower()
+        if expected and expected != sha256:
+            logger.error(f"Checksum mismatch for chunked upload {upload_id}")
+            return jsonify({"error": "Checksum mismatch; resend the chunks from offset 0", 'sha256': sha256}), 422
+        if not upload_store.complete_chunked(upload, sha256):
+            db.session.rollback()  # completed by a concurrent request
+            upload = _own_upload(upload_id, user)
+            if not upload:
+                return jsonify({"error": "Upload not found"}), 404
+            return jsonify(upload.to_dict()), 200
+        db.session.commit()
+        return jsonify(upload.to_dict()), 200
+    except Exception as e:
+        logger.error(f"Completing chunked upload {upload_id} failed: {str(e)}", exc_info=True)
+        db.session.rollback()
+        return jsonify({"error": "Failed to complete upload", "details": str(e)}), 500
+
+
+@uploads_bp.route('/<upload_id>', methods=['DELETE', 'OPTIONS'])
+def delete_upload(upload_id):
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    user = getattr(g, 'current_user', None)
+    if not user:
+        return jsonify({'error': 'Token missing or invalid'}), 401
+
+    upload = _own_upload(upload_id, user)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    try:
+        upload_store.discard_chunked(upload)
+        db.session.commit()
+        return jsonify({"message": "Upload discarded"}), 200
+    except Exception as e:
+        logger.error(f"Discarding chunked upload {upload_id} failed: {str(e)}", exc_info=True)
+        db.session.rollback()
+        return jsonify({"error": "Failed to discard upload", "details": str(e)}), 500
@@ -0,0 +1,133 @@
+from bisect import bisect
+from threading import Lock
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+import hashlib
+import logging
+import time
+from models import User
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class AdminEntry:
+    # Detached copy of an admin account, safe to share between requests
+    __slots__ = ('id', 'email', 'name')
+
+    def __init__(self, user):
+        self.id = user.id
+        self.email = user.email
+        self.name = user.name
+
+
+class AdminDirectory:
+    """Per-process view of the admin accounts and which admin each client talks to.
+
+    Admins are loaded on first use and reloaded after a commit in this process creates, deletes
+    or changes the role of a user; other workers pick such changes up within `ttl` seconds.
+    Clients are assigned to admins on a consistent-hash ring, so adding or removing an admin
+    only moves that admin's share of the clients.
+    """
+
+    def __init__(self, ttl=60, replicas=64):
+        self.ttl = ttl
+        self.replicas = replicas
+        self.admin_emails = []
+        self._admin_email_set = frozenset()
+        self._admins = ()
+        self._ring_keys = []
+        self._ring_admins = []
+        self._loaded_at = None
+        self._generation = 0  # bumped by invalidate()
+        self._loaded_generation = -1
+        self._lock = Lock()
+        self.loads = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('ADMIN_DIRECTORY_TTL', self.ttl)
+        self.replicas = app.config.get('ADMIN_DIRECTORY_REPLICAS', self.replicas)
+        self.admin_emails = list(app.config.get('ADMIN_EMAILS', []))
+        self._admin_email_set = frozenset(self.admin_emails)
+        self.invalidate()
+
+    def is_admin_email(self, email):
+        return email in self._admin_email_set
+
+    def admins(self):
+        self._refresh()
+        return self._admins
+
+    def admin_ids(self):
+        return [admin.id for admin in self.admins()]
+
+    def admin_for_client(self, client_id):
+        """The admin a client's messages are routed to, or None if there are no admins."""
+        self._refresh()
+        if not self._ring_keys:
+            return None
+        index = bisect(self._ring_keys, _hash(f'client:{client_id}')) % len(self._ring_keys)
+        return self._ring_admins[index]
+
+    def invalidate(self):
+        self._generation += 1
+
+    def stats(self):
+        return {
+            'admins': len(self._admins),
+            'loads': self.loads,
+            'age': round(time.monotonic() - self._loaded_at, 1) if self._loaded_at is not None else None
+        }
+
+    def _fresh(self):
+        return self._loaded_generation == self._generation and time.monotonic() - self._loaded_at < self.ttl
+
+    def _refresh(self):
+        if self._fresh():
+            return
+        with self._lock:
+            if self._fresh():
+                return  # reloaded while we waited for the lock
+            generation = self._generation
+            admins = tuple(AdminEntry(user) for user in User.query.filter_by(role='admin').order_by(User.id).all())
+            ring = sorted(((_hash(f'admin:{admin.id}:{replica}'), admin)
+                           for admin in admins for replica in range(self.replicas)), key=lambda point: point[0])
+            self._admins = admins
+            self._ring_keys = [key for key, _ in ring]
+            self._ring_admins = [admin for _, admin in ring]
+            self._loaded_at = time.monotonic()
+            self._loaded_generation = generation
+            self.loads += 1
+        logger.info(f"Admin directory loaded {len(admins)} admins")
+
+
+admin_directory = AdminDirectory()
+
+
+# Mark the session on flush and reload after its commit, so a reload never sees the change half-done
+def _mark_stale(target):
+    session = object_session(target)
+    if session is not None:
+        session.info['admin_directory_stale'] = True
+
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_delete')
+def _admin_added_or_removed(mapper, connection, target):
+    if target.role == 'admin':
+        _mark_stale(target)
+
+
+@event.listens_for(User, 'after_update')
+def _admin_role_changed(mapper, connection, target):
+    if inspect(target).attrs.role.history.has_changes():
+        _mark_stale(target)
+
+
+@event.listens_for(Session, 'after_commit')
+def _reload_after_commit(session):
+    if session.info.pop('admin_directory_stale', False):
+        admin_directory.invalidate()
@@ -0,0 +1,188 @@
+from flask import request, g, current_app, jsonify
+from collections import OrderedDict
+from threading import Lock
+from sqlalchemy import event
+import hmac
+import jwt
+import logging
+import time
+from extensions import db
+from models import User
+
+logger = logging.getLogger(__name__)
+
+
+class UserSnapshot:
+    # Detached copy of the caller so it can outlive the request's db session
+    __slots__ = ('id', 'email', 'username', 'name', 'role', 'updated_at', '_data')
+
+    def __init__(self, user):
+        self.id = user.id
+        self.email = user.email
+        self.username = user.username
+        self.name = user.name
+        self.role = user.role
+        self.updated_at = user.updated_at
+        self._data = user.to_dict()
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class TokenCache:
+    # Bounded LRU keyed by JWT signature; entries expire after `ttl` seconds or at the token's exp.
+    # An entry older than `recheck` seconds is only served once the user's updated_at is confirmed
+    # unchanged, so role changes and deletions made in other workers take effect within `recheck`
+    def __init__(self, max_size=4096, ttl=300, recheck=5):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.recheck = recheck
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_size, ttl, recheck):
+        with self._lock:
+            self.max_size = max_size
+            self.ttl = ttl
+            self.recheck = recheck
+            self._entries.clear()
+            self._by_user.clear()
+
+    def get(self, token):
+        signing_input, _, signature = token.rpartition('.')
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is None or not hmac.compare_digest(entry[0], signing_input):
+                self.misses += 1
+                return None
+            if entry[3] <= now:
+                self._evict(signature)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(signature)
+            self.hits += 1
+            return entry[2], entry[1], now - entry[4] >= self.recheck
+
+    def put(self, token, claims, user):
+        signing_input, _, signature = token.rpartition('.')
+        expires_at = time.time() + self.ttl
+        if claims.get('exp'):
+            expires_at = min(expires_at, claims['exp'])
+        with self._lock:
+            if signature in self._entries:
+                self._evict(signature)
+            self._entries[signature] = (signing_input, claims, user, expires_at, time.time())
+            self._by_user.setdefault(user.id, set()).add(signature)
+            while len(self._entries) > self.max_size:
+                self._evict(next(iter(self._entries)))
+
+    def confirm(self, token):
+        # The user was found unchanged: serve the entry without checking for another `recheck` seconds
+        signature = token.rpartition('.')[2]
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is not None:
+                self._entries[signature] = entry[:4] + (time.time(),)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for signature in self._by_user.pop(user_id, set()):
+                self._entries.pop(signature, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self):
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def _evict(self, signature):
+        entry = self._entries.pop(signature, None)
+        if entry is not None:
+            signatures = self._by_user.get(entry[2].id)
+            if signatures is not None:
+                signatures.discard(signature)
+                if not signatures:
+                    del self._by_user[entry[2].id]
+
+
+token_cache = TokenCache()
+
+
+def resolve_token(token):
+    """Return (user snapshot, claims) for a bearer token, or (None, claims) if the user no longer exists.
+
+    Raises jwt.ExpiredSignatureError / jwt.InvalidTokenError like jwt.decode does.
+    """
+    use_cache = current_app.config.get('AUTH_CACHE_ENABLED', True)
+    if use_cache:
+        cached = token_cache.get(token)
+        if cached is not None:
+            user, claims, needs_check = cached
+            if not needs_check:
+                return user, claims
+            # Another worker may have changed or deleted the user since it was cached
+            updated_at = db.session.query(User.updated_at).filter(User.id == user.id).scalar()
+            if updated_at is not None and updated_at == user.updated_at:
+                token_cache.confirm(token)
+                return user, claims
+            token_cache.invalidate_user(user.id)
+
+    claims = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+    if 'user_id' not in claims:
+        raise jwt.InvalidTokenError('Token has no user_id claim')
+    user = db.session.get(User, claims['user_id'])
+    if not user:
+        return None, claims
+
+    snapshot = UserSnapshot(user)
+    if use_cache:
+        token_cache.put(token, claims, snapshot)
+    return snapshot, claims
+
+
+def authenticate_request():
+    # Populates g.current_user for every bearer-authenticated request. Failures are kept in
+    # g.auth_error for the handlers, which report them through auth_failure().
+    header = request.headers.get('Authorization')
+    if not header or not header.startswith('Bearer '):
+        return
+    try:
+        user, claims = resolve_token(header.split(' ')[1])
+    except jwt.InvalidTokenError as e:
+        g.auth_error = e
+        return
+    if user:
+        g.current_user = user
+        g.token_claims = claims
+
+
+def auth_failure():
+    """The error response for a bearer token that didn't resolve to a user."""
+    error = g.get('auth_error')
+    if isinstance(error, jwt.ExpiredSignatureError):
+        return jsonify({'error': 'Token expired'}), 401
+    if error is not None:
+        return jsonify({'error': 'Invalid token'}), 401
+    return jsonify({'error': 'User not found'}), 404
+
+
+def init_auth(app):
+    token_cache.configure(
+        app.config.get('AUTH_CACHE_MAX_SIZE', 4096),
+        app.config.get('AUTH_CACHE_TTL', 300),
+        app.config.get('AUTH_CACHE_RECHECK', 5)
+    )
+    app.before_request(authenticate_request)
+    logger.info(f"Auth middleware registered, token cache enabled: {app.config.get('AUTH_CACHE_ENABLED', True)}")
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    token_cache.invalidate_user(target.id)
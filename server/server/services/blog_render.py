@@ -0,0 +1,98 @@
+from html import escape
+from urllib.parse import urlsplit
+import math
+import re
+
+WORDS_PER_MINUTE = 200
+EXCERPT_LENGTH = 150
+
+_BLANK_LINES = re.compile(r'\n\s*\n+')
+_HEADING = re.compile(r'^\s*#{2}\s+(.+)$', re.MULTILINE)
+_SINGLE_NEWLINE = re.compile(r'(?<!\n)\n(?!\n)(?![#*-])')
+
+_BOLD = re.compile(r'\*\*(.*?)\*\*')
+_ITALIC = re.compile(r'(?<!\*)\*([^*]+?)\*(?!\*)')
+_LINK = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
+_IGNORED_IN_URL = re.compile(r'[\x00-\x20]')  # browsers drop these before reading the scheme
+
+_PLAIN_STEPS = (
+    (re.compile(r'##\s+'), ''),
+    (re.compile(r'^\*\s+', re.MULTILINE), ''),
+    (_BOLD, r'\1'),
+    (_ITALIC, r'\1'),
+    (_LINK, r'\1'),
+    (re.compile(r'\s+'), ' ')
+)
+
+
+def normalize_content(content):
+    # Ensure consistent line breaks and trim excess whitespace
+    content = _BLANK_LINES.sub('\n\n', content.strip())
+    # Convert simple markdown-like syntax to consistent format
+    content = _HEADING.sub(r'## \1', content)
+    # Add paragraph breaks for single newlines
+    content = _SINGLE_NEWLINE.sub('\n\n', content)
+    return content
+
+
+def _link(match):
+    text, url = match.group(1), match.group(2)
+    if urlsplit(_IGNORED_IN_URL.sub('', url)).scheme.lower() not in ('', 'http', 'https', 'mailto'):
+        return text  # drop javascript: and similar
+    return f'<a href="{url}" class="content-link" target="_blank" rel="noopener noreferrer">{text}</a>'
+
+
+def _inline(text):
+    text = escape(text)
+    text = _BOLD.sub(r'<strong class="bold-text">\1</strong>', text)
+    text = _ITALIC.sub(r'<em class="italic-text">\1</em>', text)
+    return _LINK.sub(_link, text)
+
+
+def content_to_html(content):
+    """Render normalized post content to HTML with the same rules and classes as the blog page."""
+    parts = []
+    items = []
+    section = 0
+
+    def close_list():
+        if items:
+            parts.append('<ul class="content-list">' + ''.join(items) + '</ul>')
+            items.clear()
+
+    for line in content.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('## '):
+            close_list()
+            parts.append(f'<h2 id="section-{section}" class="section-heading">{escape(line[3:])}</h2>')
+            section += 1
+        elif line.endswith(':') and not line.startswith('*') and len(line.split(' ')) <= 4:
+            close_list()
+            parts.append(f'<h3 class="subsection-heading">{escape(line.replace(":", "", 1))}</h3>')
+        elif line.startswith('* '):
+            items.append(f'<li class="list-item">{_inline(line[2:])}</li>')
+        else:
+            close_list()
+            parts.append(f'<p class="content-paragraph">{_inline(line)}</p>')
+    close_list()
+    return '\n'.join(parts)
+
+
+def plain_text(content):
+    for pattern, replacement in _PLAIN_STEPS:
+        content = pattern.sub(replacement, content)
+    return content.strip()
+
+
+def render_content(content):
+    """Everything derived from a post's content, as Blog column values."""
+    text = plain_text(content)
+    word_count = len(text.split())
+    return {
+        'content_html': content_to_html(content),
+        'excerpt': text if len(text) <= EXCERPT_LENGTH else text[:EXCERPT_LENGTH - 3] + '...',
+        'word_count': word_count,
+        'reading_time': max(1, math.ceil(word_count / WORDS_PER_MINUTE))
+    }
@@ -0,0 +1,138 @@
+from flask import current_app, request
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+from sqlalchemy import event, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import contains_eager, defer
+import hashlib
+import math
+import time
+from extensions import db
+from models import Blog, ChangeMarker, User
+
+
+def blog_page(page, per_page):
+    """One page of the blog listing as (payload, last_modified).
+
+    Posts are listed by their precomputed summary fields; content and HTML are not even loaded.
+    The author is joined into the page query rather than lazy-loaded per blog, and the total
+    comes from the same query as last_modified. Creating, editing or deleting any blog can shift
+    every page, so last_modified is when any blog last changed: the 'blog' change marker, which
+    unlike max(updated_at) also moves forward when the newest post is deleted.
+    """
+    # Same clamping as Flask-SQLAlchemy's paginate(error_out=False)
+    page = max(page, 1)
+    if per_page < 1:
+        per_page = 20
+
+    blogs = Blog.query.join(Blog.author).options(
+        defer(Blog.content), defer(Blog.content_html),
+        contains_eager(Blog.author).load_only(User.id, User.name)
+    ).order_by(Blog.created_at.desc()).limit(per_page).offset((page - 1) * per_page).all()
+    total, newest, changed_at = db.session.query(
+        func.count(Blog.id), func.max(Blog.updated_at),
+        db.session.query(ChangeMarker.changed_at).filter(ChangeMarker.name == 'blog').scalar_subquery()
+    ).one()
+    last_modified = max(filter(None, (newest, changed_at)), default=None)
+
+    payload = {
+        'blogs': [blog.to_summary_dict() for blog in blogs],
+        'total': total,
+        'pages': math.ceil(total / per_page) if total else 0,
+        'current_page': page
+    }
+    return payload, last_modified
+
+
+class BlogListCache:
+    """Rendered blog listing pages keyed by (page, per_page).
+
+    The blog handlers call invalidate() after every change; other workers' copies expire after
+    `ttl` seconds. Entries hold the serialized body so a hit costs no query and no JSON encoding.
+    """
+
+    def __init__(self, max_size=256, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = True
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('BLOG_CACHE_ENABLED', self.enabled)
+        self.max_size = app.config.get('BLOG_CACHE_MAX_SIZE', self.max_size)
+        self.ttl = app.config.get('BLOG_CACHE_TTL', self.ttl)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[3] <= time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[:3]
+
+    def put(self, key, body, etag, last_modified, generation):
+        with self._lock:
+            if generation != self._generation:
+                return  # rendered from data older than an invalidation
+            self._entries[key] = (body, etag, last_modified, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def generation(self):
+        return self._generation
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+blog_list_cache = BlogListCache()
+
+
+def blog_list_response(page, per_page):
+    """The blog listing as a conditional response: 304 when the client's ETag or date still matches."""
+    key = (page, per_page)
+    cached = blog_list_cache.get(key) if blog_list_cache.enabled else None
+    if cached is None:
+        generation = blog_list_cache.generation()
+        payload, last_modified = blog_page(page, per_page)
+        body = current_app.json.dumps(payload)
+        etag = hashlib.sha1(body.encode()).hexdigest()
+        cached = (body, etag, last_modified)
+        if blog_list_cache.enabled:
+            blog_list_cache.put(key, body, etag, last_modified, generation)
+
+    body, etag, last_modified = cached
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Let browsers and CDNs store the listing but revalidate it on every use
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@event.listens_for(Blog, 'after_insert')
+@event.listens_for(Blog, 'after_update')
+@event.listens_for(Blog, 'after_delete')
+def _mark_blogs_changed(mapper, connection, target):
+    # In the flush's own transaction, so the marker moves exactly when the change commits
+    marker = ChangeMarker.__table__
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(marker).values(name='blog', changed_at=datetime.utcnow())
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['name'], set_={'changed_at': statement.excluded.changed_at}))
@@ -0,0 +1,172 @@
+from flask import request, jsonify
+from datetime import datetime, timezone
+from sqlalchemy import and_, or_
+from extensions import db
+from models import Message
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def parse_timestamp(value):
+    # Message timestamps are stored as naive UTC
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def visible_to(role):
+    return ~Message.admin_deleted if role == 'admin' else ~Message.client_deleted
+
+
+def conversation_filter(client_id, admin_ids):
+    # A client's general thread is with the admins as a team, whichever of them it was routed to
+    return or_(
+        and_(Message.sender_id == client_id, Message.recipient_id.in_(admin_ids)),
+        and_(Message.sender_id.in_(admin_ids), Message.recipient_id == client_id)
+    )
+
+
+def conversation_matches(message, client_id, admin_ids):
+    return (
+        (message.sender_id == client_id and message.recipient_id in admin_ids) or
+        (message.recipient_id == client_id and message.sender_id in admin_ids)
+    )
+
+
+def _keyset_page(query, limit, before=None, after=None):
+    if after is not None:
+        query = query.filter(or_(
+            Message.created_at > after.created_at,
+            and_(Message.created_at == after.created_at, Message.id > after.id)
+        )).order_by(Message.created_at.asc(), Message.id.asc())
+    else:
+        if before is not None:
+            query = query.filter(or_(
+                Message.created_at < before.created_at,
+                and_(Message.created_at == before.created_at, Message.id < before.id)
+            ))
+        query = query.order_by(Message.created_at.desc(), Message.id.desc())
+    return query.limit(limit + 1).all()
+
+
+def conversation_page(client_id, admin_ids, role, limit, before=None, after=None):
+    """Up to `limit` messages of a client's thread with the admins, oldest first, and whether more exist.
+
+    Without a cursor this is the latest page; `before` pages back in time and `after` forward.
+    Each direction with each admin is fetched separately with LIMIT and merged here, so the cost
+    depends on the page size and number of admins rather than on the length of the thread.
+    """
+    messages = []
+    for admin_id in admin_ids:
+        # A single (sender_id, recipient_id) pair is one range scan on ix_message_sender_recipient_created_at
+        messages += _keyset_page(Message.query.filter(
+            Message.sender_id == client_id, Message.recipient_id == admin_id, visible_to(role)
+        ), limit, before, after)
+        if client_id != admin_id:
+            messages += _keyset_page(Message.query.filter(
+                Message.sender_id == admin_id, Message.recipient_id == client_id, visible_to(role)
+            ), limit, before, after)
+    messages.sort(key=lambda m: (m.created_at, m.id))
+    return _trim_page(messages, limit, after)
+
+
+def job_messages(job_id, role):
+    return Message.query.filter(Message.job_id == job_id, visible_to(role)).order_by(Message.created_at, Message.id).all()
+
+
+def job_messages_page(job_id, role, limit, before=None, after=None):
+    """Like conversation_page for one job's thread: a single range scan on ix_message_job_id_created_at."""
+    messages = _keyset_page(Message.query.filter(Message.job_id == job_id, visible_to(role)), limit, before, after)
+    messages.sort(key=lambda m: (m.created_at, m.id))
+    return _trim_page(messages, limit, after)
+
+
+def _trim_page(messages, limit, after):
+    has_more = len(messages) > limit
+    if after is not None:
+        return messages[:limit], has_more
+    return messages[-limit:], has_more
+
+
+def _page_args(belongs):
+    # Returns (limit, cursors, None) or (None, None, error response)
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        before_id = request.args.get('before_id', type=int)
+        after_id = request.args.get('after_id', type=int)
+    except ValueError:
+        return None, None, (jsonify({"error": "limit must be an integer"}), 400)
+    if before_id and after_id:
+        return None, None, (jsonify({"error": "Use either before_id or after_id, not both"}), 400)
+
+    cursors = {}
+    for name, message_id in (('before', before_id), ('after', after_id)):
+        if message_id:
+            cursor = db.session.get(Message, message_id)
+            if not cursor or not belongs(cursor):
+                return None, None, (jsonify({"error": f"Unknown {name}_id"}), 400)
+            cursors[name] = cursor
+    return limit, cursors, None
+
+
+def list_conversation_page(client_id, admin_ids, role):
+    limit, cursors, error = _page_args(lambda message: conversation_matches(message, client_id, admin_ids))
+    if error:
+        return error
+    messages, has_more = conversation_page(client_id, admin_ids, role, limit, **cursors)
+    return jsonify({
+        'messages': [msg.to_dict() for msg in messages],
+        'has_more': has_more
+    })
+
+
+def list_job_messages_page(job_id, role):
+    limit, cursors, error = _page_args(lambda message: message.job_id == job_id)
+    if error:
+        return error
+    messages, has_more = job_messages_page(job_id, role, limit, **cursors)
+    return jsonify({
+        'messages': [msg.to_dict() for msg in messages],
+        'has_more': has_more
+    })
+
+
+def sync_conversation(client_id, admin_ids, role):
+    return _sync(conversation_filter(client_id, admin_ids), role)
+
+
+def sync_job_thread(job_id, role):
+    return _sync(Message.job_id == job_id, role)
+
+
+def _sync(thread_filter, role):
+    """Changes to a thread since `since`, for clients catching up after a reconnect.
+
+    Returns messages created or edited since then, ids of messages deleted for this viewer, and
+    the timestamp to pass as `since` next time.
+    """
+    if not request.args.get('since'):
+        return jsonify({"error": "since is required"}), 400
+    try:
+        since = parse_timestamp(request.args['since'])
+    except ValueError:
+        return jsonify({"error": "Invalid since format. Use ISO 8601 format"}), 400
+
+    # Taken before querying so a change committed meanwhile is picked up by the next sync
+    now = datetime.utcnow()
+    changed = Message.query.filter(
+        thread_filter,
+        Message.updated_at > since
+    ).order_by(Message.updated_at.asc(), Message.id.asc()).limit(MAX_PAGE_SIZE + 1).all()
+    has_more = len(changed) > MAX_PAGE_SIZE
+    changed = changed[:MAX_PAGE_SIZE]
+
+    deleted_flag = 'admin_deleted' if role == 'admin' else 'client_deleted'
+    return jsonify({
+        'messages': [msg.to_dict() for msg in changed if not getattr(msg, deleted_flag)],
+        'deleted_ids': [msg.id for msg in changed if getattr(msg, deleted_flag)],
+        'since': changed[-1].updated_at.isoformat() if has_more else now.isoformat(),
+        'has_more': has_more
+    })
@@ -0,0 +1,199 @@
+from flask import current_app, request
+from eventlet.hubs import trampoline
+from urllib.parse import quote
+from werkzeug.security import safe_join
+import base64
+import hashlib
+import hmac
+import logging
+import mimetypes
+import os
+import ssl
+import time
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 64 * 1024
+
+
+class FileBody:
+    """Response body for `length` bytes of an open file starting at `offset`.
+
+    Under eventlet the first block goes out through the server as usual, which flushes the
+    headers, and the rest is handed to os.sendfile() on the client socket so the bytes never pass
+    through Python. Anywhere else (TLS, the dev server, the test client) it falls back to reads.
+    """
+
+    def __init__(self, file, offset, length, environ):
+        self.file = file
+        self.offset = offset
+        self.length = length
+        self.socket = _sendfile_socket(environ)
+        if self.socket is not None:
+            environ['eventlet.minimum_write_chunk_size'] = 0  # write the first block straight away
+
+    def __iter__(self):
+        self.file.seek(self.offset)
+        remaining = self.length
+        first = self.file.read(min(BLOCK_SIZE, remaining))
+        if not first:
+            return
+        yield first
+        remaining -= len(first)
+        if self.socket is not None:
+            _sendfile(self.socket, self.file, self.offset + len(first), remaining)
+            return
+        while remaining > 0:
+            data = self.file.read(min(BLOCK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+    def close(self):
+        self.file.close()
+
+
+def _sendfile_socket(environ):
+    sock = getattr(environ.get('eventlet.input'), '_sock', None)
+    if sock is None or isinstance(sock, ssl.SSLSocket) or not hasattr(os, 'sendfile'):
+        return None
+    return sock
+
+
+def _sendfile(sock, file, offset, count):
+    fd = sock.fileno()
+    while count > 0:
+        try:
+            sent = os.sendfile(fd, file.fileno(), offset, count)
+        except BlockingIOError:
+            trampoline(fd, write=True, timeout=sock.gettimeout())
+            continue
+        if sent == 0:
+            break  # file shrank under us
+        offset += sent
+        count -= sent
+
+
+def _signing_key():
+    return (current_app.config.get('DOWNLOAD_URL_SECRET') or current_app.config['SECRET_KEY']).encode()
+
+
+def _signature(relative_path, expires):
+    digest = hmac.new(_signing_key(), f"{relative_path}\n{expires}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def signed_url(relative_path, expires_at):
+    """A /api/files URL for `relative_path` that works without a token until `expires_at` (epoch seconds)."""
+    return f"/api/files/{quote(relative_path)}?expires={expires_at}&signature={_signature(relative_path, expires_at)}"
+
+
+def signed_urls(relative_paths, ttl=None):
+    """({path: signed url}, expires_at) for a batch of paths the caller has already authorized.
+
+    Expiry is rounded up to the minute so a page reloaded within the same minute gets the same
+    URLs back and browsers can reuse what they cached.
+    """
+    ttl = ttl or current_app.config.get('DOWNLOAD_URL_TTL', 900)
+    expires_at = -(-(int(time.time()) + ttl) // 60) * 60
+    return {path: signed_url(path, expires_at) for path in relative_paths}, expires_at
+
+
+def verify_signature(relative_path, expires, signature):
+    """True if `signature` was issued for this path and `expires` has not passed. No database access."""
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(relative_path, expires), signature or '')
+
+
+def _content_disposition(response, as_attachment, download_name):
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        download_name.encode('ascii')
+        response.headers.set('Content-Disposition', disposition, filename=download_name)
+    except UnicodeEncodeError:
+        response.headers['Content-Disposition'] = f"{disposition}; filename*=UTF-8''{quote(download_name)}"
+
+
+def _requested_range(etag, last_modified, size):
+    """(start, length) of the single range asked for, None for the whole file, or False if unsatisfiable."""
+    if 'Range' not in request.headers:
+        return None
+    if_range = request.if_range
+    if if_range.etag is not None and if_range.etag != etag:
+        return None  # the client's partial copy is of another version
+    if if_range.date is not None and if_range.date != last_modified:
+        return None
+    byte_range = request.range
+    if byte_range is None or len(byte_range.ranges) != 1:
+        return None  # ignore malformed and multipart requests and send it all
+    bounds = byte_range.range_for_length(size)
+    if bounds is None:
+        return False
+    return bounds[0], bounds[1] - bounds[0]
+
+
+def send_upload(relative_path, as_attachment=True, download_name=None):
+    """Serve a file under UPLOAD_FOLDER with ETag, conditional GET and single byte ranges.
+
+    With DOWNLOAD_OFFLOAD set to 'x-accel' (nginx) or 'x-sendfile' (Apache, lighttpd) the app
+    only authorizes and the front server sends the bytes. Raises FileNotFoundError when the file
+    is missing.
+    """
+    upload_folder = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    path = safe_join(upload_folder, relative_path)
+    if path is None or not os.path.isfile(path):
+        raise FileNotFoundError(relative_path)
+    download_name = download_name or os.path.basename(path)
+    mimetype = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+
+    offload = current_app.config.get('DOWNLOAD_OFFLOAD', 'none')
+    if offload in ('x-accel', 'x-sendfile'):
+        response = current_app.response_class(mimetype=mimetype)
+        _content_disposition(response, as_attachment, download_name)
+        if offload == 'x-accel':
+            prefix = current_app.config.get('DOWNLOAD_ACCEL_PREFIX', '/protected-uploads').rstrip('/')
+            response.headers['X-Accel-Redirect'] = f"{prefix}/{quote(relative_path)}"
+        else:
+            response.headers['X-Sendfile'] = path
+        return response
+
+    stat = os.stat(path)
+    etag = f"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    response = current_app.response_class(mimetype=mimetype, direct_passthrough=True)
+    _content_disposition(response, as_attachment, download_name)
+    response.set_etag(etag)
+    response.last_modified = int(stat.st_mtime)
+    response.accept_ranges = 'bytes'
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.make_conditional(request)
+    if response.status_code in (304, 412):
+        return response
+
+    requested = _requested_range(etag, response.last_modified, stat.st_size)
+    if requested is False:
+        response.status_code = 416
+        response.headers['Content-Range'] = f"bytes */{stat.st_size}"
+        response.content_length = 0
+        return response
+    start, length = requested or (0, stat.st_size)
+    if requested:
+        response.status_code = 206
+        response.headers['Content-Range'] = f"bytes {start}-{start + length - 1}/{stat.st_size}"
+    response.content_length = length
+
+    file = open(path, 'rb')
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if file_wrapper is not None:
+        # gunicorn sends Content-Length bytes from the current position with sendfile()
+        file.seek(start)
+        response.response = file_wrapper(file, BLOCK_SIZE)
+    else:
+        response.response = FileBody(file, start, length, request.environ)
+    return response
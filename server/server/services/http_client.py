@@ -0,0 +1,157 @@
+from collections import deque
+from threading import Lock
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+import eventlet
+import logging
+import random
+import requests
+import time
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class EndpointStats:
+    def __init__(self, window=200):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_status = None
+        self.recent = deque(maxlen=window)
+
+    def record(self, elapsed_ms, status, attempts):
+        self.count += 1
+        self.retries += attempts - 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.last_status = status
+        self.recent.append(elapsed_ms)
+        if status is None or status >= 500:
+            self.errors += 1
+
+    def to_dict(self):
+        recent = sorted(self.recent)
+
+        def percentile(p):
+            return round(recent[min(len(recent) - 1, int(len(recent) * p))], 2) if recent else None
+
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'retries': self.retries,
+            'avg_ms': round(self.total_ms / self.count, 2) if self.count else None,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(self.max_ms, 2),
+            'last_status': self.last_status
+        }
+
+
+class HttpClient:
+    """Shared outbound HTTP client.
+
+    One requests.Session whose adapter keeps a keep-alive connection pool per host, default
+    timeouts from config, retries with full-jitter backoff (eventlet.sleep, so waiting never
+    blocks the hub) and latency stats per logical endpoint.
+    """
+
+    def __init__(self):
+        self.pool_connections = 10
+        self.pool_maxsize = 20
+        self.timeout = (5, 10)
+        self.max_retries = 2
+        self.backoff_base = 0.5
+        self.backoff_max = 8
+        self._session = None
+        self._session_lock = Lock()
+        self._stats = {}
+        self._stats_lock = Lock()
+
+    def init_app(self, app):
+        self.pool_connections = app.config.get('HTTP_CLIENT_POOL_CONNECTIONS', self.pool_connections)
+        self.pool_maxsize = app.config.get('HTTP_CLIENT_POOL_MAXSIZE', self.pool_maxsize)
+        self.timeout = (
+            app.config.get('HTTP_CLIENT_CONNECT_TIMEOUT', self.timeout[0]),
+            app.config.get('HTTP_CLIENT_READ_TIMEOUT', self.timeout[1])
+        )
+        self.max_retries = app.config.get('HTTP_CLIENT_MAX_RETRIES', self.max_retries)
+        self.backoff_base = app.config.get('HTTP_CLIENT_BACKOFF_BASE', self.backoff_base)
+        self.backoff_max = app.config.get('HTTP_CLIENT_BACKOFF_MAX', self.backoff_max)
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    # Retries are handled in request() so they can back off without blocking
+                    adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def request(self, method, url, endpoint=None, retries=None, timeout=None, **kwargs):
+        """Send a request through the shared pool.
+
+        `endpoint` names the call for metrics (defaults to host + path). `retries` defaults to
+        HTTP_CLIENT_MAX_RETRIES for GET and 0 otherwise; only connection errors, timeouts and
+        429/502/503/504 responses are retried. Raises requests.RequestException like requests does.
+        """
+        endpoint = endpoint or self._endpoint_name(url)
+        if retries is None:
+            retries = self.max_retries if method.upper() == 'GET' else 0
+        timeout = timeout or self.timeout
+
+        attempt = 0
+        start = time.perf_counter()
+        while True:
+            attempt += 1
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt > retries:
+                    self._record(endpoint, start, None, attempt)
+                    raise
+                logger.warning(f"{endpoint} attempt {attempt}/{retries + 1} failed: {str(e)}")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt > retries:
+                    self._record(endpoint, start, response.status_code, attempt)
+                    return response
+                logger.warning(f"{endpoint} attempt {attempt}/{retries + 1} returned {response.status_code}")
+                response.close()
+            eventlet.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))))
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def metrics(self):
+        with self._stats_lock:
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    def _record(self, endpoint, start, status, attempts):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = EndpointStats()
+            stats.record(elapsed_ms, status, attempts)
+
+    @staticmethod
+    def _endpoint_name(url):
+        parsed = urlparse(url)
+        return f"{parsed.netloc}{parsed.path}"
+
+
+http_client = HttpClient()
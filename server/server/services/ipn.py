@@ -0,0 +1,245 @@
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+from sqlalchemy import case, delete, func, update
+from sqlalchemy.exc import IntegrityError
+import logging
+import random
+import requests
+from extensions import db
+from models import PaymentNotification
+from server.services.payments import apply_transaction_status, fetch_transaction_status, find_job, record_transaction_statuses
+
+logger = logging.getLogger(__name__)
+
+
+class IPNPipeline:
+    """Pesapal IPN intake: notifications are recorded and acknowledged at once, and reconciled by
+    a pool of worker threads.
+
+    A notification is stored in payment_notification with payment_status '' until reconciled, and
+    an order has at most one such row, so repeats that arrive meanwhile only bump its
+    received_count; one that lands while a worker is on the row sends it round again, since the
+    worker may have fetched the status before it. A worker asks Pesapal for the transaction status and moves the row to it;
+    (order_tracking_id, payment_status) is unique, so if that status already has a row the
+    notification was a repeat and is merged into it, otherwise the status is applied to the job
+    in the same transaction. Failed lookups are retried with exponential backoff.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.workers = 4
+        self.batch_size = 10
+        self.poll_interval = 5
+        self.max_attempts = 8
+        self.backoff_base = 15
+        self.backoff_max = 1800
+        self.lease = 120
+        self.received = 0
+        self.collapsed = 0
+        self.applied = 0
+        self.repeats = 0
+        self.failed_attempts = 0
+        self._wake = Event()
+        self._claim_lock = Lock()
+        self._started = False
+
+    def init_app(self, app):
+        self.enabled = app.config.get('IPN_QUEUE_ENABLED', self.enabled)
+        self.workers = app.config.get('IPN_QUEUE_WORKERS', self.workers)
+        self.batch_size = app.config.get('IPN_QUEUE_BATCH_SIZE', self.batch_size)
+        self.poll_interval = app.config.get('IPN_QUEUE_POLL_INTERVAL', self.poll_interval)
+        self.max_attempts = app.config.get('IPN_QUEUE_MAX_ATTEMPTS', self.max_attempts)
+        self.backoff_base = app.config.get('IPN_QUEUE_BACKOFF_BASE', self.backoff_base)
+        self.backoff_max = app.config.get('IPN_QUEUE_BACKOFF_MAX', self.backoff_max)
+        self.lease = app.config.get('IPN_QUEUE_LEASE', self.lease)
+
+    def start(self, app):
+        """Start the workers; called by app.start_workers() in processes that serve."""
+        if not self.enabled or self._started:
+            return
+        self._started = True
+        for _ in range(self.workers):
+            Thread(target=self._run, args=(app,), daemon=True).start()
+        logger.info(f"Started {self.workers} IPN workers")
+
+    def receive(self, order_tracking_id, merchant_reference, notification_type):
+        """Record a notification and commit. Returns False if it was folded into one already waiting."""
+        self.received += 1
+        now = datetime.utcnow()
+        waiting = (PaymentNotification.order_tracking_id == order_tracking_id) & (PaymentNotification.payment_status == '')
+        # A notification for an order given up on starts it over
+        bump = update(PaymentNotification).where(waiting).values(
+            received_count=PaymentNotification.received_count + 1,
+            last_received_at=now,
+            attempts=case((PaymentNotification.state == 'failed', 0), else_=PaymentNotification.attempts),
+            next_attempt_at=case((PaymentNotification.state == 'failed', now), else_=PaymentNotification.next_attempt_at),
+            state=case((PaymentNotification.state == 'failed', 'pending'), else_=PaymentNotification.state)
+        ).execution_options(synchronize_session=False)
+
+        for _ in range(2):
+            if db.session.execute(bump).rowcount:
+                db.session.commit()
+                self.collapsed += 1
+                logger.info(f"IPN for {order_tracking_id} folded into the notification already waiting")
+                return False
+            try:
+                db.session.add(PaymentNotification(
+                    order_tracking_id=order_tracking_id,
+                    merchant_reference=merchant_reference,
+                    notification_type=notification_type,
+                    first_received_at=now,
+                    last_received_at=now,
+                    next_attempt_at=now
+                ))
+                db.session.commit()
+                break
+            except IntegrityError:
+                db.session.rollback()  # a concurrent request recorded it first
+
+        if self.enabled:
+            self._wake.set()
+        else:
+            self.process_batch()
+        return True
+
+    def process_batch(self):
+        """Claim and reconcile one batch of waiting notifications. Returns the number claimed."""
+        batch = self._claim()
+        for notification_id, lease in batch:
+            notification = db.session.get(PaymentNotification, notification_id)
+            try:
+                self._reconcile(notification, lease)
+            except Exception as e:
+                logger.error(f"Reconciling IPN {notification_id} failed: {str(e)}", exc_info=True)
+                db.session.rollback()
+                self._failed(db.session.get(PaymentNotification, notification_id), e)
+        return len(batch)
+
+    def stats(self):
+        counts = dict(db.session.query(PaymentNotification.state, func.count(PaymentNotification.id)).group_by(PaymentNotification.state).all())
+        return {
+            'enabled': self.enabled,
+            'workers': self.workers if self._started else 0,
+            'received': self.received,
+            'collapsed': self.collapsed,
+            'applied': self.applied,
+            'repeats': self.repeats,
+            'failed_attempts': self.failed_attempts,
+            'by_state': counts
+        }
+
+    def _claim(self):
+        with self._claim_lock:
+            now = datetime.utcnow()
+            lease = now + timedelta(seconds=self.lease)
+            # 'processing' rows whose lease ran out were claimed by a worker that died mid-batch
+            batch = PaymentNotification.query.filter(
+                PaymentNotification.state.in_(('pending', 'processing')),
+                PaymentNotification.next_attempt_at <= now
+            ).order_by(PaymentNotification.next_attempt_at, PaymentNotification.id).limit(self.batch_size).with_for_update(skip_locked=True).all()
+            claimed = []
+            for notification in batch:
+                notification.state = 'processing'
+                notification.next_attempt_at = lease
+                claimed.append((notification.id, lease))
+            db.session.commit()
+            return claimed
+
+    def _reconcile(self, notification, lease):
+        if notification is None or notification.state != 'processing' or notification.next_attempt_at != lease:
+            return  # merged or reclaimed meanwhile
+        order_tracking_id = notification.order_tracking_id
+        seen = notification.received_count  # read before the status is fetched
+        unchanged = ((PaymentNotification.id == notification.id) & (PaymentNotification.state == 'processing') &
+                     (PaymentNotification.next_attempt_at == lease) & (PaymentNotification.received_count == seen))
+
+        job = find_job(order_tracking_id, notification.merchant_reference)
+        if not job:
+            # Also the case when the IPN beats the commit of the order that created it
+            return self._failed(notification, f"Job not found for MerchantReference: {notification.merchant_reference}")
+        try:
+            status_data = fetch_transaction_status(order_tracking_id)
+        except requests.RequestException as e:
+            return self._failed(notification, f"{str(e)} - Response: {getattr(e.response, 'text', 'No response')}")
+        if status_data is None:
+            return self._failed(notification, 'Failed to authenticate with Pesapal')
+        payment_status = (status_data.get('payment_status_description') or 'Unknown')[:50]
+        record_transaction_statuses([(job.id, order_tracking_id, status_data)])
+
+        applied = PaymentNotification.query.filter_by(order_tracking_id=order_tracking_id, payment_status=payment_status).first()
+        if applied:
+            if not db.session.execute(delete(PaymentNotification).where(unchanged).execution_options(synchronize_session=False)).rowcount:
+                db.session.rollback()
+                return self._requeue(notification.id, lease)
+            applied.received_count += seen
+            applied.last_received_at = max(applied.last_received_at, notification.last_received_at)
+            db.session.commit()
+            self.repeats += 1
+            logger.info(f"IPN for {order_tracking_id} repeats status {payment_status}; nothing to apply")
+            return
+
+        # Conditional on the lease, so a worker whose lease ran out can't apply it a second time, and
+        # on no notification having landed since the fetch
+        try:
+            moved = db.session.execute(update(PaymentNotification).where(unchanged).values(
+                payment_status=payment_status,
+                state='done',
+                job_id=job.id,
+                processed_at=datetime.utcnow(),
+                last_error=None
+            ).execution_options(synchronize_session=False)).rowcount
+        except IntegrityError:
+            db.session.rollback()  # applied by a concurrent worker; the row is merged on its next pass
+            return self._failed(db.session.get(PaymentNotification, notification.id), f"Status {payment_status} applied concurrently")
+        if not moved:
+            db.session.rollback()
+            return self._requeue(notification.id, lease)
+        apply_transaction_status(job, order_tracking_id, status_data)
+        self.applied += 1
+        logger.info(f"IPN for {order_tracking_id} applied status {payment_status} to job {job.id}")
+
+    def _requeue(self, notification_id, lease):
+        # A newer notification landed while this one was processed: fetch the status again, no attempt counted
+        requeued = db.session.execute(update(PaymentNotification).where(
+            PaymentNotification.id == notification_id,
+            PaymentNotification.state == 'processing',
+            PaymentNotification.next_attempt_at == lease
+        ).values(state='pending', next_attempt_at=datetime.utcnow()).execution_options(synchronize_session=False)).rowcount
+        db.session.commit()
+        if requeued:
+            logger.info(f"IPN {notification_id} received again while processed, requeued")
+            self._wake.set()
+
+    def _failed(self, notification, error):
+        if notification is None:
+            return
+        self.failed_attempts += 1
+        notification.attempts += 1
+        notification.last_error = str(error)[:1000]
+        if notification.attempts >= self.max_attempts:
+            notification.state = 'failed'
+            logger.error(f"Giving up on IPN for {notification.order_tracking_id} after {notification.attempts} attempts: {str(error)}")
+        else:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (notification.attempts - 1))
+            notification.state = 'pending'
+            notification.next_attempt_at = datetime.utcnow() + timedelta(seconds=random.uniform(delay / 2, delay))
+            logger.warning(f"IPN for {notification.order_tracking_id} attempt {notification.attempts} failed, retrying in ~{delay}s: {str(error)}")
+        db.session.commit()
+
+    def _run(self, app):
+        while True:
+            claimed = 0
+            try:
+                with app.app_context():
+                    claimed = self.process_batch()
+            except Exception as e:
+                logger.error(f"IPN worker failed: {str(e)}")
+            finally:
+                with app.app_context():
+                    db.session.remove()
+            if claimed < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+
+ipn_pipeline = IPNPipeline()
@@ -0,0 +1,187 @@
+from flask_mail import Message
+from datetime import datetime, timedelta
+from email.utils import formataddr
+from threading import Event, Lock, Thread
+from sqlalchemy import func
+import logging
+import random
+from extensions import db, mail
+from models import OutboundEmail
+from server.services.scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class MailQueue:
+    """Durable outbound mail queue backed by the outbound_email table.
+
+    Requests only insert a row; a small pool of worker threads claims due rows in batches, sends
+    each batch over one SMTP connection and reschedules failures with exponential backoff. Rows
+    that run out of attempts are kept with status 'dead' for the admin dead-letter view.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.workers = 2
+        self.batch_size = 20
+        self.poll_interval = 5
+        self.max_attempts = 6
+        self.backoff_base = 30
+        self.backoff_max = 3600
+        self.lease = 300
+        self.retention_days = 7
+        self.sent_count = 0
+        self.failed_count = 0
+        self._wake = Event()
+        self._claim_lock = Lock()
+        self._started = False
+
+    def init_app(self, app):
+        self.enabled = app.config.get('MAIL_QUEUE_ENABLED', self.enabled)
+        self.workers = app.config.get('MAIL_QUEUE_WORKERS', self.workers)
+        self.batch_size = app.config.get('MAIL_QUEUE_BATCH_SIZE', self.batch_size)
+        self.poll_interval = app.config.get('MAIL_QUEUE_POLL_INTERVAL', self.poll_interval)
+        self.max_attempts = app.config.get('MAIL_QUEUE_MAX_ATTEMPTS', self.max_attempts)
+        self.backoff_base = app.config.get('MAIL_QUEUE_BACKOFF_BASE', self.backoff_base)
+        self.backoff_max = app.config.get('MAIL_QUEUE_BACKOFF_MAX', self.backoff_max)
+        self.lease = app.config.get('MAIL_QUEUE_LEASE', self.lease)
+        self.retention_days = app.config.get('MAIL_QUEUE_RETENTION_DAYS', self.retention_days)
+        scheduler.add('mail_queue_purge', self.purge_sent, '15 * * * *')
+
+    def start(self, app):
+        """Start the workers; called by app.start_workers() in processes that serve."""
+        if not self.enabled or self._started:
+            return
+        self._started = True
+        for _ in range(self.workers):
+            Thread(target=self._run, args=(app,), daemon=True).start()
+        logger.info(f"Started {self.workers} mail queue workers")
+
+    def enqueue(self, msg):
+        """Store a flask_mail Message for background delivery and commit it."""
+        if not self.enabled:
+            mail.send(msg)
+            return None
+
+        sender = msg.sender
+        if isinstance(sender, tuple):
+            sender = formataddr(sender)
+        email = OutboundEmail(
+            subject=msg.subject,
+            sender=sender,
+            recipients=list(msg.recipients),
+            body=msg.body,
+            html=msg.html,
+            next_attempt_at=datetime.utcnow()
+        )
+        db.session.add(email)
+        db.session.commit()
+        self._wake.set()
+        return email
+
+    def process_batch(self):
+        """Claim and send one batch of due messages. Returns the number claimed."""
+        batch = self._claim()
+        if not batch:
+            return 0
+
+        try:
+            with mail.connect() as conn:
+                for email in batch:
+                    try:
+                        conn.send(Message(
+                            subject=email.subject,
+                            sender=email.sender,
+                            recipients=email.recipients,
+                            body=email.body,
+                            html=email.html
+                        ))
+                    except Exception as e:
+                        self._failed(email, e)
+                    else:
+                        email.status = 'sent'
+                        email.sent_at = datetime.utcnow()
+                        email.last_error = None
+                        self.sent_count += 1
+        except Exception as e:
+            # Connecting (or the final QUIT) failed; anything not yet sent goes back on the queue
+            for email in batch:
+                if email.status == 'sending':
+                    self._failed(email, e)
+        db.session.commit()
+        return len(batch)
+
+    def dead_letters(self, limit=100):
+        return OutboundEmail.query.filter_by(status='dead').order_by(OutboundEmail.id.desc()).limit(limit).all()
+
+    def retry(self, email_id):
+        email = db.session.get(OutboundEmail, email_id)
+        if not email or email.status != 'dead':
+            return None
+        email.status = 'pending'
+        email.attempts = 0
+        email.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        self._wake.set()
+        return email
+
+    def stats(self):
+        counts = dict(db.session.query(OutboundEmail.status, func.count(OutboundEmail.id)).group_by(OutboundEmail.status).all())
+        return {
+            'enabled': self.enabled,
+            'workers': self.workers if self._started else 0,
+            'sent': self.sent_count,
+            'failed_attempts': self.failed_count,
+            'by_status': counts
+        }
+
+    def _claim(self):
+        with self._claim_lock:
+            now = datetime.utcnow()
+            # 'sending' rows whose lease ran out were claimed by a worker that died mid-batch
+            batch = OutboundEmail.query.filter(
+                OutboundEmail.status.in_(('pending', 'sending')),
+                OutboundEmail.next_attempt_at <= now
+            ).order_by(OutboundEmail.next_attempt_at, OutboundEmail.id).limit(self.batch_size).with_for_update(skip_locked=True).all()
+            for email in batch:
+                email.status = 'sending'
+                email.next_attempt_at = now + timedelta(seconds=self.lease)
+            db.session.commit()
+            return batch
+
+    def _failed(self, email, error):
+        self.failed_count += 1
+        email.attempts += 1
+        email.last_error = str(error)[:1000]
+        if email.attempts >= self.max_attempts:
+            email.status = 'dead'
+            logger.error(f"Giving up on email {email.id} to {email.recipients} after {email.attempts} attempts: {str(error)}")
+            return
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (email.attempts - 1))
+        email.status = 'pending'
+        email.next_attempt_at = datetime.utcnow() + timedelta(seconds=random.uniform(delay / 2, delay))
+        logger.warning(f"Email {email.id} attempt {email.attempts} failed, retrying in ~{delay}s: {str(error)}")
+
+    def purge_sent(self):
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        deleted = OutboundEmail.query.filter(OutboundEmail.status == 'sent', OutboundEmail.sent_at < cutoff).delete()
+        db.session.commit()
+        return {'deleted': deleted}
+
+    def _run(self, app):
+        while True:
+            claimed = 0
+            try:
+                with app.app_context():
+                    claimed = self.process_batch()
+            except Exception as e:
+                logger.error(f"Mail queue worker failed: {str(e)}")
+            finally:
+                with app.app_context():
+                    db.session.remove()
+            if claimed < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+
+mail_queue = MailQueue()
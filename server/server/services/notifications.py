@@ -0,0 +1,25 @@
+from flask_mail import Message
+from datetime import datetime
+import logging
+from server.services.mail_queue import mail_queue
+
+logger = logging.getLogger(__name__)
+
+
+def send_payment_email(to_email, admin_email, job, payment_type, status, amount, order_tracking_id=None):
+    subject = f"Payment {status} for Job #{job.id if job else 'N/A'}"
+    body = f"""
+    Job ID: {job.id if job else 'N/A'}
+    Title: {job.title if job else 'Untitled'}
+    Payment Type: {payment_type}
+    Amount: {amount} USD
+    Status: {status}
+    Order Tracking ID: {order_tracking_id or 'N/A'}
+    Date: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}
+    """
+    msg = Message(subject, recipients=[to_email, admin_email], body=body)
+    try:
+        mail_queue.enqueue(msg)
+        logger.info(f"Payment email queued for {to_email} and {admin_email}")
+    except Exception as e:
+        logger.error(f"Failed to queue payment email: {str(e)}")
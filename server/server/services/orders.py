@@ -0,0 +1,215 @@
+from flask import current_app
+from datetime import datetime, timezone
+import logging
+import requests
+from extensions import db
+from models import Job, IPNRegistration
+from server.services.http_client import http_client
+from server.services.notifications import send_payment_email
+from server.services.pesapal import get_pesapal_token, pesapal_url
+from server.services.uploads import upload_store
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'png', 'jpg', 'jpeg', 'zip'}
+
+RATES = {'highschool': 6, 'college': 9, 'bachelors': 12, 'masters': 15, 'phd': 18}
+
+UPFRONT_SHARE = 0.05
+
+REQUIRED_FIELDS = ['subject', 'title', 'pages', 'deadline', 'instructions', 'totalAmount']
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def parse_order(data):
+    """Validate order form data. Returns (order, None) or (None, (body, status))."""
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            logger.error(f"Missing required field in job order: {field}")
+            return None, ({'error': f'{field} is required'}, 400)
+
+    try:
+        deadline = datetime.fromisoformat(data['deadline'].replace('Z', '+00:00'))
+        if not deadline.tzinfo:
+            deadline = deadline.replace(tzinfo=timezone.utc)
+    except ValueError as ve:
+        logger.error(f"Invalid deadline format: {str(ve)}")
+        return None, ({'error': 'Invalid deadline format. Use ISO 8601 format', 'details': str(ve)}, 400)
+
+    current_time = datetime.now(timezone.utc)
+    if deadline < current_time:
+        return None, ({
+            'error': 'Deadline must be in the future',
+            'details': {
+                'deadline': deadline.isoformat(),
+                'current_time': current_time.isoformat()
+            }
+        }, 400)
+
+    try:
+        pages = int(data['pages'])
+        total_amount = float(data['totalAmount'])
+        cited_resources = int(data.get('citedResources', 0))
+        if pages <= 0 or total_amount <= 0:
+            raise ValueError
+    except ValueError:
+        logger.error("Invalid pages or totalAmount value")
+        return None, ({'error': 'Pages and totalAmount must be positive numbers'}, 400)
+
+    education_level = data.get('education_level', data.get('writerLevel', 'highschool')).lower()
+    calculated_total = pages * RATES.get(education_level, 6)
+    if abs(calculated_total - total_amount) > 0.01:
+        logger.error(f"Total amount mismatch: calculated={calculated_total}, provided={total_amount}")
+        return None, ({
+            'error': "Total amount doesn't match calculated amount",
+            'details': f"Calculated: ${calculated_total}, Provided: ${total_amount}"
+        }, 400)
+
+    return {
+        'subject': data['subject'],
+        'title': data['title'],
+        'pages': pages,
+        'deadline': deadline,
+        'instructions': data['instructions'],
+        'cited_resources': cited_resources,
+        'formatting_style': data.get('formattingStyle', 'APA'),
+        'writer_level': data.get('writerLevel', 'PHD'),
+        'spacing': data.get('spacing', 'double'),
+        'total_amount': total_amount,
+        'phone_number': data.get('phone_number', ''),
+        'country_code': data.get('country_code', 'KE')
+    }, None
+
+
+def save_order_files(job, user, files, uploads=()):
+    # Each upload is hashed as it streams in and stored once, however many orders resend it
+    stored = [
+        upload_store.store(file, f"job_{job.id}", 'initial', 'job', job=job, user=user)
+        for file in files if file and file.filename and allowed_file(file.filename)
+    ]
+    return stored + [upload_store.attach(upload, f"job_{job.id}", 'initial', 'job', job=job, user=user) for upload in uploads]
+
+
+def discard_order(body, status):
+    # Rolling back also removes the files stored for the order
+    db.session.rollback()
+    return body, status
+
+
+def create_job_order(user, data, files, upload_ids=()):
+    """Create a job awaiting its upfront payment and open the Pesapal order for it.
+
+    Used by both POST /api/jobs and POST /api/payments/initiate-upfront. upload_ids name completed
+    chunked uploads to attach alongside the multipart files. Returns (body, status); on failure
+    nothing is committed and any stored files are removed.
+    """
+    order, error = parse_order(data)
+    if error:
+        return error
+    uploads = upload_store.completed_uploads(user, upload_ids)
+    if uploads is None:
+        return {'error': 'Upload not found or not complete'}, 400
+
+    initial_amount = order['total_amount'] * UPFRONT_SHARE
+    try:
+        # Create job with Pending Payment status - DO NOT COMMIT YET
+        job = Job(
+            user_id=user.id,
+            client_name=user.name,
+            client_email=user.email,
+            subject=order['subject'],
+            title=order['title'],
+            pages=order['pages'],
+            deadline=order['deadline'],
+            instructions=order['instructions'],
+            cited_resources=order['cited_resources'],
+            formatting_style=order['formatting_style'],
+            writer_level=order['writer_level'],
+            spacing=order['spacing'],
+            total_amount=order['total_amount'],
+            status='Pending Payment',
+            payment_status='Pending'
+        )
+        db.session.add(job)
+        db.session.flush()  # Get the ID but don't commit
+
+        token = get_pesapal_token()
+        if not token:
+            logger.error("Failed to authenticate with Pesapal")
+            return discard_order({'error': 'Failed to authenticate with Pesapal'}, 500)
+
+        ipn_registration = IPNRegistration.query.filter_by(ipn_status='Active').first()
+        if not ipn_registration:
+            logger.error("No active IPN registration found")
+            return discard_order({'error': 'IPN not registered. Contact admin.'}, 500)
+
+        headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {token}'
+        }
+
+        merchant_reference = f"JOB-{job.id}-{int(datetime.utcnow().timestamp())}"
+
+        payload = {
+            'id': merchant_reference,
+            'currency': 'USD',
+            'amount': initial_amount,
+            'description': f"25% payment for job: {order['title']}",
+            'callback_url': f"{current_app.config['FRONTEND_URL']}/payment-callback?job_id={job.id}",
+            'notification_id': ipn_registration.ipn_id,
+            'billing_address': {
+                'email_address': user.email,
+                'phone_number': order['phone_number'],
+                'country_code': order['country_code'],
+                'first_name': user.name.split()[0] if user.name else '',
+                'last_name': user.name.split()[-1] if user.name else ''
+            }
+        }
+
+        logger.info(f"Submitting Pesapal payload: {payload}")
+        response = http_client.post(
+            pesapal_url('submit_order'),
+            json=payload,
+            headers=headers,
+            endpoint='pesapal.submit_order'
+        )
+        logger.info(f"Pesapal response status: {response.status_code}, text: {response.text}")
+        response.raise_for_status()
+        payment_data = response.json()
+
+        if payment_data.get('error'):
+            error_msg = payment_data['error'].get('message', 'Payment initiation failed')
+            logger.error(f"Pesapal error: {error_msg}")
+            return discard_order({'error': error_msg}, 400)
+
+        if 'redirect_url' not in payment_data:
+            logger.error(f"Invalid response from Pesapal: {payment_data}")
+            return discard_order({'error': 'Invalid response from payment gateway'}, 500)
+
+        # Only now, so the stored_blob rows these lock aren't held across the Pesapal calls. If it
+        # fails, the client never gets the redirect and the Pesapal order stays unpaid
+        save_order_files(job, user, files, uploads)
+        job.order_tracking_id = payment_data.get('order_tracking_id')
+        job.merchant_reference = merchant_reference
+        db.session.commit()
+
+        send_payment_email(user.email, current_app.config['PESAPAL_ADMIN_EMAIL'], job, 'Upfront', 'Pending', initial_amount, payment_data.get('order_tracking_id'))
+
+        return {
+            'redirect_url': payment_data['redirect_url'],
+            'order_tracking_id': payment_data.get('order_tracking_id'),
+            'job_id': job.id
+        }, 200
+
+    except requests.RequestException as e:
+        logger.error(f"Failed to initiate payment: {str(e)} - Response: {getattr(e.response, 'text', 'No response')}")
+        result = discard_order({'error': 'Failed to initiate payment', 'details': str(e)}, 500)
+        send_payment_email(user.email, current_app.config['PESAPAL_ADMIN_EMAIL'], None, 'Upfront', 'Failed', initial_amount)
+        return result
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+        return discard_order({'error': 'Internal server error'}, 500)
@@ -0,0 +1,280 @@
+from flask import current_app
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Event, Lock
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+import logging
+import time
+from extensions import db
+from models import Job, PaymentTransaction
+from server.services.http_client import http_client
+from server.services.notifications import send_payment_email
+from server.services.pesapal import get_pesapal_token, pesapal_url
+from server.services.realtime import emit_to_job_id
+from server.services.uploads import upload_store
+
+logger = logging.getLogger(__name__)
+
+# Statuses an order doesn't move on from; anything else may still change
+FINAL_STATUSES = ('Completed', 'Failed', 'Reversed')
+
+
+def find_job(order_tracking_id, merchant_reference=None):
+    """The job a Pesapal order belongs to, by merchant reference (JOB-<id>-...) or tracking id.
+
+    Every lookup is a primary key or single-column index probe; an OR across the tracking id
+    columns is left to a full scan by some planners.
+    """
+    job = None
+    if merchant_reference and merchant_reference.startswith('JOB-'):
+        try:
+            job = db.session.get(Job, int(merchant_reference.split('-')[1]))
+        except (ValueError, IndexError):
+            logger.error(f"Invalid merchant reference format: {merchant_reference}")
+            job = (Job.query.filter_by(merchant_reference=merchant_reference).first() or
+                   Job.query.filter_by(completion_reference=merchant_reference).first())
+    if not job and order_tracking_id:
+        job = (Job.query.filter_by(order_tracking_id=order_tracking_id).first() or
+               Job.query.filter_by(completion_tracking_id=order_tracking_id).first())
+    return job
+
+
+def fetch_transaction_status(order_tracking_id):
+    """GetTransactionStatus for an order. None if Pesapal auth failed; raises requests.RequestException."""
+    token = get_pesapal_token()
+    if not token:
+        logger.error("Failed to authenticate with Pesapal for transaction status")
+        return None
+    response = http_client.get(
+        pesapal_url('get_transaction_status'),
+        params={'orderTrackingId': order_tracking_id},
+        headers={'Accept': 'application/json', 'Authorization': f'Bearer {token}'},
+        endpoint='pesapal.get_transaction_status'
+    )
+    logger.info(f"Transaction status response status: {response.status_code}, text: {response.text}")
+    response.raise_for_status()
+    return response.json()
+
+
+def stage_transaction_status(job, order_tracking_id, status_data):
+    """Move a job along for a Pesapal transaction status, in the session without committing.
+
+    Completed upfront payments put a pending job in progress, completed completion payments
+    finish it, and a failed or invalid upfront payment deletes the unpaid job and its files.
+    Returns the send_payment_email() arguments for the change, to send once it is committed, or None.
+    """
+    payment_status = status_data.get('payment_status_description')
+    amount = status_data.get('amount', 0)
+    payment_type = 'completion' if order_tracking_id == job.completion_tracking_id else 'upfront'
+    admin_email = current_app.config['PESAPAL_ADMIN_EMAIL']
+
+    if payment_status == 'Completed':
+        if payment_type == 'upfront' and job.payment_status == 'Pending':
+            job.payment_status = 'Partial'
+            job.status = 'In Progress'
+            job.order_tracking_id = order_tracking_id
+            logger.info(f"25% payment completed for job {job.id}")
+        elif payment_type == 'completion' and job.payment_status == 'Partial':
+            job.payment_status = 'Completed'
+            logger.info(f"75% payment completed for job {job.id}")
+        return (job.client_email, admin_email, job, 'Upfront' if payment_type == 'upfront' else 'Completion',
+                'Success', amount, order_tracking_id)
+
+    if payment_status in ['Failed', 'Invalid']:
+        amount = job.total_amount * (0.01 if payment_type == 'completion' else 0.05)
+        # For upfront failures, delete the job and clean up files (unless it has been paid meanwhile)
+        if payment_type == 'upfront' and job.payment_status == 'Pending':
+            # Release its files; they are removed from disk once the delete commits
+            for stored_file in list(job.stored_files):
+                upload_store.release(stored_file)
+            db.session.delete(job)
+            logger.info(f"Deleted job {job.id} due to failed upfront payment")
+        return (job.client_email, admin_email, job, 'Completion' if payment_type == 'completion' else 'Upfront',
+                'Failed', amount, order_tracking_id)
+    return None
+
+
+def apply_transaction_status(job, order_tracking_id, status_data):
+    """stage_transaction_status(), committed, then the payment email sent.
+
+    Callers make sure each (order, status) is applied only once.
+    """
+    email = stage_transaction_status(job, order_tracking_id, status_data)
+    db.session.commit()
+    if email:
+        send_payment_email(*email)
+    return status_data.get('payment_status_description')
+
+
+def status_summary(status_data):
+    return {
+        'payment_status': status_data.get('payment_status_description'),
+        'confirmation_code': status_data.get('confirmation_code'),
+        'amount': status_data.get('amount'),
+        'currency': status_data.get('currency')
+    }
+
+
+def record_transaction_statuses(results, now=None):
+    """Upsert (job_id, order_tracking_id, status_data) answers into payment_transaction, in one
+    statement. Doesn't commit; orders whose status changed are pushed to the job's sockets as
+    'payment_status' on /jobs once the session commits."""
+    if not results:
+        return
+    now = now or datetime.utcnow()
+    rows = {}
+    for job_id, order_tracking_id, data in results:
+        rows[order_tracking_id] = {
+            'order_tracking_id': order_tracking_id,
+            'job_id': job_id,
+            'payment_status': (data.get('payment_status_description') or '')[:50] or None,
+            'status_code': data.get('status_code'),
+            'amount': data.get('amount'),
+            'currency': (data.get('currency') or '')[:10] or None,
+            'confirmation_code': (data.get('confirmation_code') or '')[:100] or None,
+            'data': data,
+            'checked_at': now
+        }
+
+    previous = dict(db.session.query(PaymentTransaction.order_tracking_id, PaymentTransaction.payment_status).filter(
+        PaymentTransaction.order_tracking_id.in_(list(rows))).all())
+    changed = [row for order_tracking_id, row in rows.items() if row['payment_status'] != previous.get(order_tracking_id)]
+    if changed:
+        owners = dict(db.session.query(Job.id, Job.user_id).filter(Job.id.in_({row['job_id'] for row in changed})).all())
+        db.session.info.setdefault('payment_status_changes', []).extend((owners.get(row['job_id']), row) for row in changed)
+
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(PaymentTransaction.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=['order_tracking_id'],
+        set_={column: statement.excluded[column] for column in
+              ('job_id', 'payment_status', 'status_code', 'amount', 'currency', 'confirmation_code', 'data', 'checked_at')}
+    )
+    db.session.execute(statement, list(rows.values()))
+
+
+def cached_transaction_status(order_tracking_id, max_age):
+    """The recorded status_data for an order, if final or checked within max_age seconds, else None."""
+    row = db.session.get(PaymentTransaction, order_tracking_id, populate_existing=True)
+    if row is None:
+        return None
+    if row.payment_status in FINAL_STATUSES or row.checked_at >= datetime.utcnow() - timedelta(seconds=max_age):
+        return row.data
+    return None
+
+
+class _Flight:
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class PaymentStatusCache:
+    """Transaction statuses for the status polling endpoint, by order_tracking_id.
+
+    A poll is answered from memory for `ttl` seconds (`final_ttl` once the status is final), then
+    from payment_transaction while it is younger than PAYMENT_STATUS_MAX_AGE, and only then from
+    Pesapal. Polls for an order that is already being looked up wait for that lookup and share its
+    answer, however many tabs are polling. Status changes recorded by this process are put here as
+    they commit.
+    """
+
+    def __init__(self, ttl=5, final_ttl=300, max_size=1024, max_age=30):
+        self.ttl = ttl
+        self.final_ttl = final_ttl
+        self.max_size = max_size
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('PAYMENT_STATUS_CACHE_TTL', self.ttl)
+        self.final_ttl = app.config.get('PAYMENT_STATUS_CACHE_FINAL_TTL', self.final_ttl)
+        self.max_size = app.config.get('PAYMENT_STATUS_CACHE_MAX_SIZE', self.max_size)
+        self.max_age = app.config.get('PAYMENT_STATUS_MAX_AGE', self.max_age)
+
+    def get(self, job, order_tracking_id):
+        """status_data for one of job's orders; None if Pesapal auth failed. Raises requests.RequestException."""
+        with self._lock:
+            entry = self._entries.get(order_tracking_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(order_tracking_id)
+                self.hits += 1
+                return entry[0]
+            flight = self._flights.get(order_tracking_id)
+            leader = flight is None
+            if leader:
+                flight = self._flights[order_tracking_id] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()  # bounded by the HTTP client's timeouts
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._load(job, order_tracking_id)
+            if flight.result is not None:
+                self.put(order_tracking_id, flight.result)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(order_tracking_id, None)
+            flight.done.set()
+
+    def put(self, order_tracking_id, status_data):
+        ttl = self.final_ttl if status_data.get('payment_status_description') in FINAL_STATUSES else self.ttl
+        with self._lock:
+            self._entries[order_tracking_id] = (status_data, time.monotonic() + ttl)
+            self._entries.move_to_end(order_tracking_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {'size': len(self._entries), 'in_flight': len(self._flights), 'hits': self.hits,
+                'misses': self.misses, 'coalesced': self.coalesced}
+
+    def _load(self, job, order_tracking_id):
+        status_data = cached_transaction_status(order_tracking_id, self.max_age)
+        if status_data is None:
+            status_data = fetch_transaction_status(order_tracking_id)
+            if status_data is None:
+                return None
+            record_transaction_statuses([(job.id, order_tracking_id, status_data)])
+            db.session.commit()
+        return status_data
+
+
+payment_status_cache = PaymentStatusCache()
+
+
+@event.listens_for(Session, 'after_commit')
+def _push_status_changes(session):
+    for user_id, row in session.info.pop('payment_status_changes', []):
+        payment_status_cache.put(row['order_tracking_id'], row['data'])
+        try:
+            emit_to_job_id('payment_status', {
+                'job_id': row['job_id'],
+                'order_tracking_id': row['order_tracking_id'],
+                **status_summary(row['data'])
+            }, row['job_id'], user_id, '/jobs')
+        except Exception as e:
+            logger.error(f"Failed to push payment status for {row['order_tracking_id']}: {str(e)}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_status_changes(session):
+    session.info.pop('payment_status_changes', None)
@@ -0,0 +1,148 @@
+from flask import current_app
+from datetime import datetime, timezone
+from threading import Lock, Thread
+import logging
+import re
+import requests
+import time
+from server.services.http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+PESAPAL_URLS = {
+    'sandbox': {
+        'auth': 'https://cybqa.pesapal.com/pesapalv3/api/Auth/RequestToken',
+        'register_ipn': 'https://cybqa.pesapal.com/pesapalv3/api/URLSetup/RegisterIPN',
+        'submit_order': 'https://cybqa.pesapal.com/pesapalv3/api/Transactions/SubmitOrderRequest',
+        'get_transaction_status': 'https://cybqa.pesapal.com/pesapalv3/api/Transactions/GetTransactionStatus'
+    },
+    'live': {
+        'auth': 'https://pay.pesapal.com/v3/api/Auth/RequestToken',
+        'register_ipn': 'https://pay.pesapal.com/v3/api/URLSetup/RegisterIPN',
+        'submit_order': 'https://pay.pesapal.com/v3/api/Transactions/SubmitOrderRequest',
+        'get_transaction_status': 'https://pay.pesapal.com/v3/api/Transactions/GetTransactionStatus'
+    }
+}
+
+# Relative paths used when PESAPAL_BASE_URL points at a stub or proxy
+PESAPAL_PATHS = {
+    'auth': 'api/Auth/RequestToken',
+    'register_ipn': 'api/URLSetup/RegisterIPN',
+    'submit_order': 'api/Transactions/SubmitOrderRequest',
+    'get_transaction_status': 'api/Transactions/GetTransactionStatus'
+}
+
+# Pesapal tokens are valid for 5 minutes; used when the response has no parseable expiryDate
+DEFAULT_TOKEN_LIFETIME = 5 * 60
+
+
+def pesapal_url(name, app=None):
+    config = (app or current_app).config
+    base_url = config.get('PESAPAL_BASE_URL')
+    if base_url:
+        return f"{base_url.rstrip('/')}/{PESAPAL_PATHS[name]}"
+    return PESAPAL_URLS[config['PESAPAL_ENVIRONMENT']][name]
+
+
+def parse_expiry(value):
+    # Pesapal returns e.g. "2021-08-26T12:29:30.5177702Z" (7 fractional digits, UTC)
+    if not value:
+        return None
+    match = re.match(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})', value)
+    if not match:
+        return None
+    return datetime.fromisoformat(match.group(1)).replace(tzinfo=timezone.utc).timestamp()
+
+
+class PesapalTokenCache:
+    """Process-wide Pesapal OAuth token.
+
+    Callers get the cached token until it is close to expiry. Inside the refresh window the
+    token is still served while one background thread fetches a new one; once it has expired,
+    callers block on a single shared fetch instead of each hitting the auth endpoint.
+    """
+
+    def __init__(self):
+        self._token = None
+        self._expires_at = 0
+        self._lock = Lock()
+        self._refreshing = False
+        self.fetch_count = 0
+
+    def get_token(self, app=None):
+        app = app or current_app._get_current_object()
+        margin = app.config.get('PESAPAL_TOKEN_REFRESH_MARGIN', 60)
+        now = time.time()
+
+        token, expires_at = self._token, self._expires_at
+        if token and now < expires_at:
+            if now >= expires_at - margin:
+                self._refresh_in_background(app)
+            return token
+
+        with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            if self._token and time.time() < self._expires_at:
+                return self._token
+            return self._fetch(app)
+
+    def invalidate(self):
+        with self._lock:
+            self._token = None
+            self._expires_at = 0
+
+    def _refresh_in_background(self, app):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        Thread(target=self._background_refresh, args=(app,), daemon=True).start()
+
+    def _background_refresh(self, app):
+        try:
+            with self._lock:
+                self._fetch(app)
+        finally:
+            self._refreshing = False
+
+    def _fetch(self, app):
+        # Must be called with self._lock held
+        consumer_key = app.config.get('PESAPAL_CONSUMER_KEY') or 'not_set'
+        consumer_secret = app.config.get('PESAPAL_CONSUMER_SECRET') or 'not_set'
+        logger.info(f"Attempting authentication with consumer_key: {consumer_key[:5]}...")
+        headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        }
+        payload = {
+            'consumer_key': consumer_key,
+            'consumer_secret': consumer_secret
+        }
+        try:
+            self.fetch_count += 1
+            response = http_client.post(pesapal_url('auth', app), json=payload, headers=headers, endpoint='pesapal.auth', retries=2)
+            logger.info(f"Auth response status: {response.status_code}")
+            response.raise_for_status()
+            data = response.json()
+        except requests.RequestException as e:
+            logger.error(f"Pesapal authentication failed: {str(e)} - Response: {getattr(e.response, 'text', 'No response')}")
+            return None
+        if not data.get('token'):
+            logger.error(f"No token in response: {data}")
+            return None
+        # Never trust an expiry beyond the documented lifetime (guards against clock skew)
+        expires_at = min(
+            parse_expiry(data.get('expiryDate')) or float('inf'),
+            time.time() + DEFAULT_TOKEN_LIFETIME
+        )
+        self._token = data['token']
+        self._expires_at = expires_at
+        logger.info(f"Pesapal token refreshed, expires in {int(expires_at - time.time())}s")
+        return self._token
+
+
+pesapal_token_cache = PesapalTokenCache()
+
+
+def get_pesapal_token():
+    return pesapal_token_cache.get_token()
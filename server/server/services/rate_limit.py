@@ -0,0 +1,267 @@
+from flask import Blueprint, request, jsonify, g, current_app
+from threading import Lock
+from sqlalchemy import case, update, insert, select, delete
+from sqlalchemy.exc import IntegrityError
+import fcntl
+import hashlib
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import time
+from extensions import db
+from models import RateLimitBucket
+from server.services.scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+UNITS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+BUDGET_SPEC = re.compile(r'^\s*(\d+)\s*/\s*(second|minute|hour|day)\s*(?:burst\s+(\d+))?\s*$')
+
+SLOT = struct.Struct('<Qddd')  # key hash, tokens, last update, time the bucket is full again
+HEADER = struct.Struct('<4sI')
+MAGIC = b'RLB1'
+PROBE = 8  # slots tried per key before evicting
+
+
+def parse_budget(spec):
+    """'<n>/<second|minute|hour|day>[ burst <m>]' -> (capacity, tokens per second)."""
+    match = BUDGET_SPEC.match(spec)
+    if not match:
+        raise ValueError(f"Invalid rate limit budget: {spec!r}")
+    count, unit, burst = match.groups()
+    return int(burst or count), int(count) / UNITS[unit]
+
+
+class SlotTable:
+    """Token buckets in a fixed table of slots, optionally in a file shared between processes.
+
+    Keys are hashed to a slot and probed linearly over a few neighbours; a slot whose bucket has
+    refilled completely is as good as empty and is reused, and if every probed slot is busy the
+    least recently used one is taken (the table is undersized, and that key starts out full).
+    Shared tables hold an flock for the few microseconds a check takes.
+    """
+
+    def __init__(self, slots, path=None):
+        self.slots = slots
+        self.path = path
+        self.size = HEADER.size + slots * SLOT.size
+        self._lock = Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    def _open(self):
+        # Reopened after a fork: an inherited descriptor would share its flock with the parent
+        if self._pid == os.getpid():
+            return
+        if self.path is None:
+            self._map = mmap.mmap(-1, self.size)
+            HEADER.pack_into(self._map, 0, MAGIC, self.slots)
+        else:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size != self.size or os.pread(fd, HEADER.size, 0) != HEADER.pack(MAGIC, self.slots):
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, self.size)
+                    os.pwrite(fd, HEADER.pack(MAGIC, self.slots), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._fd = fd
+            self._map = mmap.mmap(fd, self.size)
+        self._pid = os.getpid()
+
+    def take(self, key, capacity, rate, cost, now):
+        """Spend cost tokens from key's bucket. Returns (allowed, tokens left, seconds until allowed)."""
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+        with self._lock:
+            self._open()
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                table = self._map
+                base = digest % self.slots
+                found = free = oldest = None
+                for i in range(PROBE):
+                    offset = HEADER.size + ((base + i) % self.slots) * SLOT.size
+                    slot_key, tokens, updated, full_at = SLOT.unpack_from(table, offset)
+                    if slot_key == digest:
+                        found = offset
+                        break
+                    if free is None and (slot_key == 0 or full_at <= now):
+                        free = offset
+                    if oldest is None or updated < oldest[1]:
+                        oldest = (offset, updated)
+
+                if found is not None:
+                    tokens = min(capacity, tokens + (now - updated) * rate)
+                    offset = found
+                else:
+                    tokens = capacity
+                    offset = free if free is not None else oldest[0]
+
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                SLOT.pack_into(table, offset, digest, tokens, now, now + (capacity - tokens) / rate)
+            finally:
+                if self._fd is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return allowed, tokens, 0 if allowed else (cost - tokens) / rate
+
+    def used(self):
+        if self._map is None:
+            return 0
+        now = time.time()
+        return sum(1 for i in range(self.slots)
+                   if SLOT.unpack_from(self._map, HEADER.size + i * SLOT.size)[3] > now)
+
+
+class SQLBuckets:
+    """Token buckets in the rate_limit_bucket table, for workers on more than one host.
+
+    A check is one UPDATE on the primary key that refills and spends in the same statement, run in
+    its own short transaction so the request's session and locks are untouched.
+    """
+
+    def take(self, key, capacity, rate, cost, now):
+        bucket = RateLimitBucket.__table__
+        refilled = bucket.c.tokens + (now - bucket.c.updated_at) * rate
+        refilled = case((refilled > capacity, capacity), else_=refilled)
+        with db.engine.begin() as connection:
+            spent = connection.execute(update(bucket).where(
+                bucket.c.key == key, refilled >= cost
+            ).values(
+                tokens=refilled - cost,
+                updated_at=now,
+                full_at=now + (capacity - (refilled - cost)) / rate
+            )).rowcount
+        if spent:
+            return True, None, 0
+
+        if capacity >= cost:
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(insert(bucket).values(
+                        key=key, tokens=capacity - cost, updated_at=now, full_at=now + cost / rate))
+                return True, capacity - cost, 0
+            except IntegrityError:
+                pass  # the bucket exists and is short
+
+        with db.engine.connect() as connection:
+            row = connection.execute(select(bucket.c.tokens, bucket.c.updated_at).where(bucket.c.key == key)).first()
+        tokens = min(capacity, row.tokens + (now - row.updated_at) * rate) if row else 0
+        return False, tokens, max(cost - tokens, 0) / rate
+
+    def purge(self):
+        # A full bucket is the same as a missing one
+        with db.engine.begin() as connection:
+            deleted = connection.execute(delete(RateLimitBucket.__table__).where(RateLimitBucket.full_at < time.time())).rowcount
+        return {'deleted': deleted}
+
+    def used(self):
+        return db.session.query(db.func.count(RateLimitBucket.key)).filter(RateLimitBucket.full_at > time.time()).scalar()
+
+
+class RateLimiter:
+    """Token-bucket rate limits with named budgets, checked before each request.
+
+    A request is charged to the budget set on its view (limit() on the function) or blueprint,
+    otherwise 'default', at the view's cost in tokens. Buckets are per signed-in user, per client
+    address otherwise. RATE_LIMIT_STORAGE picks where buckets live: 'shm' (a memory-mapped file
+    shared by every worker on the host), 'sql' (the database, for several hosts) or 'memory'
+    (per process). Storage errors let the request through.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.storage = None
+        self.backend = None
+        self.budgets = {}
+        self.allowed = {}
+        self.limited = {}
+        self.errors = 0
+        self._blueprints = {}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', self.enabled)
+        self.budgets = {name: parse_budget(spec) for name, spec in app.config['RATE_LIMIT_BUDGETS'].items()}
+        backend = app.config.get('RATE_LIMIT_STORAGE', 'shm')
+        if backend == 'sql':
+            self.storage = SQLBuckets()
+            scheduler.add('rate_limit_purge', self.storage.purge, '45 * * * *')
+        elif backend == 'memory':
+            self.storage = SlotTable(app.config['RATE_LIMIT_SLOTS'])
+        else:
+            path = app.config.get('RATE_LIMIT_SHM_PATH') or os.path.join(
+                '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+                f"ratelimit-{hashlib.sha256(app.config['SQLALCHEMY_DATABASE_URI'].encode()).hexdigest()[:12]}")
+            self.storage = SlotTable(app.config['RATE_LIMIT_SLOTS'], path)
+        self.backend = backend
+        app.before_request(self.check)
+        logger.info(f"Rate limiter using {backend} storage, budgets: {app.config['RATE_LIMIT_BUDGETS']}")
+
+    def limit(self, budget, cost=1):
+        """Charge a view (or every view of a blueprint) to budget, cost tokens per request."""
+        def decorator(target):
+            if isinstance(target, Blueprint):
+                self._blueprints[target] = (budget, cost)  # by object: a blueprint can be registered under several names
+            else:
+                target._rate_limit = (budget, cost)
+            return target
+        return decorator
+
+    def exempt(self, view):
+        view._rate_limit = None
+        return view
+
+    def _budget_for(self, app):
+        view = app.view_functions.get(request.endpoint)
+        if view is not None and hasattr(view, '_rate_limit'):
+            return view._rate_limit
+        return self._blueprints.get(app.blueprints.get(request.blueprint), ('default', 1))
+
+    def check(self):
+        if not self.enabled or request.method == 'OPTIONS' or request.endpoint is None:
+            return None
+        limit = self._budget_for(current_app)
+        if limit is None:
+            return None
+        budget, cost = limit
+        capacity, rate = self.budgets[budget]
+        user = getattr(g, 'current_user', None)
+        key = f"{budget}:user:{user.id}" if user else f"{budget}:ip:{request.remote_addr}"
+
+        try:
+            allowed, _, retry_after = self.storage.take(key, capacity, rate, cost, time.time())
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Rate limit check failed, allowing request: {str(e)}")
+            return None
+
+        if allowed:
+            self.allowed[budget] = self.allowed.get(budget, 0) + 1
+            return None
+        self.limited[budget] = self.limited.get(budget, 0) + 1
+        logger.warning(f"Rate limit '{budget}' exceeded by {key} on {request.endpoint}")
+        response = jsonify({'error': 'Too many requests', 'retry_after': math.ceil(retry_after)})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(math.ceil(retry_after))
+        return response
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'storage': self.backend,
+            'allowed': self.allowed,
+            'limited': self.limited,
+            'errors': self.errors,
+            'active_buckets': self.storage.used() if self.storage else 0
+        }
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,59 @@
+from flask_socketio import join_room, leave_room
+import logging
+from extensions import db, socketio
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+ADMINS_ROOM = 'admins'
+
+
+def user_room(user_id):
+    return f'user:{user_id}'
+
+
+def job_room(job_id):
+    return f'job:{job_id}'
+
+
+def join_user_rooms(user):
+    # Called from connect handlers: every authenticated socket hears about its own user,
+    # admins additionally hear about everyone
+    join_room(user_room(user.id))
+    if user.role == 'admin':
+        join_room(ADMINS_ROOM)
+
+
+def can_access_job(user, job_id):
+    if user.role == 'admin':
+        return True
+    job = db.session.get(Job, job_id)
+    return job is not None and job.user_id == user.id
+
+
+def subscribe_job(user, job_id):
+    if not can_access_job(user, job_id):
+        logger.error(f"SocketIO: user {user.id} denied subscription to job {job_id}")
+        return False
+    join_room(job_room(job_id))
+    return True
+
+
+def unsubscribe_job(job_id):
+    leave_room(job_room(job_id))
+
+
+def emit_to_client(event, payload, client_id, namespace):
+    """Emit to one client's sockets and to the admins. A socket in several rooms gets it once."""
+    socketio.emit(event, payload, to=[user_room(client_id), ADMINS_ROOM], namespace=namespace)
+
+
+def emit_to_job(event, payload, job, namespace):
+    """Emit to sockets watching the job, its owner and the admins."""
+    socketio.emit(event, payload, to=[job_room(job.id), user_room(job.user_id), ADMINS_ROOM], namespace=namespace)
+
+
+def emit_to_job_id(event, payload, job_id, client_id, namespace):
+    """emit_to_job() by ids, for a job that may be gone (a failed upfront payment deletes it)."""
+    rooms = [job_room(job_id), ADMINS_ROOM] + ([user_room(client_id)] if client_id else [])
+    socketio.emit(event, payload, to=rooms, namespace=namespace)
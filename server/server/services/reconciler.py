@@ -0,0 +1,160 @@
+from flask import current_app
+from datetime import datetime, timedelta
+from sqlalchemy import and_, case, or_
+from sqlalchemy.exc import IntegrityError
+import eventlet
+import logging
+import requests
+from extensions import db
+from models import Job, PaymentNotification, PaymentTransaction
+from server.services.notifications import send_payment_email
+from server.services.payments import fetch_transaction_status, record_transaction_statuses, stage_transaction_status
+from server.services.scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+# Outcomes the reconciler applies to a job. 'Invalid' is also what an order nobody has paid yet
+# reports, so it is only cached; the client's own poll or an IPN still acts on it
+APPLIED_STATUSES = ('Completed', 'Failed')
+
+
+class PaymentReconciler:
+    """Settles jobs whose payment outcome never reached us, as the 'payment_reconcile' scheduler task.
+
+    Jobs left Pending with an upfront order, or Partial with a completion order, untouched for a
+    while are taken in batches by id. Their orders' transaction statuses are fetched concurrently
+    on a bounded green thread pool, recorded in payment_transaction with one upsert, and the ones
+    that settle the payment are applied to the jobs in the same transaction. Each applied status
+    also gets its payment_notification row, so it takes effect once whether the reconciler or an
+    IPN gets there first.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.concurrency = 8
+        self.batch_size = 100
+        self.max_batches = 20
+        self.stale_after = 600
+        self.recheck_after = 900
+        self.give_up_days = 3
+        self.checked = 0
+        self.applied = 0
+        self.errors = 0
+        self.conflicts = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PAYMENT_RECONCILE_ENABLED', self.enabled)
+        self.concurrency = app.config.get('PAYMENT_RECONCILE_CONCURRENCY', self.concurrency)
+        self.batch_size = app.config.get('PAYMENT_RECONCILE_BATCH_SIZE', self.batch_size)
+        self.max_batches = app.config.get('PAYMENT_RECONCILE_MAX_BATCHES', self.max_batches)
+        self.stale_after = app.config.get('PAYMENT_RECONCILE_STALE_AFTER', self.stale_after)
+        self.recheck_after = app.config.get('PAYMENT_RECONCILE_RECHECK_AFTER', self.recheck_after)
+        self.give_up_days = app.config.get('PAYMENT_RECONCILE_GIVE_UP_DAYS', self.give_up_days)
+        if self.enabled:
+            scheduler.add('payment_reconcile', self.reconcile, app.config.get('PAYMENT_RECONCILE_SCHEDULE', '*/5 * * * *'))
+
+    def reconcile(self):
+        """Check every stale unsettled job, up to max_batches batches. Returns counts for the run."""
+        app = current_app._get_current_object()
+        pool = eventlet.GreenPool(self.concurrency)
+        totals = {'checked': 0, 'applied': 0, 'errors': 0}
+        after = 0
+        for _ in range(self.max_batches):
+            batch = self._stale(after)
+            if not batch:
+                break
+            after = batch[-1][0]
+            results = list(pool.imap(lambda item: self._fetch(app, *item), batch))
+            fetched = [result for result in results if result[2] is not None]
+            totals['checked'] += len(fetched)
+            totals['errors'] += len(results) - len(fetched)
+            totals['applied'] += self._apply(fetched)
+            if len(batch) < self.batch_size:
+                break
+        self.checked += totals['checked']
+        self.errors += totals['errors']
+        logger.info(f"Payment reconciliation checked {totals['checked']} orders, applied {totals['applied']}, "
+                    f"{totals['errors']} errors")
+        return totals
+
+    def _stale(self, after):
+        now = datetime.utcnow()
+        tracking_id = case((Job.payment_status == 'Pending', Job.order_tracking_id), else_=Job.completion_tracking_id)
+        return db.session.query(Job.id, tracking_id).outerjoin(
+            PaymentTransaction, PaymentTransaction.order_tracking_id == tracking_id
+        ).filter(
+            Job.id > after,
+            or_(and_(Job.payment_status == 'Pending', Job.order_tracking_id.isnot(None)),
+                and_(Job.payment_status == 'Partial', Job.completion_tracking_id.isnot(None))),
+            Job.updated_at < now - timedelta(seconds=self.stale_after),
+            Job.updated_at >= now - timedelta(days=self.give_up_days),
+            or_(PaymentTransaction.checked_at.is_(None),
+                PaymentTransaction.checked_at < now - timedelta(seconds=self.recheck_after))
+        ).order_by(Job.id).limit(self.batch_size).all()
+
+    def _fetch(self, app, job_id, order_tracking_id):
+        # Runs on its own green thread, so in an app context (and session) of its own
+        with app.app_context():
+            try:
+                return job_id, order_tracking_id, fetch_transaction_status(order_tracking_id)
+            except requests.RequestException as e:
+                logger.warning(f"Reconciling {order_tracking_id} for job {job_id} failed: {str(e)}")
+                return job_id, order_tracking_id, None
+
+    def _apply(self, fetched):
+        if not fetched:
+            return 0
+        now = datetime.utcnow()
+        record_transaction_statuses(fetched, now)
+
+        settling = [(job_id, order_tracking_id, data) for job_id, order_tracking_id, data in fetched
+                    if data.get('payment_status_description') in APPLIED_STATUSES]
+        jobs = {job.id: job for job in Job.query.filter(Job.id.in_([job_id for job_id, _, _ in settling]))} if settling else {}
+        done = set(db.session.query(PaymentNotification.order_tracking_id, PaymentNotification.payment_status).filter(
+            PaymentNotification.order_tracking_id.in_([order_tracking_id for _, order_tracking_id, _ in settling])
+        ).all()) if settling else set()
+
+        emails = []
+        for job_id, order_tracking_id, data in settling:
+            payment_status = data['payment_status_description']
+            job = jobs.get(job_id)
+            if job is None or (order_tracking_id, payment_status) in done:
+                continue  # applied by an IPN meanwhile
+            db.session.add(PaymentNotification(
+                order_tracking_id=order_tracking_id,
+                payment_status=payment_status,
+                merchant_reference=job.completion_reference if order_tracking_id == job.completion_tracking_id else job.merchant_reference,
+                notification_type='RECONCILE',
+                state='done',
+                received_count=0,
+                job_id=job.id,
+                processed_at=now
+            ))
+            email = stage_transaction_status(job, order_tracking_id, data)
+            if email:
+                emails.append(email)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # An IPN worker applied one of these between our check and commit; the batch is
+            # picked up again by the next run
+            db.session.rollback()
+            self.conflicts += 1
+            logger.warning(f"Payment reconciliation batch of {len(fetched)} conflicted with an IPN, left for the next run")
+            return 0
+        for email in emails:
+            send_payment_email(*email)
+        self.applied += len(emails)
+        return len(emails)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'checked': self.checked,
+            'applied': self.applied,
+            'errors': self.errors,
+            'conflicts': self.conflicts
+        }
+
+
+payment_reconciler = PaymentReconciler()
@@ -0,0 +1,176 @@
+from datetime import datetime, timedelta
+from threading import Lock
+from sqlalchemy import and_, event, func, inspect, or_
+from sqlalchemy.orm import Session
+import logging
+import os
+import time
+from extensions import db
+from models import ChunkedUpload, Job, Message, StoredFile
+from server.services.scheduler import scheduler
+from server.services.uploads import upload_store
+
+logger = logging.getLogger(__name__)
+
+STALE_INCOMING_AGE = 24 * 60 * 60  # seconds; staging files left behind by a worker that died mid-upload
+
+
+class RetentionSweeper:
+    """Deletes stored uploads whose retention has run out.
+
+    stored_file.expires_at is the index: it is set by policy as files are stored and as jobs change
+    status (see _apply_retention_policy), and the sweep reads only rows that are due through it, in
+    committed batches, so its cost follows what has expired rather than how much is stored. Files
+    go through upload_store.release_many(), so a blob shared with live attachments stays on disk.
+    Sweeps run as the 'upload_retention' scheduler task.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.dry_run = False
+        self.batch_size = 500
+        self.max_batches = 100
+        self.message_days = 30
+        self.job_days = 30
+        self.passes = 0
+        self.files_deleted = 0
+        self.bytes_freed = 0
+        self.uploads_expired = 0
+        self.last_run = None
+        self._lock = Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('UPLOAD_RETENTION_ENABLED', self.enabled)
+        self.dry_run = app.config.get('UPLOAD_RETENTION_DRY_RUN', self.dry_run)
+        self.batch_size = app.config.get('UPLOAD_RETENTION_BATCH_SIZE', self.batch_size)
+        self.max_batches = app.config.get('UPLOAD_RETENTION_MAX_BATCHES', self.max_batches)
+        self.message_days = app.config.get('UPLOAD_RETENTION_DAYS', self.message_days)
+        self.job_days = app.config.get('UPLOAD_JOB_RETENTION_DAYS', self.job_days)
+        if self.enabled:
+            scheduler.add('upload_retention', self.sweep, app.config.get('UPLOAD_RETENTION_SCHEDULE', '*/15 * * * *'))
+
+    def expiry_for(self, stored_file, now):
+        """When a stored file should go: a set time after a general message attachment is sent, a set
+        time after its job is completed, otherwise never (None)."""
+        job = stored_file.job
+        if job is None and stored_file.job_id:
+            job = db.session.get(Job, stored_file.job_id)
+        if job is not None:
+            if job.status == 'Completed' and self.job_days:
+                return now + timedelta(days=self.job_days)
+            return None
+        if stored_file.message is None and not stored_file.message_id:
+            return now  # nothing refers to it
+        return now + timedelta(days=self.message_days) if self.message_days else None
+
+    def sweep(self, dry_run=None):
+        """Delete (or with dry_run, just count) everything that is due, up to max_batches batches."""
+        dry_run = self.dry_run if dry_run is None else dry_run
+        with self._lock:
+            started = time.perf_counter()
+            now = datetime.utcnow()
+            report = {'dry_run': dry_run, 'files': 0, 'bytes': 0, 'batches': 0, 'uploads_expired': 0}
+
+            last = None
+            while report['batches'] < self.max_batches:
+                query = StoredFile.query.filter(StoredFile.expires_at <= now)
+                if last:
+                    # Keyset on the index, so rows skipped or kept never come round again in this pass
+                    query = query.filter(or_(StoredFile.expires_at > last[0],
+                                             and_(StoredFile.expires_at == last[0], StoredFile.id > last[1])))
+                query = query.order_by(StoredFile.expires_at, StoredFile.id).limit(self.batch_size)
+                batch = query.all() if dry_run else query.with_for_update(skip_locked=True).all()
+                if not batch:
+                    break
+                last = (batch[-1].expires_at, batch[-1].id)
+                report['batches'] += 1
+                report['files'] += len(batch)
+                report['bytes'] += sum(stored_file.size or 0 for stored_file in batch)
+                if dry_run:
+                    db.session.rollback()
+                else:
+                    upload_store.release_many(batch, keep_paths=self._shared_legacy_paths(batch, now))
+                    db.session.commit()
+                if len(batch) < self.batch_size:
+                    break
+
+            if dry_run:
+                report['uploads_expired'] = ChunkedUpload.query.filter(ChunkedUpload.expires_at < now).count()
+            else:
+                for _ in range(self.max_batches):
+                    expired = upload_store.expire_chunked(self.batch_size)
+                    db.session.commit()
+                    report['uploads_expired'] += expired
+                    if expired < self.batch_size:
+                        break
+                self._remove_stale_incoming()
+
+            report['seconds'] = round(time.perf_counter() - started, 3)
+            self.passes += 1
+            self.last_run = {**report, 'at': now.isoformat()}
+            if not dry_run:
+                self.files_deleted += report['files']
+                self.bytes_freed += report['bytes']
+                self.uploads_expired += report['uploads_expired']
+            if report['files'] or report['uploads_expired']:
+                logger.info(f"Upload retention {'dry run' if dry_run else 'sweep'}: {report['files']} files "
+                            f"({report['bytes']} bytes), {report['uploads_expired']} chunked uploads in {report['seconds']}s")
+            return report
+
+    def _shared_legacy_paths(self, batch, now):
+        # Rows from before deduplication have no blob reference; their path may still be listed elsewhere
+        paths = {stored_file.path for stored_file in batch if not stored_file.sha256}
+        if not paths:
+            return set()
+        return {path for path, in db.session.query(StoredFile.path).filter(
+            StoredFile.path.in_(paths),
+            or_(StoredFile.expires_at.is_(None), StoredFile.expires_at > now)
+        )}
+
+    def _remove_stale_incoming(self):
+        # Only the staging directory is listed, and it holds no more than the uploads in flight
+        cutoff = time.time() - STALE_INCOMING_AGE
+        for entry in os.scandir(upload_store.incoming_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    logger.info(f"Removed stale upload staging file {entry.name}")
+            except OSError as e:
+                logger.error(f"Failed to remove staging file {entry.path}: {str(e)}")
+
+    def stats(self):
+        pending = db.session.query(func.count(StoredFile.id)).filter(StoredFile.expires_at <= datetime.utcnow()).scalar()
+        return {
+            'enabled': self.enabled,
+            'dry_run': self.dry_run,
+            'passes': self.passes,
+            'files_deleted': self.files_deleted,
+            'bytes_freed': self.bytes_freed,
+            'uploads_expired': self.uploads_expired,
+            'due': pending,
+            'last_run': self.last_run
+        }
+
+
+retention = RetentionSweeper()
+
+
+@event.listens_for(Session, 'before_flush')
+def _apply_retention_policy(session, flush_context, instances):
+    now = datetime.utcnow()
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, StoredFile) and obj.expires_at is None:
+                obj.expires_at = retention.expiry_for(obj, now)
+        for obj in session.dirty:
+            # A job's files start their retention when it is completed, and stop if it is reopened
+            if isinstance(obj, Job) and inspect(obj).attrs.status.history.has_changes():
+                expires_at = now + timedelta(days=retention.job_days) if obj.status == 'Completed' and retention.job_days else None
+                for stored_file in obj.stored_files:
+                    stored_file.expires_at = expires_at
+        for obj in session.deleted:
+            # A general message's attachments go with it once both sides have deleted it
+            if isinstance(obj, Message):
+                for stored_file in obj.attachments:
+                    if stored_file.job_id is None and stored_file not in session.deleted:
+                        stored_file.expires_at = now
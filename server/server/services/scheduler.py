@@ -0,0 +1,268 @@
+from datetime import datetime, timedelta, time as clock
+from threading import Lock, Thread
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import time
+from extensions import db
+from models import ScheduledTask, ScheduledTaskRun
+
+logger = logging.getLogger(__name__)
+
+ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+}
+
+
+def _field(spec, low, high):
+    values = set()
+    for part in spec.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/')
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(value) for value in part.split('-'))
+        else:
+            start = end = int(part)
+            if step != 1:
+                end = high
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"{spec!r} is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return sorted(values)
+
+
+class CronSchedule:
+    """A five-field cron expression (minute hour day-of-month month day-of-week), in UTC.
+
+    Fields take *, n, a-b, lists and /step; day of week is 0-7 with 0 and 7 both Sunday. As in cron,
+    when both day fields are restricted a day matching either one fires.
+    """
+
+    def __init__(self, expr):
+        self.expr = expr
+        fields = ALIASES.get(expr.strip(), expr).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expr!r}")
+        self.minutes = _field(fields[0], 0, 59)
+        self.hours = _field(fields[1], 0, 23)
+        self.days = set(_field(fields[2], 1, 31))
+        self.months = set(_field(fields[3], 1, 12))
+        self.weekdays = {day % 7 for day in _field(fields[4], 0, 7)}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def _day_matches(self, day):
+        if day.month not in self.months:
+            return False
+        by_date = day.day in self.days
+        by_weekday = day.isoweekday() % 7 in self.weekdays
+        if not self.any_day and not self.any_weekday:
+            return by_date or by_weekday
+        return by_date and by_weekday
+
+    def next_after(self, after):
+        start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(5 * 366):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime.combine(day, clock(hour, minute))
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"Cron expression never fires: {self.expr!r}")
+
+
+class Scheduler:
+    """Runs periodic maintenance once across every worker, on cron schedules.
+
+    Every process runs the scheduler loop, but a task only runs where it wins the claim: the
+    scheduled_task row's next_run_at is moved to the following fire time (plus jitter) by a
+    conditional UPDATE, which one instance wins. On PostgreSQL the winner also holds an advisory
+    lock for the task while it runs, so a slow run is never overlapped by the next one. Each run is
+    recorded in scheduled_task_run.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.tick = 30
+        self.jitter = 60
+        self.history_days = 14
+        self.tasks = {}
+        self.runs = {}
+        self.failures = {}
+        self.runner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = Lock()
+        self._started = False
+        self._synced = False
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SCHEDULER_ENABLED', self.enabled)
+        self.tick = app.config.get('SCHEDULER_TICK', self.tick)
+        self.jitter = app.config.get('SCHEDULER_JITTER', self.jitter)
+        self.history_days = app.config.get('SCHEDULER_HISTORY_DAYS', self.history_days)
+        self.add('scheduler_history_purge', self.purge_history, '30 4 * * *')
+
+    def add(self, name, func, schedule, jitter=None):
+        """Register func (called with no arguments in an app context) to run on a cron schedule."""
+        self.tasks[name] = {'func': func, 'schedule': CronSchedule(schedule),
+                            'jitter': self.jitter if jitter is None else jitter}
+        self._synced = False
+
+    def start(self, app):
+        if not self.enabled or self._started:
+            return
+        self._started = True
+        self.runner = f"{socket.gethostname()}:{os.getpid()}"
+        Thread(target=self._run, args=(app,), daemon=True).start()
+        logger.info(f"Started scheduler with {len(self.tasks)} tasks: {', '.join(sorted(self.tasks))}")
+
+    def _next_run(self, task, after):
+        return task['schedule'].next_after(after) + timedelta(seconds=random.uniform(0, task['jitter']))
+
+    def _sync(self):
+        # Registers new tasks and picks up changed schedules; the first worker to insert a row wins
+        now = datetime.utcnow()
+        table = ScheduledTask.__table__
+        with db.engine.begin() as connection:
+            rows = dict(connection.execute(select(table.c.name, table.c.schedule)).all())
+        for name, task in self.tasks.items():
+            schedule = task['schedule'].expr
+            if rows.get(name) == schedule:
+                continue
+            try:
+                with db.engine.begin() as connection:
+                    if name in rows:
+                        connection.execute(update(table).where(table.c.name == name).values(
+                            schedule=schedule, next_run_at=self._next_run(task, now)))
+                    else:
+                        connection.execute(insert(table).values(
+                            name=name, schedule=schedule, next_run_at=self._next_run(task, now)))
+            except IntegrityError:
+                pass
+        self._synced = True
+
+    def run_due(self):
+        """Run every task that is due and that this instance wins. Returns the names run here."""
+        with self._lock:
+            if not self._synced:
+                self._sync()
+            table = ScheduledTask.__table__
+            with db.engine.begin() as connection:
+                due = connection.execute(select(table.c.name).where(
+                    table.c.next_run_at <= datetime.utcnow(), table.c.name.in_(list(self.tasks))
+                ).order_by(table.c.next_run_at)).scalars().all()
+            return [name for name in due if self._run_task(name)]
+
+    def _run_task(self, name):
+        task = self.tasks[name]
+        lock_key = int.from_bytes(hashlib.blake2b(f"scheduler:{name}".encode(), digest_size=8).digest(), 'big', signed=True)
+        # Session-level lock on a connection of its own, held across the task's own commits
+        connection = db.engine.connect() if db.engine.dialect.name == 'postgresql' else None
+        locked = False
+        try:
+            if connection is not None:
+                locked = connection.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': lock_key}).scalar()
+                connection.commit()
+                if not locked:
+                    return False  # running elsewhere
+
+            now = datetime.utcnow()
+            table = ScheduledTask.__table__
+            with db.engine.begin() as claim:
+                won = claim.execute(update(table).where(table.c.name == name, table.c.next_run_at <= now).values(
+                    next_run_at=self._next_run(task, now), last_started_at=now, last_runner=self.runner
+                )).rowcount
+            if not won:
+                return False
+
+            runs = ScheduledTaskRun.__table__
+            with db.engine.begin() as record:
+                run_id = record.execute(insert(runs).values(
+                    task=name, runner=self.runner, started_at=now, status='running')).inserted_primary_key[0]
+
+            started = time.perf_counter()
+            try:
+                result = task['func']()
+                status, detail = 'ok', None if result is None else json.dumps(result, default=str)
+            except Exception as e:
+                status, detail = 'failed', str(e)
+                logger.error(f"Scheduled task {name} failed: {str(e)}", exc_info=True)
+                db.session.rollback()
+            finally:
+                db.session.remove()
+            duration = time.perf_counter() - started
+
+            finished = datetime.utcnow()
+            with db.engine.begin() as record:
+                record.execute(update(runs).where(runs.c.id == run_id).values(
+                    finished_at=finished, duration=duration, status=status, detail=detail and detail[:2000]))
+                record.execute(update(table).where(table.c.name == name).values(
+                    last_finished_at=finished, last_status=status))
+            self.runs[name] = self.runs.get(name, 0) + 1
+            if status != 'ok':
+                self.failures[name] = self.failures.get(name, 0) + 1
+            logger.info(f"Scheduled task {name} {status} in {duration:.2f}s")
+            return True
+        finally:
+            if connection is not None:
+                if locked:
+                    connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': lock_key})
+                    connection.commit()
+                connection.close()
+
+    def purge_history(self):
+        cutoff = datetime.utcnow() - timedelta(days=self.history_days)
+        deleted = ScheduledTaskRun.query.filter(ScheduledTaskRun.started_at < cutoff).delete()
+        db.session.commit()
+        return {'deleted': deleted}
+
+    def history(self, task=None, limit=50):
+        query = ScheduledTaskRun.query
+        if task:
+            query = query.filter_by(task=task)
+        return query.order_by(ScheduledTaskRun.id.desc()).limit(limit).all()
+
+    def stats(self):
+        rows = {row.name: row for row in ScheduledTask.query.filter(ScheduledTask.name.in_(list(self.tasks))).all()}
+        tasks = {}
+        for name, task in self.tasks.items():
+            row = rows.get(name)
+            tasks[name] = {
+                'schedule': task['schedule'].expr,
+                'next_run_at': row.next_run_at.isoformat() if row else None,
+                'last_started_at': row.last_started_at.isoformat() if row and row.last_started_at else None,
+                'last_status': row.last_status if row else None,
+                'last_runner': row.last_runner if row else None,
+                'runs_here': self.runs.get(name, 0),
+                'failures_here': self.failures.get(name, 0)
+            }
+        return {'enabled': self.enabled, 'running': self._started, 'runner': self.runner, 'tasks': tasks}
+
+    def _run(self, app):
+        while True:
+            try:
+                with app.app_context():
+                    self.run_due()
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {str(e)}")
+            finally:
+                with app.app_context():
+                    db.session.remove()
+            time.sleep(self.tick * random.uniform(0.75, 1.25))
+
+
+scheduler = Scheduler()
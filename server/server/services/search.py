@@ -0,0 +1,288 @@
+from flask import current_app
+from array import array
+from heapq import nlargest
+from threading import Lock
+from sqlalchemy import func, inspect, literal, literal_column
+from sqlalchemy.orm import contains_eager, defer
+import logging
+import math
+import re
+import time
+from extensions import db
+from models import Job, Blog, User
+
+logger = logging.getLogger(__name__)
+
+TS_CONFIG = 'english'
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+STOP_WORDS = frozenset((
+    'a an and are as at be but by for from has have i in is it its of on or our that the their this '
+    'to was we were will with you your'
+).split())
+
+
+def _stem(term):
+    # Crude plural folding so "essays" finds "essay"; PostgreSQL does real stemming
+    if len(term) > 4 and term.endswith('ies'):
+        return term[:-3] + 'y'
+    if len(term) > 3 and term.endswith('s') and not term.endswith(('ss', 'us', 'is')):
+        return term[:-1]
+    return term
+
+
+def tokenize(text):
+    return [_stem(token) for token in _TOKEN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class InvertedIndex:
+    """In-process BM25 index over one table, for databases without full-text search.
+
+    Fields are weighted like the tsvector setweight() labels. The index is built on first use
+    and then kept in step by polling: rows whose updated_at moved past the newest one indexed are
+    re-read, and a count that no longer matches (a deleted row) triggers a rebuild. Polling at
+    most every `refresh_interval` seconds keeps searches cheap and also picks up writes made by
+    other workers.
+
+    Postings are packed arrays of slots rather than dicts, which keeps 100k jobs in tens of MB.
+    Re-indexing a row gives it a new slot and leaves the old one behind as garbage until enough
+    has piled up to rebuild.
+    """
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, model, fields, owner=None, visible=None, refresh_interval=2):
+        self.model = model
+        self.fields = fields  # [(column, weight)]
+        self.owner = owner  # column searches can be scoped by
+        self.visible = visible  # rows outside this filter are not indexed
+        self.refresh_interval = refresh_interval
+        self._reset()
+        self._checked_at = None
+        self._lock = Lock()
+        self.builds = 0
+
+    def _reset(self):
+        self._postings = {}  # term -> (slots, weighted term frequencies)
+        self._slot_doc = array('q')
+        self._slot_owner = array('q')
+        self._slot_length = array('f')
+        self._slots = {}  # doc id -> its live slot
+        self._total_length = 0
+        self._watermark = None  # newest updated_at indexed
+
+    def _columns(self):
+        columns = [self.model.id, self.model.updated_at]
+        columns.append(self.owner if self.owner is not None else self.model.id)
+        return columns + [column for column, _ in self.fields]
+
+    def _visible_query(self, *columns):
+        query = db.session.query(*columns)
+        return query.filter(self.visible) if self.visible is not None else query
+
+    def _add(self, row):
+        doc_id, updated_at, owner_id = row[0], row[1], row[2]
+        counts = {}
+        length = 0
+        for (_, weight), value in zip(self.fields, row[3:]):
+            for term in tokenize(value or ''):
+                counts[term] = counts.get(term, 0) + weight
+                length += weight
+        slot = len(self._slot_doc)
+        for term, frequency in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('i'), array('H'))
+            postings[0].append(slot)
+            postings[1].append(min(frequency, 65535))
+        self._slot_doc.append(doc_id)
+        self._slot_owner.append(owner_id or 0)
+        self._slot_length.append(length)
+        self._slots[doc_id] = slot
+        self._total_length += length
+        if updated_at is not None and (self._watermark is None or updated_at > self._watermark):
+            self._watermark = updated_at
+
+    def _remove(self, doc_id):
+        slot = self._slots.pop(doc_id, None)
+        if slot is not None:
+            self._total_length -= self._slot_length[slot]
+
+    def _rebuild(self):
+        self._reset()
+        for row in self._visible_query(*self._columns()).yield_per(2000):
+            self._add(row)
+        self.builds += 1
+        logger.info(f"Search index for {self.model.__tablename__} built, {len(self._slots)} documents")
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            if not force and self._checked_at is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            if self._checked_at is None or self._watermark is None:
+                self._rebuild()
+            else:
+                visible = self.visible if self.visible is not None else literal(True)
+                changed = db.session.query(*self._columns(), visible).filter(self.model.updated_at >= self._watermark)
+                for row in changed.all():
+                    self._remove(row[0])
+                    if row[-1]:
+                        self._add(row[:-1])
+                garbage = len(self._slot_doc) - len(self._slots)
+                count = self._visible_query(func.count(self.model.id)).scalar()
+                if count != len(self._slots) or garbage > max(1000, len(self._slots) // 4):
+                    self._rebuild()
+            self._checked_at = time.monotonic()
+
+    def search(self, text, limit, owner_id=None):
+        """(total matches, [(score, doc id)] best first, at most `limit`) for documents containing every term."""
+        self.refresh()
+        terms = set(tokenize(text))
+        if not terms:
+            return 0, []
+        postings = [self._postings.get(term) for term in terms]
+        if not all(postings):
+            return 0, []
+        postings.sort(key=lambda p: len(p[0]))
+        frequencies = [dict(zip(*p)) for p in postings]
+        live, slot_doc, slot_owner = self._slots, self._slot_doc, self._slot_owner
+        matches = set(postings[0][0]).intersection(*frequencies[1:])
+        matches = [slot for slot in matches if live.get(slot_doc[slot]) == slot and
+                   (owner_id is None or slot_owner[slot] == owner_id)]
+
+        total_docs = len(live)
+        average_length = self._total_length / total_docs if total_docs else 1
+        k1, b, lengths = self.K1, self.B, self._slot_length
+        norm = {slot: k1 * (1 - b + b * lengths[slot] / average_length) for slot in matches}
+        scores = dict.fromkeys(matches, 0.0)
+        for p, term_frequencies in zip(postings, frequencies):
+            # Document frequencies include garbage slots; close enough for ranking
+            term_idf = math.log(1 + (max(total_docs - len(p[0]), 0) + 0.5) / (len(p[0]) + 0.5)) * (k1 + 1)
+            for slot in matches:
+                f = term_frequencies[slot]
+                scores[slot] += term_idf * f / (f + norm[slot])
+
+        best = nlargest(limit, scores.items(), key=lambda item: item[1])
+        return len(matches), [(value, slot_doc[slot]) for slot, value in best]
+
+    def stats(self):
+        return {
+            'documents': len(self._slots),
+            'terms': len(self._postings),
+            'garbage_slots': len(self._slot_doc) - len(self._slots),
+            'builds': self.builds
+        }
+
+
+# Weights follow the tsvector labels in the search migration: title A, subject B, body C
+job_index = InvertedIndex(Job, [(Job.title, 4), (Job.subject, 2), (Job.instructions, 1)],
+                          owner=Job.user_id, visible=Job.payment_status != 'Pending')
+blog_index = InvertedIndex(Blog, [(Blog.title, 4), (Blog.content, 1)])
+
+_postgres_ready = {}  # database URI -> whether the search_vector columns exist
+
+
+def init_search(app):
+    for index in (job_index, blog_index):
+        index.refresh_interval = app.config.get('SEARCH_INDEX_REFRESH', index.refresh_interval)
+    logger.info(f"Search backend setting: {app.config.get('SEARCH_BACKEND', 'auto')}")
+
+
+def backend():
+    configured = current_app.config.get('SEARCH_BACKEND', 'auto')
+    if configured != 'auto':
+        return configured
+    uri = current_app.config['SQLALCHEMY_DATABASE_URI']
+    if uri not in _postgres_ready:
+        ready = db.engine.dialect.name == 'postgresql'
+        if ready:
+            inspector = inspect(db.engine)
+            ready = all('search_vector' in {column['name'] for column in inspector.get_columns(table)}
+                        for table in ('job', 'blog'))
+            if not ready:
+                logger.warning("Search: search_vector columns missing, using the in-process index")
+        _postgres_ready[uri] = ready
+    return 'postgres' if _postgres_ready[uri] else 'memory'
+
+
+def _job_query():
+    return Job.query.options(defer(Job.instructions))
+
+
+def _blog_query():
+    return Blog.query.join(Blog.author).options(
+        defer(Blog.content), defer(Blog.content_html),
+        contains_eager(Blog.author).load_only(User.id, User.name)
+    )
+
+
+def _job_scope(user):
+    scope = [Job.payment_status != 'Pending']
+    if user.role != 'admin':
+        scope.append(Job.user_id == user.id)
+    return scope
+
+
+def _postgres_search(query, model, text, scope, limit):
+    vector = literal_column(f'{model.__tablename__}.search_vector')
+    tsquery = func.websearch_to_tsquery(TS_CONFIG, text)
+    rank = func.ts_rank_cd(vector, tsquery)
+    rows = query.add_columns(rank, func.count().over()).filter(vector.op('@@')(tsquery), *scope).order_by(
+        rank.desc(), model.id.desc()
+    ).limit(limit).all()
+    return (rows[0][2] if rows else 0), [(score, item) for item, score, _ in rows]
+
+
+def _memory_search(index, query, model, text, limit, owner_id=None):
+    total, hits = index.search(text, limit, owner_id)
+    items = {item.id: item for item in query.filter(model.id.in_([doc_id for _, doc_id in hits]))} if hits else {}
+    # A row deleted since the last refresh simply drops out here
+    return total, [(score, items[doc_id]) for score, doc_id in hits if doc_id in items]
+
+
+def search(text, user, kinds, page, per_page):
+    """Ranked results across `kinds` ('jobs', 'blogs') visible to `user` (None when anonymous).
+
+    Returns (results, total), where results are summary dicts with `type` and `rank`. Each kind
+    is ranked by the database (ts_rank_cd) or by the in-process BM25 index and the pages are
+    merged by score.
+    """
+    limit = page * per_page
+    use_postgres = backend() == 'postgres'
+    ranked = []
+    total = 0
+
+    if 'jobs' in kinds and user is not None:
+        owner_id = None if user.role == 'admin' else user.id
+        if use_postgres:
+            count, hits = _postgres_search(_job_query(), Job, text, _job_scope(user), limit)
+        else:
+            count, hits = _memory_search(job_index, _job_query(), Job, text, limit, owner_id)
+        total += count
+        ranked += [(score, 'job', job.to_summary_dict()) for score, job in hits]
+
+    if 'blogs' in kinds:
+        if use_postgres:
+            count, hits = _postgres_search(_blog_query(), Blog, text, [], limit)
+        else:
+            count, hits = _memory_search(blog_index, _blog_query(), Blog, text, limit)
+        total += count
+        ranked += [(score, 'blog', blog.to_summary_dict()) for score, blog in hits]
+
+    ranked.sort(key=lambda hit: hit[0], reverse=True)
+    results = [{'type': kind, 'rank': round(float(score), 4), **item}
+               for score, kind, item in ranked[(page - 1) * per_page:limit]]
+    return results, total
+
+
+def stats():
+    return {
+        'backend': backend(),
+        'job_index': job_index.stats(),
+        'blog_index': blog_index.stats()
+    }
@@ -0,0 +1,263 @@
+from socketio import PubSubManager
+from threading import Lock
+import base64
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import pickle
+import select
+import socket
+import struct
+import tempfile
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct('!I')
+
+# pg_notify payloads are capped at 8000 bytes; larger messages are split and reassembled
+NOTIFY_CHUNK_SIZE = 7000
+
+
+def _recv_exact(conn, size):
+    data = b''
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('connection closed')
+        data += chunk
+    return data
+
+
+def _read_frame(conn):
+    (length,) = FRAME_HEADER.unpack(_recv_exact(conn, FRAME_HEADER.size))
+    return _recv_exact(conn, length)
+
+
+def _write_frame(conn, payload):
+    conn.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+class UnixSocketManager(PubSubManager):
+    """Socket.IO client manager that relays events between workers on one host.
+
+    Every worker connects to a broker listening on a Unix socket. The broker is not a separate
+    service: the first worker to take the flock on `<path>.lock` runs it, the others connect to
+    it, and when that worker exits the survivors race to take over. Messages are pickled, so the
+    socket file is created 0600 for the user running the app.
+    """
+    name = 'unix'
+
+    def __init__(self, path, channel='flask-socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = path
+        self._conn = None
+        self._conn_lock = Lock()
+        self._broker_lock_file = None
+        self._broker_clients = {}  # connection -> write lock, so relayed frames never interleave
+
+    def _publish(self, data):
+        payload = pickle.dumps(data)
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                with self._conn_lock:
+                    _write_frame(conn, payload)
+                return
+            except OSError as e:
+                self._reset_connection()
+                if attempt:
+                    logger.error(f"Socket.IO bus: dropping {data.get('method')} message, broker unreachable: {str(e)}")
+
+    def _listen(self):
+        retry_sleep = 0.1
+        while True:
+            try:
+                conn = self._connection()
+                retry_sleep = 0.1
+                while True:
+                    yield pickle.loads(_read_frame(conn))
+            except (OSError, ConnectionError) as e:
+                logger.warning(f"Socket.IO bus: lost broker connection ({str(e)}), reconnecting")
+                self._reset_connection()
+                time.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 5)
+
+    def _connection(self):
+        with self._conn_lock:
+            if self._conn is not None:
+                return self._conn
+            if not self.write_only:
+                self._try_become_broker()
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                conn.connect(self.path)
+            except OSError:
+                conn.close()
+                raise
+            self._conn = conn
+            return conn
+
+    def _reset_connection(self):
+        with self._conn_lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except OSError:
+                    pass
+                self._conn = None
+
+    def _try_become_broker(self):
+        if self._broker_lock_file is not None:
+            return
+        lock_file = open(f'{self.path}.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            lock_file.close()
+            if e.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+            return  # another worker is the broker
+
+        # Holding the lock means any existing socket file is left over from a dead broker
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            listener.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        listener.listen(128)
+        self._broker_lock_file = lock_file
+        self.server.start_background_task(self._broker_accept, listener)
+        logger.info(f"Socket.IO bus: this worker (pid {os.getpid()}) is the broker on {self.path}")
+
+    def _broker_accept(self, listener):
+        while True:
+            conn, _ = listener.accept()
+            self._broker_clients[conn] = Lock()
+            self.server.start_background_task(self._broker_relay, conn)
+
+    def _broker_relay(self, conn):
+        try:
+            while True:
+                payload = _read_frame(conn)
+                for client, write_lock in list(self._broker_clients.items()):
+                    if client is conn:
+                        continue
+                    try:
+                        with write_lock:
+                            _write_frame(client, payload)
+                    except OSError:
+                        self._broker_clients.pop(client, None)
+        except (OSError, ConnectionError):
+            pass
+        finally:
+            self._broker_clients.pop(conn, None)
+            conn.close()
+
+
+class PostgresNotifyManager(PubSubManager):
+    """Socket.IO client manager that relays events between workers with LISTEN/NOTIFY.
+
+    Works across hosts that share the app's PostgreSQL database. Messages over the NOTIFY size
+    limit are sent as several notifications in one transaction and reassembled by the listeners.
+    """
+    name = 'postgres'
+
+    def __init__(self, dsn, channel='flask-socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.dsn = dsn
+        self.pg_channel = 'socketio_' + hashlib.sha1(channel.encode()).hexdigest()[:16]
+        self._publisher = None
+        self._publisher_lock = Lock()
+
+    def _connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    def _publish(self, data):
+        payload = base64.b64encode(pickle.dumps(data)).decode()
+        message_id = uuid.uuid4().hex[:12]
+        chunks = [payload[i:i + NOTIFY_CHUNK_SIZE] for i in range(0, len(payload), NOTIFY_CHUNK_SIZE)]
+        for attempt in range(2):
+            try:
+                with self._publisher_lock:
+                    if self._publisher is None or self._publisher.closed:
+                        self._publisher = self._connect()
+                    with self._publisher.cursor() as cursor:
+                        # One statement, so the chunks commit (and are delivered) together
+                        cursor.execute(
+                            'SELECT ' + ', '.join(['pg_notify(%s, %s)'] * len(chunks)),
+                            [value for index, chunk in enumerate(chunks)
+                             for value in (self.pg_channel, f'{message_id}:{index}:{len(chunks)}:{chunk}')]
+                        )
+                return
+            except Exception as e:
+                with self._publisher_lock:
+                    self._publisher = None
+                if attempt:
+                    logger.error(f"Socket.IO bus: dropping {data.get('method')} message, NOTIFY failed: {str(e)}")
+
+    def _listen(self):
+        retry_sleep = 0.5
+        while True:
+            try:
+                conn = self._connect()
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.pg_channel}')
+                retry_sleep = 0.5
+                partial = {}
+                while True:
+                    # select() is green under eventlet; poll() then reads without blocking
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        message_id, index, total, chunk = notify.payload.split(':', 3)
+                        parts = partial.setdefault(message_id, {})
+                        parts[int(index)] = chunk
+                        if len(parts) == int(total):
+                            del partial[message_id]
+                            yield pickle.loads(base64.b64decode(''.join(parts[i] for i in range(int(total)))))
+            except Exception as e:
+                logger.warning(f"Socket.IO bus: LISTEN connection failed ({str(e)}), reconnecting")
+                time.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 10)
+
+
+def default_socket_path(app):
+    # Workers of one deployment share a database, so key the broker socket on it
+    digest = hashlib.sha1(app.config['SQLALCHEMY_DATABASE_URI'].encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f'socketio-{digest}.sock')
+
+
+def socketio_queue_options(app, write_only=False):
+    """Keyword arguments for SocketIO.init_app selecting the cross-process bus.
+
+    SOCKETIO_MESSAGE_QUEUE is 'local' (single process), 'unix' or 'unix:///path/to.sock'
+    (Unix-socket broker, the default when unset), 'postgres' (LISTEN/NOTIFY on the app database) or
+    'postgresql://...', or any URL Flask-SocketIO understands (redis://, amqp://, kafka://, zmq).
+    """
+    url = app.config.get('SOCKETIO_MESSAGE_QUEUE') or 'unix'
+    channel = app.config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    if url == 'local':
+        return {}
+    if url == 'unix' or url.startswith('unix://'):
+        path = url[len('unix://'):] if url.startswith('unix://') else default_socket_path(app)
+        return {'client_manager': UnixSocketManager(path, channel=channel, write_only=write_only)}
+    if url == 'postgres':
+        url = app.config['SQLALCHEMY_DATABASE_URI']
+    if url.startswith(('postgres://', 'postgresql://', 'postgresql+psycopg2://')):
+        dsn = url.replace('postgresql+psycopg2://', 'postgresql://', 1)
+        return {'client_manager': PostgresNotifyManager(dsn, channel=channel, write_only=write_only)}
+    return {'message_queue': url, 'channel': channel}
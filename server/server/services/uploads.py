@@ -0,0 +1,387 @@
+from flask import Request, current_app
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from werkzeug.utils import secure_filename
+import eventlet
+import hashlib
+import logging
+import os
+import tempfile
+import uuid
+from collections import Counter
+from extensions import db
+from models import ChunkedUpload, StoredBlob, StoredFile
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class IncomingFile:
+    """Where Werkzeug writes a multipart file part: a file in the blob store's staging directory,
+    hashed as it arrives.
+
+    Staging sits on the same filesystem as the blobs, so storing the upload is a link rather than
+    a copy, and nothing beyond the parser's read buffer is held in memory. Whatever isn't claimed
+    by UploadStore.store() is removed when the request closes its files.
+    """
+
+    def __init__(self, directory):
+        self.file = tempfile.NamedTemporaryFile(dir=directory, prefix='upload-', delete=False)
+        self.name = self.file.name
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def close(self):
+        self.file.close()
+        try:
+            os.unlink(self.name)
+        except FileNotFoundError:
+            pass
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return IncomingFile(upload_store.incoming_dir)
+
+
+class UploadStore:
+    """Content-addressed storage for uploads.
+
+    Each distinct content is stored once as UPLOAD_FOLDER/blobs/ab/<sha256> with a reference count
+    in stored_blob. Every attachment gets a stored_file row and a hard link at its usual path
+    (job_<id>/..., temp/...), so downloads, signed links and X-Accel offload keep serving plain
+    paths while re-sent files take no extra space.
+
+    Large files can also arrive as resumable chunked uploads (ChunkedUpload), assembled under
+    blobs/partial and attached to a job or message by id once complete.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.incoming_dir = None
+        self.partial_dir = None
+        self.uploads = 0
+        self.bytes_received = 0
+        self.deduplicated = 0
+        self.bytes_deduplicated = 0
+        self.chunks_received = 0
+        self.chunked_completed = 0
+        self.chunked_expired = 0
+
+    def init_app(self, app):
+        self.root = os.path.abspath(app.config['UPLOAD_FOLDER'])
+        self.incoming_dir = os.path.join(self.root, 'blobs', 'incoming')
+        self.partial_dir = os.path.join(self.root, 'blobs', 'partial')
+        os.makedirs(self.incoming_dir, exist_ok=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+        app.request_class = UploadRequest
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, 'blobs', sha256[:2], sha256)
+
+    def partial_path(self, upload_id):
+        return os.path.join(self.partial_dir, upload_id)
+
+    def _incoming(self, file):
+        stream = file.stream
+        if isinstance(stream, IncomingFile):
+            stream.flush()
+            return stream
+        # Parsed without UploadRequest (e.g. a test client building FileStorage by hand)
+        incoming = IncomingFile(self.incoming_dir)
+        stream.seek(0)
+        for chunk in iter(lambda: stream.read(COPY_CHUNK_SIZE), b''):
+            incoming.write(chunk)
+        incoming.flush()
+        return incoming
+
+    def _add_reference(self, sha256, size):
+        """Count one more reference to the blob; True if it already existed."""
+        bump = update(StoredBlob).where(StoredBlob.sha256 == sha256).values(ref_count=StoredBlob.ref_count + 1)
+        if db.session.execute(bump).rowcount:
+            return True
+        try:
+            with db.session.begin_nested():
+                db.session.add(StoredBlob(sha256=sha256, size=size, ref_count=1))
+            return False
+        except IntegrityError:
+            # Another request stored the same content first
+            db.session.execute(bump)
+            return True
+
+    def _drop_reference(self, sha256, count=1):
+        """Count fewer references to the blob; returns its path if those were the last."""
+        db.session.execute(update(StoredBlob).where(StoredBlob.sha256 == sha256).values(
+            ref_count=StoredBlob.ref_count - count))
+        blob = db.session.get(StoredBlob, sha256, populate_existing=True)
+        if blob is not None and blob.ref_count <= 0:
+            db.session.delete(blob)
+            return self.blob_path(sha256)
+        return None
+
+    def _place(self, source, sha256, path):
+        """Link the blob at path, publishing source as the blob if it isn't there yet.
+
+        Returns True if source became the blob.
+        """
+        blob_path = self.blob_path(sha256)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        published = False
+        for _ in range(3):
+            try:
+                os.link(blob_path, path)
+                return published
+            except FileNotFoundError:
+                pass
+            try:
+                os.link(source, blob_path)
+                published = True
+            except FileExistsError:
+                pass
+        raise OSError(f"Could not link upload into place: {path}")
+
+    def _path_for(self, folder, prefix, filename):
+        relative_path = f"{folder}/{prefix}-{datetime.now(timezone.utc).timestamp()}-{secure_filename(filename)}"
+        return relative_path, os.path.join(self.root, relative_path)
+
+    def store(self, file, folder, prefix, kind, job=None, message=None, user=None):
+        """Store an uploaded FileStorage as <folder>/<prefix>-<timestamp>-<name> and return its StoredFile.
+
+        The row and the blob reference are added to the current session; if the transaction
+        rolls back, the new link (and a blob nothing else uses) is removed again.
+        """
+        incoming = self._incoming(file)
+        sha256 = incoming.sha256.hexdigest()
+        relative_path, path = self._path_for(folder, prefix, file.filename)
+
+        existed = self._add_reference(sha256, incoming.size)
+        published = self._place(incoming.name, sha256, path)
+        incoming.close()
+        db.session.info.setdefault('uploads_written', []).append((path, self.blob_path(sha256) if published else None))
+
+        self.uploads += 1
+        self.bytes_received += incoming.size
+        if existed:
+            self.deduplicated += 1
+            self.bytes_deduplicated += incoming.size
+        logger.info(f"Stored upload {relative_path} ({incoming.size} bytes, sha256 {sha256[:12]}, duplicate: {existed})")
+
+        stored = StoredFile(
+            path=relative_path,
+            filename=file.filename,
+            content_type=file.mimetype or None,
+            size=incoming.size,
+            sha256=sha256,
+            kind=kind,
+            job=job,
+            message=message,
+            uploaded_by=user.id if user else None
+        )
+        db.session.add(stored)
+        return stored
+
+    def release(self, stored_file):
+        """Delete a StoredFile and drop its blob reference; the files go once the transaction commits."""
+        self.release_many([stored_file])
+
+    def release_many(self, stored_files, keep_paths=()):
+        """release() for a batch, one reference update per distinct blob.
+
+        Paths in keep_paths are left on disk (a pre-deduplication path another row still lists).
+        """
+        removed = [os.path.join(self.root, f.path) for f in stored_files if f.path not in keep_paths]
+        for sha256, count in Counter(f.sha256 for f in stored_files if f.sha256).items():
+            removed.append(self._drop_reference(sha256, count))
+        for stored_file in stored_files:
+            db.session.delete(stored_file)
+        db.session.info.setdefault('uploads_released', []).extend(path for path in removed if path)
+
+    def begin_chunked(self, user, filename, size, content_type=None):
+        upload = ChunkedUpload(
+            id=uuid.uuid4().hex,
+            user_id=user.id,
+            filename=filename,
+            content_type=content_type,
+            size=size,
+            expires_at=datetime.utcnow() + timedelta(seconds=current_app.config['UPLOAD_SESSION_TTL'])
+        )
+        open(self.partial_path(upload.id), 'wb').close()
+        db.session.add(upload)
+        db.session.info.setdefault('uploads_written', []).append((self.partial_path(upload.id), None))
+        return upload
+
+    def write_chunk(self, upload_id, start, stream, length):
+        """Copy length bytes of stream into the upload's partial file at start; returns the bytes written."""
+        written = 0
+        with open(self.partial_path(upload_id), 'r+b') as partial:
+            partial.seek(start)
+            while written < length:
+                data = stream.read(min(COPY_CHUNK_SIZE, length - written))
+                if not data:
+                    break
+                partial.write(data)
+                written += len(data)
+        self.chunks_received += 1
+        self.bytes_received += written
+        return written
+
+    def checksum(self, upload_id):
+        sha256 = hashlib.sha256()
+        with open(self.partial_path(upload_id), 'rb') as partial:
+            for chunk in iter(lambda: partial.read(COPY_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+                eventlet.sleep(0)  # let other requests run between blocks of a large file
+        return sha256.hexdigest()
+
+    def complete_chunked(self, upload, sha256):
+        """Take a blob reference for the assembled file; it becomes the blob once the transaction commits.
+
+        Returns False if another request completed the upload first; the caller then rolls back.
+        """
+        existed = self._add_reference(sha256, upload.size)
+        claimed = db.session.execute(update(ChunkedUpload).where(
+            ChunkedUpload.id == upload.id, ChunkedUpload.status == 'uploading'
+        ).values(
+            sha256=sha256,
+            status='complete',
+            expires_at=datetime.utcnow() + timedelta(seconds=current_app.config['UPLOAD_SESSION_TTL'])
+        )).rowcount
+        if not claimed:
+            return False
+        db.session.info.setdefault('uploads_published', []).append((self.partial_path(upload.id), sha256))
+
+        self.chunked_completed += 1
+        if existed:
+            self.deduplicated += 1
+            self.bytes_deduplicated += upload.size
+        logger.info(f"Completed chunked upload {upload.id} ({upload.size} bytes, sha256 {sha256[:12]}, duplicate: {existed})")
+        return True
+
+    def completed_uploads(self, user, upload_ids):
+        """The user's completed chunked uploads with these ids, or None if any is missing."""
+        upload_ids = list(dict.fromkeys(upload_id for upload_id in upload_ids if upload_id))
+        if not upload_ids:
+            return []
+        uploads = ChunkedUpload.query.filter(
+            ChunkedUpload.id.in_(upload_ids),
+            ChunkedUpload.user_id == user.id,
+            ChunkedUpload.status == 'complete'
+        ).all()
+        return uploads if len(uploads) == len(upload_ids) else None
+
+    def attach(self, upload, folder, prefix, kind, job=None, message=None, user=None):
+        """Turn a completed chunked upload into a StoredFile, as store() does for a multipart file.
+
+        The upload's blob reference passes to the new row, so the blob is kept if this rolls back.
+        """
+        relative_path, path = self._path_for(folder, prefix, upload.filename)
+        self._place(self.partial_path(upload.id), upload.sha256, path)  # falls back to the partial file if not yet published
+        db.session.info.setdefault('uploads_written', []).append((path, None))
+        db.session.info.setdefault('uploads_released', []).append(self.partial_path(upload.id))
+
+        self.uploads += 1
+        logger.info(f"Attached chunked upload {upload.id} as {relative_path}")
+
+        stored = StoredFile(
+            path=relative_path,
+            filename=upload.filename,
+            content_type=upload.content_type,
+            size=upload.size,
+            sha256=upload.sha256,
+            kind=kind,
+            job=job,
+            message=message,
+            uploaded_by=user.id if user else upload.user_id
+        )
+        db.session.add(stored)
+        db.session.delete(upload)
+        return stored
+
+    def discard_chunked(self, upload):
+        """Delete a chunked upload, dropping its blob reference if it was completed."""
+        removed = [self.partial_path(upload.id)]
+        if upload.status == 'complete':
+            removed.append(self._drop_reference(upload.sha256))
+        db.session.delete(upload)
+        db.session.info.setdefault('uploads_released', []).extend(path for path in removed if path)
+
+    def expire_chunked(self, limit=100):
+        """Discard up to limit abandoned chunked uploads; the caller commits. Returns how many."""
+        expired = ChunkedUpload.query.filter(ChunkedUpload.expires_at < datetime.utcnow()).order_by(
+            ChunkedUpload.expires_at).limit(limit).with_for_update(skip_locked=True).all()
+        for upload in expired:
+            self.discard_chunked(upload)
+        self.chunked_expired += len(expired)
+        return len(expired)
+
+    def stats(self):
+        return {
+            'uploads': self.uploads,
+            'bytes_received': self.bytes_received,
+            'deduplicated': self.deduplicated,
+            'bytes_deduplicated': self.bytes_deduplicated,
+            'chunks_received': self.chunks_received,
+            'chunked_completed': self.chunked_completed,
+            'chunked_expired': self.chunked_expired
+        }
+
+
+upload_store = UploadStore()
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Failed to delete upload {path}: {str(e)}")
+
+
+@event.listens_for(Session, 'after_commit')
+def _remove_released_files(session):
+    if session.in_nested_transaction():
+        return  # a savepoint, e.g. the blob insert in _add_reference; wait for the real commit
+    session.info.pop('uploads_written', None)
+    for partial_path, sha256 in session.info.pop('uploads_published', []):
+        # A completed chunked upload's partial file becomes its blob
+        try:
+            os.makedirs(os.path.dirname(upload_store.blob_path(sha256)), exist_ok=True)
+            os.link(partial_path, upload_store.blob_path(sha256))
+        except FileExistsError:
+            pass
+        except OSError as e:
+            logger.error(f"Failed to publish chunked upload {partial_path}: {str(e)}")
+            continue
+        _unlink(partial_path)
+    for path in session.info.pop('uploads_released', []):
+        _unlink(path)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _remove_unsaved_uploads(session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop('uploads_released', None)
+    session.info.pop('uploads_published', None)
+    for path, blob_path in session.info.pop('uploads_written', []):
+        _unlink(path)
+        if not blob_path:
+            continue
+        try:
+            if os.stat(blob_path).st_nlink == 1:
+                _unlink(blob_path)  # published by this upload and linked nowhere else
+        except FileNotFoundError:
+            pass